@@ -14,9 +14,8 @@
 #
 
 import threading
-from time import sleep
 
-import RPi.GPIO as GPIO
+from rubik_hw import GPIO, clock
 GPIO.setmode(GPIO.BCM)  # Use processor GPIO pin numbers
 
 from queue import Queue
@@ -71,7 +70,7 @@ class GpioDebounce(threading.Thread):
     #
     def event_cb(self, pin):
         # Delay to allow the pin to stop bouncing
-        sleep(float(self.db_time/1000))
+        clock.sleep(float(self.db_time/1000))
 
         # Read the new pin state
         self.new_state = GPIO.input(self.gpio_pin)
@@ -1,3 +1,7 @@
 class FaceException(Exception):
     def __init__(self, message):
         super().__init__(message)
+
+class SolveException(Exception):
+    def __init__(self, message):
+        super().__init__(message)
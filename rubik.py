@@ -14,9 +14,12 @@
 import sys
 import os
 
-from time import sleep
+import my_exceptions
 
-from queue import Queue
+from queue import Queue, Empty
+
+# Clock used to time the solve, simulated with the --sim option
+from rubik_hw import clock
 
 # Display controller class
 from rubik_display import RubikDisplay
@@ -24,6 +27,9 @@ from rubik_display import RubikDisplay
 # Button press detection class
 from rubik_buttons import RubikButtons, UP_BUTTON, DOWN_BUTTON, ENTER_BUTTON
 
+# Cancel token class used to abort a solve
+from rubik_cancel import RubikCancel
+
 # Servo control class
 from rubik_servos import RubikServo
 
@@ -33,39 +39,56 @@ from rubik_scan import RubikScan
 # Cube solver class
 from rubik_solve import RubikSolve
 
+# This class uses the solver library to find the moves needed to solve
+# the cube.
+from rubik_search import RubikSearch
+
+
+# Time between updates of the solver loading state on the display (seconds)
+STATUS_TIME = 1.0
+
+# Longest time to search for a solution (seconds)
+SEARCH_MAX_TIME = 6
+
+
 # Create the display class
 #
 # This is created here so the display can be used during initilization
-# to let the user know something is happening. Importing the solver
-# library can take quite a while.
+# to let the user know something is happening.
 #
 display = RubikDisplay()
 display.write_body("Init")
 
-# This library provieds the moves needed to solve the cube.
-import twophase.solver as solver
+# Create the token used to abort a solve when a button is pressed
+abort = RubikCancel()
+
+# Create the cube solution search class.
+# Loading the solver library takes quite a while so it is started first and
+# runs in the background while everything else starts.
+search = RubikSearch(abort)
+search.start_loading()
 
 
 # Create the queue used to get button events
 btn_q = Queue(maxsize = 8)
 
 # Create the button class
-button = RubikButtons(btn_q)
+button = RubikButtons(btn_q, abort)
 button.start()
 
 # Create the servo controller class
 try:
-    servos = RubikServo(btn_q)
+    servos = RubikServo(btn_q, abort)
 except:
     display.write_body("File Error")
     raise
 
-# Create the cube scanner class
-scanner = RubikScan(servos)
-
 # Create the cube solution class
 cube_solver = RubikSolve(servos, display)
 
+# Create the cube scanner class
+scanner = RubikScan(servos, cube_solver.get_faces)
+
 
 #############################################
 # Main menu functions
@@ -77,13 +100,16 @@ cube_solver = RubikSolve(servos, display)
 def solve():
     global display
 
-    # Initialize the camera
+    # Initialize the camera. It adjusts to the light while the cube is loaded.
     scanner.camera_init()
 
     # Set the grippers to the load cube position
     servos.cube_load(display, btn_q)
 
     try:
+        # Any button press aborts from here until the cube is released
+        abort.arm()
+
         # Read the cube faces to get the current color arrangement
         result = scanner.scan_cube(display)
         success = result[0]
@@ -91,21 +117,35 @@ def solve():
         # Flush any output messages
         sys.stdout.flush()
         if (success != True):
+            abort.disarm()
             display.write_body("Scan Error")
             # Wait for a button press
             button_press = btn_q.get()
         else:
+            # Start solving from the faces the grippers hold after scanning
+            cube_solver.set_start_faces(scanner.face_l, scanner.face_r)
+
             # Get the moves needed to solve the cube.
-            # Search a full 2 seconds for the best solution.
-            solve_string = solver.solve(cube_string, 0, 2)
+            # Search until more search isn't likely to save more robot time
+            # than it takes, and keep the solution the robot can carry out
+            # the fastest. The solver library may still be loading.
+            search.wait_ready(display)
+            candidates = search.solve_candidates(cube_string, \
+                SEARCH_MAX_TIME, cube_solver.estimate)
+            solve_string, plan = cube_solver.choose_solution(candidates)
             print(solve_string)
             # Flush any output messages
             sys.stdout.flush()
 
             # Manipulate the cube to implement the solution
-            cube_solver.solve(display, servos, solve_string)
+            start = clock.monotonic()
+            cube_solver.solve(display, servos, solve_string, plan)
+            servos.wait_idle()
+            search.record(cube_string, solve_string, \
+                          clock.monotonic() - start)
 
             # Release the cube so it can be removed
+            abort.disarm()
             servos.cube_release()
             # Flush any output messages
             sys.stdout.flush()
@@ -114,9 +154,18 @@ def solve():
             # Wait for a button press
             button_press = btn_q.get()
     except KeyboardInterrupt:
+        abort.disarm()
         display.write_body("Abort")
         servos.cube_release()
+    except my_exceptions.SolveException as e:
+        print(e)
+        abort.disarm()
+        display.write_body("Solve Error")
+        servos.cube_release()
+        # Wait for a button press
+        button_press = btn_q.get()
     except:
+        abort.disarm()
         display.write_body("Error")
         servos.cube_release()
         raise
@@ -128,6 +177,7 @@ def quit():
     global display
     display.write_header("")
     display.write_body("Exit")
+    scanner.camera_close()
     servos.cube_release()
     sys.exit(0)
 
@@ -139,6 +189,17 @@ def calibrate_servos():
     servos.calibration(display, btn_q)
 
 
+# Show the main menu header, or the solver loading state until it is ready
+#
+def show_header():
+    global display
+    status = search.status()
+    if (status is None):
+        display.write_header("Main menu")
+    else:
+        display.write_header(status)
+
+
 #############################################
 # Main Menu
 #############################################
@@ -148,7 +209,7 @@ def calibrate_servos():
 sys.stdout.flush()
 
 # Display the main menu header
-display.write_header("Main menu")
+show_header()
 
 # Main menu prompt and function array
 main_menu = [("Solve",solve), \
@@ -158,6 +219,8 @@ main_menu_size = len(main_menu)
 
 # Start menu at position 0
 menu_index = 0
+# True until the solver loading state shown in the header is final
+loading = True
 display.write_body(main_menu[0][0])
 
 # Get the user input to select a function
@@ -167,8 +230,19 @@ display.write_body(main_menu[0][0])
 # The ENTER button executes the current function
 #
 while (1):
-    # Wait for a button press
-    button_press = btn_q.get()
+    # Wait for a button press.
+    # Update the solver loading state meanwhile until loading has finished,
+    # whether the solver is ready or failed to load.
+    try:
+        if (loading):
+            button_press = btn_q.get(timeout=STATUS_TIME)
+        else:
+            button_press = btn_q.get()
+    except Empty:
+        # Show the final state once when loading has finished
+        loading = not search.ready.is_set()
+        show_header()
+        continue
 
     if (button_press == UP_BUTTON):
         if (menu_index > 0):
@@ -185,5 +259,5 @@ while (1):
     elif(button_press == ENTER_BUTTON):
         main_menu[menu_index][1]()
         menu_index = 0
-        display.write_header("Main menu")
+        show_header()
         display.write_body(main_menu[0][0])
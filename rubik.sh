@@ -2,6 +2,8 @@
 
 cd /home/pi
 echo "Staring Rubik Robot code" > log.txt
+# The solver service keeps the solver tables loaded if rubik.py is restarted
+/usr/bin/python3 rubik_solver_server.py > solver_log.txt 2>&1 &
 /usr/bin/python3 rubik.py >> log.txt
 if [ $? -eq 0 ]
 then
@@ -7,6 +7,8 @@
 # It uses the GpioDebounce class to clean up the press and release events.
 #
 # It reports button press events through a queue supplied by the caller.
+# While the cancel token is armed a button press aborts the current
+# operation instead.
 #
 
 import threading
@@ -34,15 +36,19 @@ ENTER_BUTTON = 2
 #
 # Inputs:
 #  out_q    Queue used to report button presses
+#  abort    Cancel token used to abort operations
 #
 class RubikButtons(threading.Thread):
 
-    def __init__(self, btn_q):
+    def __init__(self, btn_q, abort):
         super().__init__(daemon=True)
 
         # Save the button queue used to report button presses
         self.out_q = btn_q
 
+        # Save the cancel token used to abort operations
+        self.abort = abort
+
         # Create the queue used to receive GPIO debounce events
         self.in_q = Queue(maxsize = 8)
 
@@ -58,8 +64,11 @@ class RubikButtons(threading.Thread):
 
             # A button press will be a 0 level
             if (button_event[1] == 0):
+                # Any button aborts while the cancel token is armed
+                if (self.abort.armed):
+                    self.abort.cancel()
                 # Determine which button was pressed and report
-                if (button_event[0] == UP_BUTTON_GPIO):
+                elif (button_event[0] == UP_BUTTON_GPIO):
                     self.out_q.put(UP_BUTTON)
                 elif (button_event[0] == DOWN_BUTTON_GPIO):
                     self.out_q.put(DOWN_BUTTON)
@@ -0,0 +1,197 @@
+#!/usr/bin/python
+
+#
+# This class saves the solutions found for each cube so a cube that is
+# solved again doesn't need another search.
+#
+# The same scramble is often solved many times, for tests, for demos and
+# when a solve is aborted and started again. The cube can be loaded any way
+# up so the cube is first turned to a standard orientation. Each of the 24
+# ways to hold the cube, and their mirror images, is tried and the one that
+# gives the lowest cube definition string is used. Every way of loading the
+# same scramble then finds the same saved solutions, which are turned back
+# into moves of the cube as it is held.
+#
+# The solutions are kept in memory and saved to a file after every change.
+# Each line of the file has one cube in the form:
+#   <cube> <seconds> <solution>|<solution>|...
+# The seconds are the measured time the robot took to carry out the first
+# solution, or - if it hasn't been carried out. The cubes used least
+# recently are removed when there are too many.
+#
+
+import os
+from collections import OrderedDict
+
+# Needed to turn the cube to every orientation at once
+import numpy
+
+# Describes the cube in other orientations
+from rubik_orient import RubikOrient, FACE_ORDER
+
+
+# Set this to 0 to disable debug logging, 1 to enable.
+DEBUG = 0
+
+
+# Most cubes kept
+CACHE_SIZE = 500
+
+
+# Rubik's cube solution cache class
+#
+# Input:
+#   file        The cache file name
+#
+class RubikCache(object):
+    def __init__(self, file="solution_cache.txt"):
+        self.file = file
+
+        # Saved entries indexed by the cube in the standard orientation,
+        # least recently used first. Each is a list with the measured time
+        # or None and the list of solutions in the standard orientation.
+        self.entries = OrderedDict()
+
+        # Every orientation of the cube. Turning about the x and y axes
+        # reaches all 24 ways to hold the cube.
+        self.orients = [RubikOrient("")]
+        found = set([tuple(self.orients[0].source)])
+        for orient in self.orients:
+            for step in "xy":
+                turned = RubikOrient(orient.steps + step)
+                if (tuple(turned.source) not in found):
+                    found.add(tuple(turned.source))
+                    self.orients.append(turned)
+        self.orients += [RubikOrient(orient.steps + "m") \
+                         for orient in self.orients]
+
+        # The square each square of the turned cube comes from and the new
+        # name of each square color, one row for each orientation. These
+        # turn the cube to every orientation with one table lookup each.
+        self.index = numpy.array([orient.source for orient in self.orients])
+        self.names = numpy.zeros((len(self.orients), 256), dtype=numpy.uint8)
+        for row, orient in enumerate(self.orients):
+            for face in FACE_ORDER:
+                self.names[row, ord(orient.faces[face])] = ord(face)
+        self.rows = numpy.arange(len(self.orients))[:, None]
+
+        self.read()
+
+
+    # Read the cache file
+    #
+    def read(self):
+        if (not os.path.exists(self.file)):
+            return
+        f = open(self.file, 'r')
+        for line in f:
+            fields = line.rstrip("\n").split(" ", 2)
+            if (len(fields) < 3):
+                continue
+            seconds = None
+            if (fields[1] != "-"):
+                seconds = float(fields[1])
+            self.entries[fields[0]] = [seconds, fields[2].split("|")]
+        f.close()
+        if(DEBUG == 1):
+            print("Solution cache has " + str(len(self.entries)) + " cubes")
+
+
+    # Write the cache file
+    #
+    # A new file is written and then renamed so a crash can't leave a
+    # partly written file.
+    #
+    def write(self):
+        f = open(self.file + ".new", 'w')
+        for cube, entry in self.entries.items():
+            seconds = "-"
+            if (entry[0] is not None):
+                seconds = "%.2f" % entry[0]
+            f.write(cube + " " + seconds + " " + "|".join(entry[1]) + "\n")
+        f.close()
+        os.replace(self.file + ".new", self.file)
+
+
+    # Turn a cube to the standard orientation
+    #
+    # Input:
+    #   cube_string     The cube definition string
+    #
+    # Return:
+    #   A tuple with the cube definition string in the standard orientation
+    #   and the orientation used
+    #
+    def standard(self, cube_string):
+        cube = numpy.frombuffer(cube_string.encode(), dtype=numpy.uint8)
+        turned = self.names[self.rows, cube[self.index]].tobytes()
+        best = min(range(0, len(self.orients)), \
+                   key=lambda row: turned[row * 54:row * 54 + 54])
+        return (turned[best * 54:best * 54 + 54].decode(), self.orients[best])
+
+
+    # Find the saved solutions for a cube
+    #
+    # Input:
+    #   cube_string     The cube definition string
+    #
+    # Return:
+    #   A tuple with the list of solution strings for the cube as it is
+    #   held and the measured time of the first one or None, or None if the
+    #   cube isn't saved
+    #
+    def lookup(self, cube_string):
+        cube, orient = self.standard(cube_string)
+        entry = self.entries.get(cube)
+        if (entry is None):
+            return None
+        if (next(reversed(self.entries)) != cube):
+            # Save the new order so the cubes used least recently are still
+            # removed first after a restart
+            self.entries.move_to_end(cube)
+            self.write()
+        return ([orient.from_orient(solve_string) \
+                 for solve_string in entry[1]], entry[0])
+
+
+    # Save the solutions found for a cube
+    #
+    # Inputs:
+    #   cube_string     The cube definition string
+    #   candidates      List of solution strings
+    #
+    def store(self, cube_string, candidates):
+        candidates = [solve_string for solve_string in candidates \
+                      if (not solve_string.startswith("Error"))]
+        if (len(candidates) == 0):
+            return
+        cube, orient = self.standard(cube_string)
+        self.entries[cube] = [None, [orient.to_orient_solution(solve_string) \
+                                     for solve_string in candidates]]
+        self.entries.move_to_end(cube)
+        while (len(self.entries) > CACHE_SIZE):
+            self.entries.popitem(last=False)
+        self.write()
+
+
+    # Save the time the robot took to carry out a solution
+    #
+    # The solution is moved to the front so it is the one the time is for.
+    #
+    # Inputs:
+    #   cube_string     The cube definition string
+    #   solve_string    The solution that was carried out
+    #   seconds         The time it took
+    #
+    def record(self, cube_string, solve_string, seconds):
+        cube, orient = self.standard(cube_string)
+        entry = self.entries.get(cube)
+        if (entry is None):
+            return
+        solve_string = orient.to_orient_solution(solve_string)
+        if (solve_string in entry[1]):
+            entry[1].remove(solve_string)
+        entry[0] = seconds
+        entry[1].insert(0, solve_string)
+        self.entries.move_to_end(cube)
+        self.write()
@@ -0,0 +1,218 @@
+#!/usr/bin/python
+
+#
+# This class keeps the camera open between solves and sets its exposure.
+#
+# Opening the camera and letting the automatic exposure and white balance
+# settle takes a few seconds. The camera is opened once and left running
+# with automatic settings between scans so it is already settled when the
+# next cube is loaded.
+#
+# Before a scan the exposure and white balance are locked so the colors are
+# the same in every picture. Instead of always waiting a fixed time the
+# camera readings are checked. A reading is taken when the cube loading
+# starts and again when the scan starts. If nothing changed in between the
+# camera is settled and the scan starts right away. Otherwise the readings
+# are repeated until they stop changing.
+#
+# The locked settings are saved for each lighting setup. When the readings
+# match a saved setup the saved settings are used again without waiting,
+# which also keeps the colors the same from one solve to the next.
+#
+
+# Clock used to wait for the camera
+from rubik_hw import clock
+
+# Raspberry Pi camera library
+from rubik_hw import PiCamera
+
+
+# Set this to 0 to disable debug logging, 1 to enable.
+DEBUG = 0
+
+
+# Shortest time the automatic settings need after the camera is opened
+# (seconds)
+SETTLE_MIN_TIME = 2.0
+
+# Time between camera readings while waiting for them to settle (seconds)
+SETTLE_POLL_TIME = 0.1
+
+# Longest time to wait for the readings to settle (seconds)
+SETTLE_TIMEOUT = 2.0
+
+# Largest change between readings that counts as settled, as a fraction of
+# the reading
+SETTLE_TOLERANCE = 0.05
+
+# Time for locked settings to reach the pictures (seconds)
+LOCK_TIME = 0.25
+
+
+# Rubik's cube camera session class
+#
+# Input:
+#   abort       The cancel token used to abort waiting
+#
+class RubikCamera(object):
+    def __init__(self, abort):
+        # Save the cancel token provided by the caller
+        self.abort = abort
+
+        # The camera, created when first needed
+        self.camera = None
+
+        # The time the camera was opened
+        self.open_time = 0.0
+
+        # The last camera reading taken
+        self.reading = None
+
+        # Saved lighting setups. Each is a tuple with the camera reading and
+        # the locked (shutter speed, white balance gains, analog gain,
+        # digital gain) settings.
+        self.setups = []
+
+
+    # Open the camera if needed and let it adjust to the light
+    #
+    # This should be called before the cube is loaded so the camera adjusts
+    # while it is loaded.
+    #
+    def warm_up(self):
+        if (self.camera is None):
+            self.camera = PiCamera()
+            self.camera.start_preview()
+            self.camera.iso = 400
+            self.camera.saturation = 50
+            self.open_time = clock.monotonic()
+        self.reading = self.get_reading()
+
+
+    # Change the camera resolution and zoom
+    #
+    # Inputs:
+    #   resolution  The (width, height) picture size
+    #   zoom        The (x, y, width, height) part of the sensor used
+    #
+    def set_view(self, resolution, zoom):
+        self.camera.resolution = resolution
+        self.camera.zoom = zoom
+
+
+    # Take a picture
+    #
+    # Inputs:
+    #   output      The file name or buffer the picture is written to
+    #   format      The picture format
+    #
+    def capture(self, output, format=None):
+        self.camera.capture(output, format)
+
+
+    # Get the current automatic exposure and white balance
+    #
+    # Return:
+    #   A tuple with the exposure time, the analog and digital gains and
+    #   the red and blue white balance gains
+    #
+    def get_reading(self):
+        red, blue = self.camera.awb_gains
+        return (float(self.camera.exposure_speed), \
+                float(self.camera.analog_gain), \
+                float(self.camera.digital_gain), float(red), float(blue))
+
+
+    # Check if two camera readings are the same
+    #
+    # Inputs:
+    #   first       The first camera reading
+    #   second      The second camera reading
+    #
+    def matches(self, first, second):
+        for a, b in zip(first, second):
+            if (abs(a - b) > SETTLE_TOLERANCE * max(abs(a), abs(b))):
+                return False
+        return True
+
+
+    # Find the saved lighting setup for a camera reading
+    #
+    # Input:
+    #   reading     The camera reading
+    #
+    # Return:
+    #   The saved setup or None if there isn't one
+    #
+    def find_setup(self, reading):
+        for setup in self.setups:
+            if (self.matches(setup[0], reading)):
+                return setup
+        return None
+
+
+    # Wait for the automatic settings to settle and lock them
+    # Raises KeyboardInterrupt if waiting is aborted.
+    #
+    # Using fixed settings rather than auto exposure produces more
+    # consistant colors from image to image. This make the color
+    # detection more reliable.
+    #
+    def lock(self):
+        # A new camera needs some time before the readings mean anything
+        self.abort.sleep(self.open_time + SETTLE_MIN_TIME - clock.monotonic())
+
+        reading = self.get_reading()
+        setup = self.find_setup(reading)
+        end = clock.monotonic() + SETTLE_TIMEOUT
+        while ((setup is None) and (not self.matches(self.reading, reading)) \
+               and (clock.monotonic() < end)):
+            self.reading = reading
+            self.abort.sleep(SETTLE_POLL_TIME)
+            reading = self.get_reading()
+            setup = self.find_setup(reading)
+        self.reading = reading
+
+        if (setup is None):
+            setup = (reading, (self.camera.exposure_speed, \
+                               self.camera.awb_gains, \
+                               self.camera.analog_gain, \
+                               self.camera.digital_gain))
+            self.setups.append(setup)
+        elif(DEBUG == 1):
+            print("Using saved camera settings")
+
+        shutter_speed, awb_gains, analog_gain, digital_gain = setup[1]
+        self.camera.exposure_mode = 'off'
+        self.camera.shutter_speed = shutter_speed
+        self.camera.awb_mode = 'off'
+        self.camera.awb_gains = awb_gains
+        # The gains freeze where they are when the exposure is turned off.
+        # Set them back to the saved values too so a saved setup gives the
+        # same pictures. Older camera libraries can't set the gains, but a
+        # saved setup is only used when the gains already match it.
+        try:
+            self.camera.analog_gain = analog_gain
+            self.camera.digital_gain = digital_gain
+        except AttributeError:
+            if(DEBUG == 1):
+                print("Camera gains can't be set")
+
+        # Give the camera time to use the new settings
+        self.abort.sleep(LOCK_TIME)
+
+
+    # Go back to automatic exposure and white balance
+    #
+    def unlock(self):
+        self.camera.exposure_mode = 'auto'
+        self.camera.shutter_speed = 0
+        self.camera.awb_mode = 'auto'
+
+
+    # Close the camera
+    #
+    def close(self):
+        if (self.camera is not None):
+            self.camera.close()
+            self.camera = None
@@ -0,0 +1,71 @@
+#!/usr/bin/python
+
+#
+# This class is used to abort a cube solve when a button is pressed.
+#
+# While the cancel token is armed the button thread sets it directly
+# instead of reporting the button press through the button queue.
+# Every wait during the servo moves, the camera settling and the solution
+# search wakes up as soon as the token is set and raises KeyboardInterrupt,
+# the same exception used for a Ctrl-C from the keyboard.
+#
+
+import threading
+
+# Clock used for waiting
+from rubik_hw import clock
+
+
+# Rubik solver cancel token class
+#
+class RubikCancel(object):
+    def __init__(self):
+        # Set when the operation should be aborted
+        self.event = threading.Event()
+
+        # True when button presses should abort instead of being queued
+        self.armed = False
+
+
+    # Start reporting button presses as an abort
+    #
+    def arm(self):
+        self.event.clear()
+        self.armed = True
+
+
+    # Go back to reporting button presses through the button queue
+    #
+    def disarm(self):
+        self.armed = False
+        self.event.clear()
+
+
+    # Abort the current operation
+    #
+    def cancel(self):
+        self.event.set()
+
+
+    # Check if the current operation was aborted
+    #
+    def cancelled(self):
+        return self.event.is_set()
+
+
+    # Raise KeyboardInterrupt if the current operation was aborted
+    #
+    def check(self):
+        if (self.event.is_set()):
+            raise KeyboardInterrupt
+
+
+    # Wait for a period of time
+    # Raises KeyboardInterrupt as soon as the operation is aborted.
+    #
+    # Input:
+    #   seconds     The time to wait
+    #
+    def sleep(self, seconds):
+        if (clock.wait(self.event, seconds)):
+            raise KeyboardInterrupt
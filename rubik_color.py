@@ -0,0 +1,241 @@
+#!/usr/bin/python
+
+#
+# The code in this file decides which face each square of the cube belongs
+# to from the colors read by the scanner.
+#
+# The colors are compared in the CIE Lab color space where the distance
+# between two colors is close to how different they look. Red and orange
+# are much further apart than in RGB. The lightness is given less weight
+# since it changes the most with shading across the cube.
+#
+# Each face has exactly 9 squares so instead of matching every square to
+# its closest center on its own, the squares are shared out between the
+# faces so the total color distance is as small as possible with 8 squares
+# going to each face besides its center. The result always has the right
+# number of squares of each color.
+#
+# A confidence is worked out for each square from how much closer its color
+# is to the chosen face than to the next closest face.
+#
+# If one face wasn't scanned its center color isn't known. It is estimated
+# from the squares that don't match any of the other centers.
+#
+
+# Needed for the color space conversion and the assignment
+import numpy
+
+
+# Set this to 0 to disable debug logging, 1 to enable.
+DEBUG = 0
+
+
+# Weight of the lightness compared to the color in the color distance
+LIGHTNESS_WEIGHT = 0.5
+
+# Squares with a lower confidence are reported
+LOW_CONFIDENCE = 0.2
+
+# Number of times the estimate of a missing center color is improved
+MISSING_CENTER_STEPS = 3
+
+# Reference white for the Lab conversion (D65)
+WHITE_POINT = numpy.array([0.95047, 1.0, 1.08883])
+
+# Linear RGB to XYZ conversion matrix (sRGB, D65)
+RGB_TO_XYZ = numpy.array([[0.4124, 0.3576, 0.1805],
+                          [0.2126, 0.7152, 0.0722],
+                          [0.0193, 0.1192, 0.9505]])
+
+
+# Rubik's cube square color classifier class
+#
+class RubikColor(object):
+    def __init__(self):
+        # The color distance of every square to every face center from the
+        # last classification, one row for each square
+        self.dist = None
+
+
+    # Convert colors to the Lab color space
+    #
+    # Input:
+    #   colors      Array of (r, g, b) colors, 0 to 255
+    #
+    # Return:
+    #   Array of (L, a, b) colors
+    #
+    def to_lab(self, colors):
+        rgb = numpy.asarray(colors, dtype=float) / 255.0
+        rgb = numpy.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, \
+                          rgb / 12.92)
+        xyz = rgb.dot(RGB_TO_XYZ.T) / WHITE_POINT
+        f = numpy.where(xyz > 0.008856, numpy.cbrt(xyz), \
+                        7.787 * xyz + 16.0 / 116.0)
+        return numpy.stack([116.0 * f[:, 1] - 16.0,
+                            500.0 * (f[:, 0] - f[:, 1]),
+                            200.0 * (f[:, 1] - f[:, 2])], axis=1)
+
+
+    # Get the color distance between every square and every center
+    #
+    # Inputs:
+    #   squares     Array of (L, a, b) square colors
+    #   centers     Array of (L, a, b) center colors
+    #
+    # Return:
+    #   Array of distances, one row for each square
+    #
+    def distances(self, squares, centers):
+        diff = squares[:, None, :] - centers[None, :, :]
+        diff[:, :, 0] *= LIGHTNESS_WEIGHT
+        return numpy.sqrt((diff * diff).sum(axis=2))
+
+
+    # Find the lowest cost assignment of rows to columns
+    #
+    # This is the Hungarian algorithm. Each row is given a different
+    # column so the total cost is the smallest possible.
+    #
+    # Input:
+    #   cost        Array of costs, rows by columns, with no more rows
+    #               than columns
+    #
+    # Return:
+    #   A list with the column given to each row
+    #
+    def assign(self, cost):
+        rows, cols = cost.shape
+        u = numpy.zeros(rows + 1)
+        v = numpy.zeros(cols + 1)
+        # The row given to each column, 0 for none. Column 0 is a dummy
+        # column used to add the next row.
+        owner = numpy.zeros(cols + 1, dtype=int)
+        way = numpy.zeros(cols + 1, dtype=int)
+
+        for row in range(1, rows + 1):
+            owner[0] = row
+            col = 0
+            min_v = numpy.full(cols + 1, numpy.inf)
+            used = numpy.zeros(cols + 1, dtype=bool)
+            while (1):
+                used[col] = True
+                cur_row = owner[col]
+                reduced = cost[cur_row - 1] - u[cur_row] - v[1:]
+                free = ~used[1:]
+                better = free & (reduced < min_v[1:])
+                min_v[1:][better] = reduced[better]
+                way[1:][better] = col
+                masked = numpy.where(free, min_v[1:], numpy.inf)
+                next_col = int(numpy.argmin(masked)) + 1
+                delta = masked[next_col - 1]
+                u[owner[used]] += delta
+                v[used] -= delta
+                min_v[1:][free] -= delta
+                col = next_col
+                if (owner[col] == 0):
+                    break
+
+            # Move the rows along the path to make room for the new row
+            while (col != 0):
+                prev_col = way[col]
+                owner[col] = owner[prev_col]
+                col = prev_col
+
+        result = [0] * rows
+        for col in range(1, cols + 1):
+            if (owner[col] != 0):
+                result[owner[col] - 1] = col - 1
+        return result
+
+
+    # Estimate the center color of a face that wasn't scanned
+    #
+    # The square furthest from all known centers is used as the first
+    # guess. The guess is then moved to the average of the squares closer
+    # to it than to any known center. If no square is closer to it, as on
+    # a solved cube where the missing color is only on the missing face,
+    # the guess is kept.
+    #
+    # Inputs:
+    #   squares     Array of (L, a, b) colors of the scanned squares
+    #   centers     Array of (L, a, b) colors of the 6 centers
+    #   missing     The face number of the missing face
+    #
+    # Return:
+    #   The (L, a, b) color of the missing center
+    #
+    def guess_center(self, squares, centers, missing):
+        known = [face for face in range(0, 6) if (face != missing)]
+        dist = self.distances(squares, centers[known]).min(axis=1)
+        center = squares[numpy.argmax(dist)]
+        for step in range(0, MISSING_CENTER_STEPS):
+            centers[missing] = center
+            nearest = self.distances(squares, centers).argmin(axis=1)
+            closer = squares[nearest == missing]
+            if (len(closer) == 0):
+                break
+            center = closer.mean(axis=0)
+        return center
+
+
+    # Decide which face each square belongs to
+    #
+    # Inputs:
+    #   face_colors     List of 6 faces in the cube solver face order, each
+    #                   a list of the (r, g, b) colors of its 9 squares
+    #   missing         The face number of a face that wasn't scanned or
+    #                   None. Its colors are ignored.
+    #
+    # Return:
+    #   A tuple with the list of face numbers and the list of confidences,
+    #   0 to 1, for all 54 squares in the cube solver order. The squares
+    #   of the missing face besides its center have face number -1 and
+    #   confidence 0.
+    #
+    def classify(self, face_colors, missing=None):
+        colors = []
+        for face in range(0, 6):
+            if (face == missing):
+                colors += [(0.0, 0.0, 0.0)] * 9
+            else:
+                colors += face_colors[face]
+        lab = self.to_lab(colors)
+        centers = lab[4::9].copy()
+
+        # The centers set the face colors. The other squares are shared out
+        # with 8 going to each face. With a missing face each color has 8
+        # or fewer squares on the scanned faces.
+        others = [index for index in range(0, 54) \
+                  if ((index % 9 != 4) and (index // 9 != missing))]
+        if (missing is not None):
+            centers[missing] = self.guess_center(lab[others], centers, missing)
+        self.dist = self.distances(lab, centers)
+        dist = self.dist
+
+        slots = 8
+        cost = numpy.repeat(dist[others], slots, axis=1)
+        faces = [index // 9 for index in range(0, 54)]
+        if (missing is not None):
+            faces[missing * 9:missing * 9 + 9] = [-1] * 4 + [missing] + [-1] * 4
+        for index, col in zip(others, self.assign(cost)):
+            faces[index] = col // slots
+
+        # The confidence is how much closer the square is to its face than
+        # to the closest other face
+        confidence = []
+        for index in range(0, 54):
+            if (index // 9 == missing):
+                confidence.append(1.0 if (faces[index] == missing) else 0.0)
+                continue
+            chosen = dist[index, faces[index]]
+            other = numpy.delete(dist[index], faces[index]).min()
+            if (other <= 0.0):
+                confidence.append(0.0)
+            else:
+                confidence.append(max(0.0, 1.0 - chosen / other))
+            if ((DEBUG == 1) and (confidence[-1] < LOW_CONFIDENCE)):
+                print("Square " + str(index) + " confidence %.2f" % \
+                      confidence[-1])
+
+        return faces, confidence
@@ -9,16 +9,12 @@
 # body area.
 #
 
-# Import I2C pin information.
-import board
-import busio
+# Import I2C pin information and the SSD1306 display module library.
+from rubik_hw import board, busio, SSD1306_I2C
 
 # The Python Imaging Libary is used for drawing text into an image.
 from PIL import Image, ImageDraw, ImageFont
 
-# Import the SSD1306 display module library
-import adafruit_ssd1306
-
 
 # Rubik solver display class
 #
@@ -33,7 +29,7 @@ class RubikDisplay(object):
         self.i2c = busio.I2C(board.SCL, board.SDA)
 
         # Display driver
-        self.oled = adafruit_ssd1306.SSD1306_I2C(128, 64, self.i2c)
+        self.oled = SSD1306_I2C(128, 64, self.i2c)
 
         # Fonts used to draw text on the display
         self.font_small = ImageFont.truetype('Perfect DOS VGA 437.ttf', 16)
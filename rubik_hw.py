@@ -0,0 +1,76 @@
+#!/usr/bin/python
+
+#
+# This file selects the hardware used by the Rubik's cube solver code.
+#
+# Normally the real Raspberry Pi hardware libraries are used. The simulated
+# hardware in rubik_sim.py is used instead if the RUBIK_SIM environment
+# variable is set to 1 or the program is started with the --sim option.
+# For example "python rubik.py --sim".
+#
+# All code that needs hardware or waits for time to pass should get it from
+# here. In simulation the clock is virtual so sleeping just moves the
+# simulated time forward instead of waiting.
+#
+
+import os, sys
+import time
+
+
+# True when the simulated hardware is used
+SIMULATE = (os.environ.get("RUBIK_SIM", "0") == "1") or ("--sim" in sys.argv)
+
+
+# Real time clock
+#
+class RubikClock(object):
+    # Wait for a period of time
+    #
+    # Input:
+    #   seconds     The time to wait
+    #
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    # Get the current time in seconds
+    # The value only has meaning when compared to other values.
+    #
+    def monotonic(self):
+        return time.monotonic()
+
+    # Wait for a period of time or until an event is set
+    #
+    # Inputs:
+    #   event       The threading event to wait for
+    #   seconds     The longest time to wait
+    #
+    # Return:
+    #   True if the event is set
+    #
+    def wait(self, event, seconds):
+        if (seconds <= 0):
+            return event.is_set()
+        return event.wait(seconds)
+
+
+if SIMULATE:
+    from rubik_sim import board, busio, PCA9685, SSD1306_I2C, PiCamera, GPIO
+    from rubik_sim import clock
+else:
+    # I2C pin information and bus
+    import board
+    import busio
+
+    # PCA9685 PWM board that drives the servos
+    from adafruit_pca9685 import PCA9685
+
+    # SSD1306 display
+    from adafruit_ssd1306 import SSD1306_I2C
+
+    # Raspberry Pi camera library
+    from picamera import PiCamera
+
+    # GPIO pins used for the buttons
+    import RPi.GPIO as GPIO
+
+    clock = RubikClock()
@@ -0,0 +1,68 @@
+#!/usr/bin/python
+
+#
+# This class keeps track of when each servo will finish its current move.
+#
+# The servo move functions don't sleep after programming a servo. Instead
+# they record the time the servo will have settled. Before the next servo
+# is programmed only the servos it depends on are waited for. This lets
+# independent servo moves overlap and lets other work, like updating the
+# display, happen while the servos move.
+#
+
+# Clock used to wait for the servos
+from rubik_hw import clock
+
+
+# Servo names
+SERVOS = ['rt', 'rg', 'lt', 'lg']
+
+
+# Rubik solver servo motion timeline class
+#
+# Input:
+#   abort       The cancel token used to abort waiting
+#
+class RubikMotion(object):
+    def __init__(self, abort):
+        # Save the cancel token provided by the caller
+        self.abort = abort
+
+        # The time each servo will finish moving
+        self.busy_until = {}
+        for servo in SERVOS:
+            self.busy_until[servo] = 0.0
+
+
+    # Record that a servo started to move
+    #
+    # Inputs:
+    #   servo       Servo name ('rt', 'rg', 'lt' or 'lg')
+    #   delay       Time needed for the servo to move and settle (seconds)
+    #
+    def start(self, servo, delay):
+        self.busy_until[servo] = max(self.busy_until[servo], \
+                                     clock.monotonic() + delay)
+
+
+    # Wait until a group of servos have stopped moving
+    # Raises KeyboardInterrupt if the wait is aborted.
+    #
+    # Inputs:
+    #   servos      List of servo names
+    #   early       Stop waiting this long before the servos should be
+    #               done (seconds)
+    #
+    def wait(self, servos, early=0.0):
+        done = max([self.busy_until[servo] for servo in servos])
+        self.abort.sleep(done - early - clock.monotonic())
+
+
+    # Wait until all servos have stopped moving
+    #
+    # Input:
+    #   early       Stop waiting this long before the servos should be
+    #               done (seconds)
+    #
+    def wait_all(self, early=0.0):
+        self.wait(SERVOS, early)
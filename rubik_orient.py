@@ -0,0 +1,185 @@
+#!/usr/bin/python
+
+#
+# The code in this file describes the same cube as if it was held another
+# way up, or seen in a mirror.
+#
+# The solver library always solves the cube in the orientation it is given.
+# Turning the whole cube first gives the solver a different problem that
+# often has a shorter solution, or one the robot can do faster. The squares
+# are moved to where they would be after turning the whole cube and then
+# renamed after the centers they now share a face with. The moves of a
+# solution found this way are turned back into moves of the faces in the
+# original orientation.
+#
+# A mirror image of the cube works the same way except that every move also
+# turns the other way.
+#
+
+from operator import itemgetter
+
+# Set this to 0 to disable debug logging, 1 to enable.
+DEBUG = 0
+
+
+# Faces in the order used by the cube solver
+FACE_ORDER = "URFDLB"
+
+# Direction of each face from the cube center. x is towards R, y towards U
+# and z towards F.
+FACE_AXIS = {'U': (0, 1, 0), 'R': (1, 0, 0), 'F': (0, 0, 1), \
+             'D': (0, -1, 0), 'L': (-1, 0, 0), 'B': (0, 0, -1)}
+
+
+# Get the location of a square in the cube solver facelet order
+#
+# Input:
+#   index       Square number 0 to 53
+#
+# Return:
+#   A tuple with the square position and the direction it faces. The cube
+#   center is at 0, 0, 0 and the squares are at -1, 0 or 1 along each axis.
+#
+def facelet_location(index):
+    face = FACE_ORDER[index // 9]
+    row = (index % 9) // 3
+    col = index % 3
+    if (face == 'U'):
+        pos = (col - 1, 1, row - 1)
+    elif (face == 'R'):
+        pos = (1, 1 - row, 1 - col)
+    elif (face == 'F'):
+        pos = (col - 1, 1 - row, 1)
+    elif (face == 'D'):
+        pos = (col - 1, -1, 1 - row)
+    elif (face == 'L'):
+        pos = (-1, 1 - row, col - 1)
+    else: # face == 'B'
+        pos = (1 - col, 1 - row, -1)
+    return pos, FACE_AXIS[face]
+
+
+# Move a position by one whole cube turn or mirror
+#
+# Inputs:
+#   v           The (x, y, z) position
+#   step        'x', 'y' or 'z' to turn the whole cube clockwise looking
+#               at the R, U or F face, 'm' to swap the L and R sides
+#
+# Return:
+#   The new position
+#
+def transform(v, step):
+    x, y, z = v
+    if (step == 'x'):
+        return (x, z, -y)
+    elif (step == 'y'):
+        return (-z, y, x)
+    elif (step == 'z'):
+        return (y, -x, z)
+    else: # step == 'm'
+        return (-x, y, z)
+
+
+# Rubik's cube orientation class
+#
+# Input:
+#   steps       String of whole cube turns and mirrors done in order, for
+#               example "y" or "zm". An empty string keeps the cube as it is.
+#
+class RubikOrient(object):
+    def __init__(self, steps):
+        self.steps = steps
+
+        # True when the cube is seen in a mirror and the moves turn the
+        # other way
+        self.mirror = (steps.count('m') % 2 == 1)
+
+        # The square each square of the new cube comes from
+        squares = {}
+        for index in range(0, 54):
+            pos, normal = facelet_location(index)
+            for step in steps:
+                pos = transform(pos, step)
+                normal = transform(normal, step)
+            squares[(pos, normal)] = index
+        self.source = [squares[facelet_location(index)] \
+                       for index in range(0, 54)]
+        self.get_squares = itemgetter(*self.source)
+
+        # The original face that is now at each face. The centers don't
+        # move so this is the original name of each center square.
+        self.faces = {}
+        for face in FACE_ORDER:
+            center = self.source[FACE_ORDER.index(face) * 9 + 4]
+            self.faces[face] = FACE_ORDER[center // 9]
+
+        # Renames each square after the center now on its face. Every
+        # square of a cube definition string is named after its center so
+        # this is the same for every cube.
+        self.rename = str.maketrans("".join([self.faces[face] \
+                                             for face in FACE_ORDER]), \
+                                    FACE_ORDER)
+
+
+    # Describe a cube in this orientation
+    #
+    # Input:
+    #   cube_string     The 54 square cube definition string
+    #
+    # Return:
+    #   The cube definition string of the turned cube, with the squares
+    #   named after the face they are now on
+    #
+    def to_orient(self, cube_string):
+        return "".join(self.get_squares(cube_string)).translate(self.rename)
+
+
+    # Turn a solution of the original cube into moves of the cube in this
+    # orientation
+    #
+    # Input:
+    #   solve_string    The solution string for the original cube
+    #
+    # Return:
+    #   The solution string for the cube in this orientation
+    #
+    def to_orient_solution(self, solve_string):
+        if (solve_string.startswith("Error")):
+            return solve_string
+        names = {}
+        for face in FACE_ORDER:
+            names[self.faces[face]] = face
+        solve_array = solve_string.split(" ")
+        for step in range(0, len(solve_array) - 1):
+            turn = int(solve_array[step][1])
+            if (self.mirror):
+                turn = 4 - turn
+            solve_array[step] = names[solve_array[step][0]] + str(turn)
+        return " ".join(solve_array)
+
+
+    # Turn a solution of the cube in this orientation back into moves of the
+    # original cube
+    #
+    # Input:
+    #   solve_string    The solution string from the solver library
+    #
+    # Return:
+    #   The solution string for the original cube
+    #
+    def from_orient(self, solve_string):
+        if (solve_string.startswith("Error")):
+            return solve_string
+        solve_array = solve_string.split(" ")
+        # The last element is a count of the number of moves
+        for step in range(0, len(solve_array) - 1):
+            face = self.faces[solve_array[step][0]]
+            turn = int(solve_array[step][1])
+            if (self.mirror):
+                turn = 4 - turn
+            solve_array[step] = face + str(turn)
+        if(DEBUG == 1):
+            print(self.steps + " " + solve_string + " -> " + \
+                  " ".join(solve_array))
+        return " ".join(solve_array)
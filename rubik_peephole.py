@@ -0,0 +1,227 @@
+#!/usr/bin/python
+
+#
+# The code in this file removes wasted servo moves from a compiled cube
+# solution.
+#
+# The servo macro functions in rubik_servos.py each do one cube movement
+# without knowing what comes next. A macro often ends by closing a grip or
+# re-homing a gripper that the next macro immediately opens or turns back.
+#
+# The optimizer works on the flat list of servo moves recorded for the whole
+# solution. It slides a window of a few moves over the list and replaces
+# the moves in the window with the fastest sequence that ends in the same
+# state. This cancels close/open pairs and re-homes that are undone later.
+# The new moves still do the same cube moves in the same order and always
+# hold the cube. The rules for which servo moves are allowed come from the
+# motion planner.
+#
+# The motion planner already finds the fastest servo moves for the whole
+# solution, so this is only used as a fallback when the planner is turned
+# off with USE_PLANNER in rubik_solve.py.
+#
+
+import heapq
+
+# Servo positions
+from rubik_servos import T_POS_M90, T_POS_0, T_POS_P90, G_POS_CLOSED
+
+# Set this to 0 to disable debug logging, 1 to enable.
+DEBUG = 0
+
+
+# Number of servo moves looked at together
+PEEPHOLE_WINDOW = 10
+
+# Smallest time saving worth making a change for (seconds)
+MIN_SAVING = 0.0001
+
+# Position of each servo in a planner state
+STATE_INDEX = {'rt': 1, 'rg': 2, 'lt': 3, 'lg': 4}
+
+
+# Rubik's cube servo move optimizer class
+#
+# Inputs:
+#   serv        The servo controller class
+#   planner     The servo motion planner class
+#
+class RubikPeephole(object):
+    def __init__(self, serv, planner):
+        # Save the servo info provided by the caller
+        self.servos = serv
+        # Save the planner provided by the caller
+        self.planner = planner
+
+        # Servo move times from the planner
+        self.times = {}
+
+        # Shortest time needed for a solution move (seconds)
+        self.min_turn = 0.0
+
+
+    # Get the time needed for a servo move
+    #
+    # Inputs:
+    #   state       The planner state before the move
+    #   servo       Servo name ('rt', 'rg', 'lt' or 'lg')
+    #   pos         The new servo position
+    #
+    def move_time(self, state, servo, pos):
+        loaded = (servo[1] == 't') and \
+                 (state[STATE_INDEX[servo[0] + 'g']] == G_POS_CLOSED)
+        return self.times[(servo, state[STATE_INDEX[servo]], pos, loaded)]
+
+
+    # Do a single servo move
+    #
+    # Inputs:
+    #   state       The planner state before the move
+    #   servo       Servo name ('rt', 'rg', 'lt' or 'lg')
+    #   pos         The new servo position
+    #   moves       The list of solution moves
+    #
+    # Return:
+    #   The planner state after the move or None if the move isn't allowed
+    #
+    def next_state(self, state, servo, pos, moves):
+        for next_servo, next_pos, new_state in \
+                self.planner.next_states(state, moves):
+            if ((next_servo == servo) and (next_pos == pos)):
+                return new_state
+        return None
+
+
+    # Run a list of servo moves
+    #
+    # Inputs:
+    #   ops         List of (servo, position, step) servo moves
+    #   start       The planner state before the first move
+    #   moves       The list of solution moves
+    #
+    # Return:
+    #   A tuple with the list of states before each move and the list of
+    #   move times, or None if a move isn't allowed or the solution isn't
+    #   finished at the end
+    #
+    def run(self, ops, start, moves):
+        states = [start]
+        times = []
+        for servo, pos, step in ops:
+            state = self.next_state(states[-1], servo, pos, moves)
+            if (state is None):
+                return None
+            times.append(self.move_time(states[-1], servo, pos))
+            states.append(state)
+        if (states[-1][0] != len(moves)):
+            return None
+        return (states, times)
+
+
+    # Find the fastest servo moves between two states
+    #
+    # This is a shortest path search like the motion planner uses but only
+    # over the few solution moves between the two states. Every solution
+    # move left needs at least one loaded turn servo move and paths that
+    # can't beat the time limit are dropped early.
+    #
+    # Inputs:
+    #   start       The planner state to start from
+    #   end         The planner state to finish at
+    #   moves       The list of solution moves
+    #   limit       Only return a result faster than this (seconds)
+    #
+    # Return:
+    #   A tuple with the list of (servo, position, step) servo moves and
+    #   their time, or None if nothing faster than the limit was found
+    #
+    def shortest(self, start, end, moves, limit):
+        cost = {start: 0.0}
+        prev = {start: None}
+        queue = [(0.0, 0, start)]
+        count = 1
+
+        while (len(queue) > 0):
+            state_cost, n, state = heapq.heappop(queue)
+            if (state_cost > cost[state]):
+                # A faster path to this state was already found
+                continue
+            if (state == end):
+                path = []
+                while (prev[state] is not None):
+                    state, servo, pos = prev[state]
+                    path.append((servo, pos, state[0]))
+                path.reverse()
+                return (path, state_cost)
+
+            for servo, pos, new_state in self.planner.next_states(state, moves):
+                if (new_state[0] > end[0]):
+                    continue
+                new_cost = state_cost + self.move_time(state, servo, pos)
+                if (new_cost + (end[0] - new_state[0]) * self.min_turn >= \
+                    limit - MIN_SAVING):
+                    continue
+                if ((new_state not in cost) or (new_cost < cost[new_state])):
+                    cost[new_state] = new_cost
+                    prev[new_state] = (state, servo, pos)
+                    heapq.heappush(queue, (new_cost, count, new_state))
+                    count += 1
+
+        return None
+
+
+    # Remove wasted servo moves from a compiled solution
+    #
+    # Inputs:
+    #   ops             List of (servo, position, step) servo moves
+    #   solve_string    The solution the servo moves were compiled from
+    #   face_l          The face held by the left gripper at the start
+    #   face_r          The face held by the right gripper at the start
+    #
+    # Return:
+    #   A tuple with the new list of servo moves, the total servo time and
+    #   the faces held by the left and right grippers at the end, the same
+    #   as the motion planner. None is returned if the original servo moves
+    #   don't do the solution.
+    #
+    def optimize(self, ops, solve_string, face_l, face_r):
+        self.times = self.planner.move_times()
+        moves = self.planner.parse_moves(solve_string)
+        start = (0, self.servos.rt_pos, self.servos.rg_pos, \
+                 self.servos.lt_pos, self.servos.lg_pos, face_l, face_r)
+        result = self.run(ops, start, moves)
+        if (result is None):
+            print("Peephole skipped, servo moves don't match the solution")
+            return None
+        states, times = result
+        old_count = len(ops)
+        old_time = sum(times)
+
+        # Every solution move needs at least one loaded turn servo move
+        self.min_turn = min([self.times[(servo, T_POS_0, pos, True)] \
+                             for servo in ['rt', 'lt'] \
+                             for pos in [T_POS_M90, T_POS_P90]])
+
+        # Slide a window over the list and replace the moves in it with
+        # faster ones when possible. The window is tried at the same place
+        # again after a change since the new moves may allow more changes.
+        # A saving inside a smaller window is also a saving for the full
+        # window so only the full window is searched.
+        index = 0
+        while (index < len(ops) - 1):
+            end = min(len(ops), index + PEEPHOLE_WINDOW)
+            result = self.shortest(states[index], states[end], moves, \
+                                   sum(times[index:end]))
+            if (result is None):
+                index += 1
+                continue
+            if(DEBUG == 1):
+                print("Peephole " + str(ops[index:end]) + \
+                      " -> " + str(result[0]))
+            ops = ops[:index] + result[0] + ops[end:]
+            states, times = self.run(ops, start, moves)
+
+        new_time = sum(times)
+        print("Peephole removed %d of %d servo moves, %.2f of %.2f s" % \
+              (old_count - len(ops), old_count, old_time - new_time, old_time))
+        return (ops, new_time, states[-1][5], states[-1][6])
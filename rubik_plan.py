@@ -0,0 +1,273 @@
+#!/usr/bin/python
+
+#
+# The code in this file plans the servo movements needed to do all the moves
+# of a cube solution.
+#
+# The servo macro functions in rubik_servos.py each do one cube movement
+# using fixed rules for re-gripping the cube. This is simple but the
+# grippers often end up in a position that makes the next movement slow.
+#
+# The planner instead looks at the whole solution at once. It searches all
+# possible single servo movements to find the sequence that does all the
+# solution moves in the shortest total servo time.
+#
+# The search state is the position of all 4 servos plus the faces held by
+# the two grippers. Only the servo move functions are used so the result
+# can be run directly by the servo controller class.
+#
+
+import heapq
+
+import my_exceptions
+
+# Servo positions
+from rubik_servos import T_POS_M90, T_POS_0, T_POS_P90
+from rubik_servos import G_POS_OPEN, G_POS_CLOSED
+
+
+# Set this to 0 to disable debug logging, 1 to enable.
+DEBUG = 0
+
+
+# All positions of the turn servos
+TURN_POSITIONS = [T_POS_M90, T_POS_0, T_POS_P90]
+
+
+# Rubik's cube servo motion planner class
+#
+# Inputs:
+#   serv        The servo controller class
+#   faces       Function that lists the 4 faces reachable by a cube turn
+#               from a face held in a gripper, in clockwise order
+#
+class RubikPlan(object):
+    def __init__(self, serv, faces):
+        # Save the servo info provided by the caller
+        self.servos = serv
+        # Save the face list function provided by the caller
+        self.get_faces = faces
+
+
+    # Split a solution string into a list of moves
+    #
+    # Input:
+    #   solve_string    The solution string from the cube solver
+    #
+    # Return:
+    #   A list of (face, turn) tuples
+    #
+    def parse_moves(self, solve_string):
+        moves = []
+        solve_array = solve_string.split(" ")
+        if (len(solve_array) == 1):
+            return moves
+
+        # Skip the last element because it's a count of the number of moves.
+        for step in range(0, len(solve_array) - 1):
+            next_chars = solve_array[step]
+            moves.append((next_chars[0], int(next_chars[1])))
+        return moves
+
+
+    # Get the face held by the other gripper after a cube rotation
+    #
+    # Inputs:
+    #   held        The face held in the gripper turning the cube
+    #   other       The face held in the other gripper
+    #   quarters    Number of 90 degree gripper turns, clockwise is positive
+    #
+    def rotate_face(self, held, other, quarters):
+        face_list = self.get_faces(held)
+        return face_list[(face_list.index(other) + quarters) % 4]
+
+
+    # List all the single servo movements allowed from a state
+    #
+    # The cube must always be held by at least one gripper and a gripper
+    # can only turn the cube or a face when the other gripper is horizontal.
+    #
+    # Inputs:
+    #   state       (step, rt, rg, lt, lg, face_l, face_r)
+    #   moves       The list of solution moves
+    #
+    # Return:
+    #   A list of (servo, position, new state) tuples
+    #
+    def next_states(self, state, moves):
+        step, rt, rg, lt, lg, face_l, face_r = state
+        result = []
+
+        # Grip servos
+        if (rg != G_POS_CLOSED):
+            result.append(('rg', G_POS_CLOSED, \
+                           (step, rt, G_POS_CLOSED, lt, lg, face_l, face_r)))
+        elif (lg == G_POS_CLOSED):
+            result.append(('rg', G_POS_OPEN, \
+                           (step, rt, G_POS_OPEN, lt, lg, face_l, face_r)))
+        if (lg != G_POS_CLOSED):
+            result.append(('lg', G_POS_CLOSED, \
+                           (step, rt, rg, lt, G_POS_CLOSED, face_l, face_r)))
+        elif (rg == G_POS_CLOSED):
+            result.append(('lg', G_POS_OPEN, \
+                           (step, rt, rg, lt, G_POS_OPEN, face_l, face_r)))
+
+        # Right turn servo
+        for pos in TURN_POSITIONS:
+            if (pos == rt):
+                continue
+            quarters = pos - rt
+            if (rg != G_POS_CLOSED):
+                # Reposition the gripper while the left gripper holds the cube
+                if (lg == G_POS_CLOSED):
+                    result.append(('rt', pos, \
+                                   (step, pos, rg, lt, lg, face_l, face_r)))
+            elif (lt != T_POS_0):
+                # The left gripper is in the way
+                continue
+            elif (lg == G_POS_CLOSED):
+                # Turn the face held by the right gripper.
+                # Turning the gripper clockwise turns the face
+                # counterclockwise.
+                if ((step < len(moves)) and \
+                    (moves[step] == (face_r, (-quarters) % 4))):
+                    result.append(('rt', pos, \
+                                   (step + 1, pos, rg, lt, lg, face_l, face_r)))
+            else:
+                # Turn the entire cube
+                new_l = self.rotate_face(face_r, face_l, quarters)
+                result.append(('rt', pos, \
+                               (step, pos, rg, lt, lg, new_l, face_r)))
+
+        # Left turn servo
+        for pos in TURN_POSITIONS:
+            if (pos == lt):
+                continue
+            quarters = pos - lt
+            if (lg != G_POS_CLOSED):
+                # Reposition the gripper while the right gripper holds the cube
+                if (rg == G_POS_CLOSED):
+                    result.append(('lt', pos, \
+                                   (step, rt, rg, pos, lg, face_l, face_r)))
+            elif (rt != T_POS_0):
+                # The right gripper is in the way
+                continue
+            elif (rg == G_POS_CLOSED):
+                # Turn the face held by the left gripper
+                if ((step < len(moves)) and \
+                    (moves[step] == (face_l, (-quarters) % 4))):
+                    result.append(('lt', pos, \
+                                   (step + 1, rt, rg, pos, lg, face_l, face_r)))
+            else:
+                # Turn the entire cube
+                new_r = self.rotate_face(face_l, face_r, quarters)
+                result.append(('lt', pos, \
+                               (step, rt, rg, pos, lg, face_l, new_r)))
+
+        return result
+
+
+    # Get the time of every servo movement the planner uses
+    #
+    # The turn servo times depend on whether the gripper holds the cube.
+    #
+    # Return:
+    #   A dictionary of times in seconds indexed by (servo, start, end,
+    #   loaded). Loaded is always False for the grip servos.
+    #
+    def move_times(self):
+        times = {}
+        for servo in ['rt', 'lt']:
+            for start in TURN_POSITIONS:
+                for end in TURN_POSITIONS:
+                    for loaded in [False, True]:
+                        times[(servo, start, end, loaded)] = \
+                            self.servos.move_time(servo, start, end, loaded)
+        for servo in ['rg', 'lg']:
+            for start in [G_POS_OPEN, G_POS_CLOSED]:
+                for end in [G_POS_OPEN, G_POS_CLOSED]:
+                    times[(servo, start, end, False)] = \
+                        self.servos.move_time(servo, start, end)
+        return times
+
+
+    # Find the fastest servo movement sequence for a cube solution
+    #
+    # This is a shortest path search where the path cost is the total
+    # servo move time.
+    #
+    # Inputs:
+    #   solve_string    The sequence of moves to be done to solve the cube
+    #   face_l          The face currently held by the left gripper
+    #   face_r          The face currently held by the right gripper
+    #
+    # Return:
+    #   A tuple with the list of (servo, position, step) movements, the
+    #   total servo time and the faces held by the left and right grippers
+    #   at the end. The step is the index of the solution move the servo
+    #   movement is working on.
+    #
+    def plan(self, solve_string, face_l, face_r):
+        moves = self.parse_moves(solve_string)
+
+        # Servo move times used as the path cost.
+        times = self.move_times()
+
+        # Every remaining move needs at least one loaded turn servo movement.
+        # This is used as the lower bound of the remaining cost.
+        min_turn = min([times[('rt', T_POS_0, T_POS_P90, True)], \
+                        times[('rt', T_POS_0, T_POS_M90, True)], \
+                        times[('lt', T_POS_0, T_POS_P90, True)], \
+                        times[('lt', T_POS_0, T_POS_M90, True)]])
+
+        start = (0, self.servos.rt_pos, self.servos.rg_pos, \
+                 self.servos.lt_pos, self.servos.lg_pos, face_l, face_r)
+        index = {'rt': 1, 'rg': 2, 'lt': 3, 'lg': 4}
+        grip = {'rt': 2, 'rg': 0, 'lt': 4, 'lg': 0}
+
+        cost = {start: 0.0}
+        prev = {start: None}
+        queue = [(len(moves) * min_turn, 0, start)]
+        count = 1
+        end = None
+
+        while (len(queue) > 0):
+            estimate, n, state = heapq.heappop(queue)
+            if (state[0] == len(moves)):
+                end = state
+                break
+            state_cost = cost[state]
+            if (estimate > state_cost + (len(moves) - state[0]) * min_turn):
+                # A faster path to this state was already found
+                continue
+
+            for servo, pos, new_state in self.next_states(state, moves):
+                loaded = (grip[servo] != 0) and \
+                         (state[grip[servo]] == G_POS_CLOSED)
+                new_cost = state_cost + \
+                           times[(servo, state[index[servo]], pos, loaded)]
+                if ((new_state not in cost) or (new_cost < cost[new_state])):
+                    cost[new_state] = new_cost
+                    prev[new_state] = (state, servo, pos)
+                    heapq.heappush(queue, \
+                        (new_cost + (len(moves) - new_state[0]) * min_turn, \
+                         count, new_state))
+                    count += 1
+
+        if (end is None):
+            raise my_exceptions.FaceException('No servo plan found')
+
+        # Walk back from the end state to get the servo movements
+        path = []
+        state = end
+        while (prev[state] is not None):
+            state, servo, pos = prev[state]
+            path.append((servo, pos, state[0]))
+        path.reverse()
+
+        if(DEBUG == 1):
+            print("Plan " + str(len(moves)) + " moves, " + \
+                  str(len(path)) + " servo moves, " + \
+                  "%.2f seconds" % cost[end])
+
+        return path, cost[end], end[5], end[6]
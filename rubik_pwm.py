@@ -0,0 +1,122 @@
+#!/usr/bin/python
+
+#
+# This class writes servo PWM values to the PCA9685 PWM controller.
+#
+# The Adafruit library writes one channel per I2C transaction. This class
+# keeps a copy of the value in every channel register so writes that
+# wouldn't change anything are skipped. Changes to several channels can
+# also be sent together in a single I2C transaction using the PCA9685
+# register auto increment mode.
+#
+# The display is on the same I2C bus so less servo traffic also makes
+# display updates faster.
+#
+
+
+# PCA9685 registers
+MODE1_AI    = 0x20  # MODE1 register auto increment bit
+LED0_ON_L   = 0x06  # First channel register
+CHANNEL_REG = 4     # Number of registers for each channel
+NUM_CHANNELS = 16
+
+
+# Rubik solver PWM output class
+#
+# Input:
+#   pca         The Adafruit PCA9685 driver class
+#
+class RubikPwm(object):
+    def __init__(self, pca):
+        # Save the PWM driver provided by the caller
+        self.pca = pca
+
+        # Enable register auto increment so several channels can be written
+        # in one transaction. The restart bit is cleared so writing MODE1
+        # doesn't restart the PWM outputs.
+        self.pca.mode1_reg = (self.pca.mode1_reg & 0x7F) | MODE1_AI
+
+        # Copy of the PWM count in each channel register.
+        # None means the register value is unknown.
+        self.shadow = [None] * NUM_CHANNELS
+
+        # Channel values waiting to be written
+        self.pending = {}
+
+        # I2C statistics
+        self.transactions = 0   # Number of I2C write transactions
+        self.bytes_sent = 0     # Number of bytes written
+        self.skipped = 0        # Number of channel writes not needed
+
+
+    # Set the value of a channel
+    #
+    # The value isn't sent to the hardware until commit() is called.
+    #
+    # Inputs:
+    #   port    PWM channel number
+    #   pwm     12 bit PWM count
+    #
+    def set_value(self, port, pwm):
+        if ((self.shadow[port] == pwm) and (port not in self.pending)):
+            self.skipped += 1
+        else:
+            self.pending[port] = pwm
+
+
+    # Write all changed channels to the hardware
+    #
+    # Consecutive channels are written in one transaction. A gap between
+    # changed channels is filled with the unchanged register values if they
+    # are known, so usually all changes go out in a single transaction.
+    #
+    def commit(self):
+        # Drop values that match the hardware
+        for port in list(self.pending):
+            if (self.pending[port] == self.shadow[port]):
+                del self.pending[port]
+                self.skipped += 1
+        if (len(self.pending) == 0):
+            return
+
+        ports = sorted(self.pending)
+        first = ports[0]
+        values = []
+        for port in range(ports[0], ports[-1] + 1):
+            if (port in self.pending):
+                values.append(self.pending[port])
+            elif (self.shadow[port] is not None):
+                values.append(self.shadow[port])
+            else:
+                # The gap value isn't known so end this transaction
+                if (len(values) > 0):
+                    self.write_channels(first, values)
+                values = []
+                first = port + 1
+        if (len(values) > 0):
+            self.write_channels(first, values)
+
+        self.pending = {}
+
+
+    # Write a group of consecutive channels in one I2C transaction
+    #
+    # Each channel has a 12 bit ON count and a 12 bit OFF count. The ON
+    # count is always 0 so the output turns on at the start of the cycle.
+    #
+    # Inputs:
+    #   first   First channel number
+    #   values  List of PWM counts for the consecutive channels
+    #
+    def write_channels(self, first, values):
+        buf = bytearray([LED0_ON_L + (first * CHANNEL_REG)])
+        for pwm in values:
+            buf += bytearray([0, 0, pwm & 0xFF, (pwm >> 8) & 0x0F])
+
+        with self.pca.i2c_device as i2c:
+            i2c.write(buf)
+
+        for index in range(0, len(values)):
+            self.shadow[first + index] = values[index]
+        self.transactions += 1
+        self.bytes_sent += len(buf)
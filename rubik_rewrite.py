@@ -0,0 +1,156 @@
+#!/usr/bin/python
+
+#
+# The code in this file rewrites a cube solution before it is carried out
+# so the robot needs fewer cube rotations.
+#
+# Moves on opposite faces (U/D, L/R and F/B) don't affect each other so
+# they can be done in either order. Moves on the same face next to each
+# other, or only separated by moves on the opposite face, can be combined
+# into a single move or cancel out completely.
+#
+# The robot can only turn the faces held by its two grippers. Any other face
+# needs a cube rotation first. The order of each pair of opposite face moves
+# is chosen so the fewest cube rotations are needed for the whole solution.
+#
+
+# Set this to 0 to disable debug logging, 1 to enable.
+DEBUG = 0
+
+
+# The face on the opposite side of the cube from each face
+OPPOSITE = {'U': 'D', 'D': 'U', 'R': 'L', 'L': 'R', 'F': 'B', 'B': 'F'}
+
+
+# Rubik's cube solution rewrite class
+#
+# Input:
+#   faces       Function that lists the 4 faces reachable by a cube turn
+#               from a face held in a gripper, in clockwise order
+#
+class RubikRewrite(object):
+    def __init__(self, faces):
+        # Save the face list function provided by the caller
+        self.get_faces = faces
+
+
+    # Split a solution into groups of moves that can be done in any order
+    #
+    # Same face moves in a group are combined and moves that cancel out
+    # are removed.
+    #
+    # Input:
+    #   moves       List of (face, turn) tuples
+    #
+    # Return:
+    #   A list of groups. Each group is a list of one or two (face, turn)
+    #   tuples on opposite faces.
+    #
+    def group_moves(self, moves):
+        groups = []
+        for face, turn in moves:
+            if ((len(groups) > 0) and \
+                (groups[-1][0][0] in [face, OPPOSITE[face]])):
+                groups[-1].append((face, turn))
+            else:
+                groups.append([(face, turn)])
+
+            # Combine the moves on each face of the last group
+            group = []
+            for next_face, next_turn in groups[-1]:
+                faces = [move[0] for move in group]
+                if (next_face in faces):
+                    index = faces.index(next_face)
+                    group[index] = (next_face, \
+                                    (group[index][1] + next_turn) % 4)
+                else:
+                    group.append((next_face, next_turn))
+            group = [move for move in group if (move[1] != 0)]
+
+            if (len(group) > 0):
+                groups[-1] = group
+            else:
+                # The moves cancelled out. The next move may join the
+                # group before this one.
+                groups.pop()
+
+        return groups
+
+
+    # Find the faces held by the grippers after a move
+    #
+    # This follows the rules used when solving one move at a time. If
+    # neither gripper holds the face the cube is rotated with the left
+    # gripper if that puts the face in the right gripper, otherwise it is
+    # rotated with the right gripper.
+    #
+    # Inputs:
+    #   face        The face to turn
+    #   face_l      The face held by the left gripper
+    #   face_r      The face held by the right gripper
+    #
+    # Return:
+    #   A tuple with the number of cube rotations needed and the faces
+    #   held by the left and right grippers after the move
+    #
+    def do_move(self, face, face_l, face_r):
+        if (face in [face_l, face_r]):
+            return (0, face_l, face_r)
+        if (face in self.get_faces(face_l)):
+            return (1, face_l, face)
+        return (1, face, face_r)
+
+
+    # Rewrite a solution to need fewer cube rotations
+    #
+    # Inputs:
+    #   solve_string    The solution string from the cube solver
+    #   face_l          The face held by the left gripper at the start
+    #   face_r          The face held by the right gripper at the start
+    #
+    # Return:
+    #   The new solution string in the same format
+    #
+    def rewrite(self, solve_string, face_l, face_r):
+        solve_array = solve_string.split(" ")
+        if ((len(solve_array) == 1) or solve_string.startswith("Error")):
+            return solve_string
+
+        # Skip the last element because it's a count of the number of moves.
+        moves = []
+        for next_chars in solve_array[:-1]:
+            moves.append((next_chars[0], int(next_chars[1])))
+        groups = self.group_moves(moves)
+
+        # Try both orders of each group, keeping the best move list for
+        # each possible gripper state.
+        best = {(face_l, face_r): (0, [])}
+        for group in groups:
+            orders = [group]
+            if (len(group) == 2):
+                orders.append([group[1], group[0]])
+
+            new_best = {}
+            for state in best:
+                rotations, result = best[state]
+                for order in orders:
+                    count = rotations
+                    new_l, new_r = state
+                    for face, turn in order:
+                        n, new_l, new_r = self.do_move(face, new_l, new_r)
+                        count += n
+                    if (((new_l, new_r) not in new_best) or \
+                        (count < new_best[(new_l, new_r)][0])):
+                        new_best[(new_l, new_r)] = (count, result + order)
+            best = new_best
+
+        rotations, result = min(best.values(), key=lambda value: value[0])
+        new_string = " ".join([face + str(turn) for face, turn in result])
+        new_string += " (" + str(len(result)) + "f)"
+        if (len(result) == 0):
+            new_string = new_string.strip()
+
+        if(DEBUG == 1):
+            print("Rewrite " + solve_string + " -> " + new_string + \
+                  ", " + str(rotations) + " cube rotations")
+        return new_string
@@ -0,0 +1,234 @@
+#!/usr/bin/python
+
+#
+# The code in this file reads the colors of the squares from a picture of a
+# cube face.
+#
+# Each picture is decoded once. The camera pictures are much larger than
+# needed to read 9 colors so the JPEG decoder is asked to decode a smaller
+# image when the sample areas are still big enough. Only the part of the
+# image around the squares is copied into an array. The sample areas of all
+# 9 squares are then cut out of the array and averaged in a single step.
+#
+
+import math
+
+# Needed to read the image pixels as an array
+import numpy
+
+# Needed for reading pixel values from images
+from PIL import Image
+
+
+# Set this to 0 to disable debug logging, 1 to enable.
+DEBUG = 0
+
+
+# Width of the area averaged around each square center, in full resolution
+# image pixels
+SAMPLE_SIZE = 5
+
+# Shape of the sample area, "square" or "circle"
+SAMPLE_SHAPE = "square"
+
+# How the sample area pixels are combined, "mean" or "median".
+# The median ignores a few odd pixels like a reflection or a sticker edge.
+SAMPLE_METHOD = "mean"
+
+# Set this to 1 to let the JPEG decoder make a smaller image.
+# The image is made as small as possible while each sample area is still at
+# least SAMPLE_MIN_SIZE pixels wide.
+SAMPLE_DRAFT = 1
+SAMPLE_MIN_SIZE = 2
+
+
+# Rubik's cube image color sampler class
+#
+class RubikSample(object):
+    def __init__(self):
+        # Pixel offsets of the sample area, indexed by the area width
+        self.offsets = {}
+
+
+    # Get the pixel offsets of a sample area
+    #
+    # Input:
+    #   size        The area width in pixels
+    #
+    # Return:
+    #   A tuple with arrays of the y and x offsets from the center pixel
+    #
+    def get_offsets(self, size):
+        if (size not in self.offsets):
+            steps = numpy.arange(size) - (size - 1) // 2
+            dy, dx = numpy.meshgrid(steps, steps, indexing='ij')
+            dy = dy.ravel()
+            dx = dx.ravel()
+            if ((SAMPLE_SHAPE == "circle") and (size > 2)):
+                # Keep the pixels inside the circle around the center
+                radius = (size - 1) / 2.0
+                keep = (dy * dy + dx * dx) <= (radius * radius + 0.5)
+                dy = dy[keep]
+                dx = dx[keep]
+            self.offsets[size] = (dy, dx)
+        return self.offsets[size]
+
+
+    # Decode a face image
+    #
+    # Inputs:
+    #   file        The image file name or a file object
+    #   size        The sample area width in image pixels
+    #
+    # Return:
+    #   A tuple with the decoded image and the scale from image coordinates
+    #   to decoded image coordinates
+    #
+    def load(self, file, size):
+        im = Image.open(file)
+        width, height = im.size
+        if (SAMPLE_DRAFT == 1):
+            scale = min(1.0, float(SAMPLE_MIN_SIZE) / size)
+            im.draft('RGB', (int(math.ceil(width * scale)), \
+                             int(math.ceil(height * scale))))
+        im = im.convert('RGB')
+        return im, float(im.size[0]) / width
+
+
+    # Get the pixel locations of every sample area
+    #
+    # Inputs:
+    #   locs        List of (x, y) pixel locations
+    #   scale       Scale from the locations to image coordinates
+    #   size        The sample area width before scaling
+    #   width       The image width in pixels
+    #   height      The image height in pixels
+    #
+    # Return:
+    #   A tuple with arrays of the x and y pixel coordinates, one row for
+    #   each location
+    #
+    def get_areas(self, locs, scale, size, width, height):
+        size = max(1, int(size * scale + 0.5))
+        dy, dx = self.get_offsets(size)
+        centers = (numpy.array(locs, dtype=float) * scale).astype(int)
+        xs = numpy.clip(centers[:, 0][:, None] + dx[None, :], 0, width - 1)
+        ys = numpy.clip(centers[:, 1][:, None] + dy[None, :], 0, height - 1)
+        return xs, ys
+
+
+    # Combine the pixels of each sample area into a single color
+    #
+    # Input:
+    #   areas       Array of sample area pixels, one row for each area
+    #
+    # Return:
+    #   A list of (r, g, b) colors, one for each area
+    #
+    def combine(self, areas):
+        areas = areas.astype(float)
+        if (SAMPLE_METHOD == "median"):
+            colors = numpy.median(areas, axis=1)
+        else:
+            colors = areas.mean(axis=1)
+
+        if(DEBUG == 1):
+            print("Sampled " + str(areas.shape[0]) + " areas of " + \
+                  str(areas.shape[1]) + " pixels")
+        return [tuple(color) for color in colors.tolist()]
+
+
+    # Get how much the pixels of each sample area differ from each other
+    #
+    # An area that isn't all one color, like one on a sticker edge or a
+    # reflection, has a large spread and its color can't be trusted.
+    #
+    # Input:
+    #   areas       Array of sample area pixels, one row for each area
+    #
+    # Return:
+    #   A list with the standard deviation of each area, averaged over the
+    #   3 colors
+    #
+    def spread(self, areas):
+        return areas.astype(float).std(axis=1).mean(axis=1).tolist()
+
+
+    # Read the color around a list of points in a face image file
+    #
+    # Inputs:
+    #   file        The image file name or a file object
+    #   locs        List of (x, y) image pixel locations
+    #   size        The sample area width in image pixels
+    #
+    # Return:
+    #   A list of (r, g, b) colors, one for each location
+    #
+    def sample(self, file, locs, size=SAMPLE_SIZE):
+        im, scale = self.load(file, size)
+        xs, ys = self.get_areas(locs, scale, size, im.size[0], im.size[1])
+
+        # Only copy the part of the image with the sample areas in it
+        left = int(xs.min())
+        top = int(ys.min())
+        pixels = numpy.asarray(im.crop((left, top, int(xs.max()) + 1, \
+                                        int(ys.max()) + 1)))
+        return self.combine(pixels[ys - top, xs - left])
+
+
+    # Get how blurred the borders between the squares of a face are
+    #
+    # The squares are separated by dark gaps. The brightness is read along
+    # the line between the centers of each two squares next to each other.
+    # In a sharp picture it drops from the square to the gap and back again
+    # in a few pixels. Movement spreads the change over many pixels. The
+    # part of the line between 20% and 80% of the way from the gap to the
+    # square is used, which doesn't depend on the square colors. The
+    # brightest of the 3 colors is used so every square color is bright.
+    #
+    # Inputs:
+    #   pixels      Array of RGB pixels, rows by columns by 3
+    #   locs        List of the 9 (x, y) square centers in rows from the top
+    #               left
+    #
+    # Return:
+    #   The average fraction of each line that is part of an edge
+    #
+    def edge_width(self, pixels, locs):
+        pairs = [(i, i + 1) for i in range(0, 9) if (i % 3 != 2)] + \
+                [(i, i + 3) for i in range(0, 6)]
+        total = 0.0
+        for a, b in pairs:
+            (xa, ya), (xb, yb) = locs[a], locs[b]
+            count = int(max(abs(xb - xa), abs(yb - ya))) + 1
+            steps = numpy.linspace(0.0, 1.0, count)
+            xs = numpy.clip((xa + (xb - xa) * steps).astype(int), 0, \
+                            pixels.shape[1] - 1)
+            ys = numpy.clip((ya + (yb - ya) * steps).astype(int), 0, \
+                            pixels.shape[0] - 1)
+            line = pixels[ys, xs].astype(float).max(axis=1)
+
+            # Compare each half with the square at its end
+            gap = line.min()
+            square = numpy.where(steps < 0.5, line[0], line[-1])
+            level = (line - gap) / numpy.maximum(square - gap, 1.0)
+            total += ((level > 0.2) & (level < 0.8)).mean()
+        return total / len(pairs)
+
+
+    # Read the color around a list of points in a captured RGB frame
+    #
+    # Inputs:
+    #   pixels      Array of RGB pixels, rows by columns by 3
+    #   locs        List of (x, y) frame pixel locations
+    #   size        The sample area width in frame pixels
+    #
+    # Return:
+    #   A tuple with the list of (r, g, b) colors and the list of color
+    #   spreads, one for each location
+    #
+    def sample_array(self, pixels, locs, size=SAMPLE_SIZE):
+        xs, ys = self.get_areas(locs, 1.0, size, pixels.shape[1], \
+                                pixels.shape[0])
+        areas = pixels[ys, xs]
+        return self.combine(areas), self.spread(areas)
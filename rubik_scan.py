@@ -9,17 +9,42 @@
 # Needed for file access and math functions
 import os, math
 
-from time import sleep
+# Used to save the images in the background
+import threading
 
-# Needed for reading pixel values from images
+# Used to analyse the images while the servos move
+import concurrent.futures
+
+# Needed for the image buffers
+import numpy
+
+# Needed for saving images
 from PIL import Image
 
-# Raspberry Pi camera library
-from picamera import PiCamera
+# Camera session class
+from rubik_camera import RubikCamera
 
 # Display controller class
 from rubik_display import RubikDisplay
 
+# Servo positions
+from rubik_servos import T_POS_0, G_POS_CLOSED
+
+# Servo motion planner class
+from rubik_plan import RubikPlan
+
+# Scan planner class
+from rubik_scan_plan import RubikScanPlan, FACE_ORDER
+
+# Image color sampler class
+from rubik_sample import RubikSample, SAMPLE_SIZE
+
+# Square color classifier class
+from rubik_color import RubikColor, LOW_CONFIDENCE
+
+# Cube state validator class
+from rubik_validate import RubikValidate
+
 
 # The image size for my camera
 IMG_WIDTH = 3280
@@ -29,6 +54,105 @@ IMG_HIGHT = 2464
 # Set this to 0 to disable debug logging, 1 to enable.
 DEBUG = 0
 
+# Set this to 1 to plan the fastest order to take pictures of the sides.
+# Set this to 0 to use a fixed order.
+USE_SCAN_PLAN = 1
+
+# Set this to 1 to capture the images into memory buffers that are read
+# directly by the color analysis. Set this to 0 to capture JPEG files in
+# the Cube directory and read them back.
+USE_MEMORY_CAPTURE = 1
+
+# Set this to 1 to also save the memory images as files in the Cube
+# directory. They are saved in the background after the scan.
+SAVE_IMAGES = 1
+
+# Set this to 1 to only capture the part of the picture around the squares,
+# at the lowest resolution that still leaves ROI_SAMPLE_SIZE pixels across
+# each sample area. Set this to 0 to capture the full picture.
+USE_ROI_CAPTURE = 1
+
+# Space kept around the squares in the reduced picture (full resolution
+# pixels)
+ROI_MARGIN = 300
+
+# Smallest sample area width in the reduced picture (pixels)
+ROI_SAMPLE_SIZE = 3
+
+# Largest color spread of a sample area in a reduced picture that is still
+# trusted. The face is captured again at full resolution if a sample area
+# spreads more than this. Only checked with USE_MEMORY_CAPTURE.
+ROI_MAX_SPREAD = 12.0
+
+# Set this to 1 to read the colors of each face in a background thread while
+# the servos move the cube to the next face. Set this to 0 to read all faces
+# after the scan.
+USE_ANALYSIS_POOL = 1
+
+# Number of background threads reading face colors
+ANALYSIS_WORKERS = 2
+
+# Set this to 1 to share out the squares between the faces in the Lab color
+# space so there are always 9 of each color. Set this to 0 to match each
+# square to the closest center in RGB and fail if the counts are wrong.
+USE_COLOR_ASSIGNMENT = 1
+
+# Set this to 1 to check that the scanned cube can be solved and repair the
+# colors of a few squares if it can't.
+USE_VALIDATE = 1
+
+# Set this to 1 to take new pictures of the faces with the least certain
+# square colors if the scanned cube can't be solved. The new pictures are
+# taken at full resolution without reloading the cube. Only used with
+# USE_COLOR_ASSIGNMENT.
+USE_RESCAN = 1
+
+# Most times the faces are scanned again
+RESCAN_TRIES = 1
+
+# Most faces scanned again each time
+RESCAN_MAX_FACES = 2
+
+# Set this to 1 to only take pictures of 5 faces and work out the squares of
+# the last face from the pieces they belong to. The last face is only
+# scanned if it can't be worked out. Only used with USE_COLOR_ASSIGNMENT.
+USE_FIVE_FACES = 1
+
+# Set this to 1 to check each picture for movement and take it again if the
+# cube or a gripper was still moving. The pictures are then taken a little
+# before the servos should have settled. Only used with USE_MEMORY_CAPTURE.
+USE_MOTION_CHECK = 1
+
+# Time before the servos should have settled that a picture is taken
+# (seconds)
+CAPTURE_EARLY_TIME = 0.15
+
+# A picture with wider edges than this between the squares is blurred by
+# movement. See RubikSample.edge_width(). This was set from simulated and
+# drawn test pictures. Check it against real pictures with DEBUG, which
+# prints the edge width of every picture.
+BLUR_MAX_WIDTH = 0.1
+
+# A picture with a center color further than this from the last center
+# color of the same face was taken while moving (RGB distance). There is
+# no earlier picture of a face the first time the cube is scanned after
+# the program starts, so only the edge width is checked then. The center
+# color is also checked when faces are scanned again and in every later
+# scan.
+CENTER_MAX_DIFF = 40.0
+
+# The faces held by the left and right grippers when the cube is loaded
+LOAD_FACE_L = 'B'
+LOAD_FACE_R = 'D'
+
+# The side at the top of each face when the face is right side up.
+# This is the orientation the cube solver expects the squares in.
+FACE_UP = {'U': 'B', 'R': 'U', 'F': 'U', 'D': 'F', 'L': 'U', 'B': 'U'}
+
+# Face names shown on the display
+FACE_NAMES = {'U': "Up", 'R': "Right", 'F': "Front", \
+              'D': "Down", 'L': "Left", 'B': "Back"}
+
 
 # Pixel locations of the centers of the 9 squares on the side of rubiks cube.
 # These are used to determine the colors of each square.
@@ -43,13 +167,33 @@ BOTTOM_ROW   = 1700
 
 # Rubic cube scanner class
 #
-# Input:
+# Inputs:
 #   serv        The servo controller class
+#   faces       Function that lists the 4 faces reachable by a cube turn
+#               from a face held in a gripper, in clockwise order
 #
 class RubikScan(object):
-    def __init__(self, serv):
+    def __init__(self, serv, faces):
         # Save the servo info provided by the caller
         self.servos = serv
+        # Save the face list function provided by the caller
+        self.get_faces = faces
+
+        # Planner used to find the fastest order to take the pictures
+        self.scan_plan = RubikScanPlan(serv, RubikPlan(serv, faces))
+
+        # Used to read the square colors from the pictures
+        self.sampler = RubikSample()
+
+        # Used to decide which face each square color belongs to
+        self.classifier = RubikColor()
+
+        # Used to check the scanned cube can be solved
+        self.validator = RubikValidate()
+
+        # The confidence of the color of each square from the last scan,
+        # 0 to 1, in the cube solver order
+        self.confidence = [1.0] * 54
 
         # These are the pixel locations for the center of the 9 colored squares
         # on a cube face that is oriented right side up.
@@ -65,20 +209,189 @@ class RubikScan(object):
                          (MID_COLUMN,   BOTTOM_ROW),
                          (RIGHT_COLUMN, BOTTOM_ROW)]
 
+        # Pixel location order for each image orientation.
+        # Index 0 is right side up, each step after that is the image
+        # turned another 90 degrees counterclockwise. For example the
+        # picture is upside down for index 2 so the pixels are read in
+        # reverse order.
+        self.pxl_order = []
+        up_dirs = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+        for rotation in range(0, 4):
+            up = up_dirs[rotation]
+            right = up_dirs[(rotation + 1) % 4]
+            order = []
+            for pix_iter in range(0, 9):
+                x = (pix_iter % 3) - 1
+                y = 1 - (pix_iter // 3)
+                row = 1 - (x * up[0] + y * up[1])
+                col = 1 + (x * right[0] + y * right[1])
+                order.append(row * 3 + col)
+            self.pxl_order.append(order)
+
+        # The orientation of each face image, in the cube solver face order.
+        # These are the values for the fixed scan order.
+        self.face_rotation = [0, 0, 0, 2, 0, 0]
+
+        # The faces held by the left and right grippers after scanning
+        self.face_l = 'U'
+        self.face_r = 'F'
+
+        # The face number of the face that wasn't scanned, or None
+        self.missing = None
+
+        # The last center color of each face. It is used to find pictures
+        # taken while moving.
+        self.center_ref = [None] * 6
+
+        # Camera settings for a full resolution picture and for the pictures
+        # taken during the scan. Each is a tuple with the resolution, the
+        # zoom, the pixel locations of the squares and the sample area width.
+        self.full_view = ((IMG_WIDTH, IMG_HIGHT), (0.0, 0.0, 1.0, 1.0), \
+                          self.pxl_locs, SAMPLE_SIZE)
+        self.scan_view = self.full_view
+        if (USE_ROI_CAPTURE == 1):
+            self.scan_view = self.get_roi_view()
+
+        # The camera settings used for each face picture
+        self.face_view = [self.scan_view] * 6
+
+        # Image buffers for each face when capturing into memory, and the
+        # full resolution buffers of faces captured again.
+        # The camera pads the width to a multiple of 32 pixels and the
+        # height to a multiple of 16 pixels.
+        self.buffers = None
+        self.full_buffers = {}
+
+        # The camera is kept open from one scan to the next
+        self.camera = RubikCamera(serv.abort)
+
+        # Thread saving the memory images to files
+        self.save_thread = None
+
+        # Threads reading the face colors and the color reading job for
+        # each face
+        self.pool = None
+        self.face_jobs = [None] * 6
+
         # Make sure the cube image directory exists
         if not os.path.exists("Cube"):
             os.makedirs("Cube")
             os.chmod("Cube", 0o777)
 
 
+    # Get the camera settings for the reduced scan pictures
+    #
+    # The sensor is cropped to the squares plus a margin and the picture
+    # is made as small as possible while the sample areas are still
+    # ROI_SAMPLE_SIZE pixels wide. The square locations are moved and
+    # scaled to match.
+    #
+    # Return:
+    #   A tuple with the resolution, the zoom, the pixel locations of the
+    #   squares and the sample area width
+    #
+    def get_roi_view(self):
+        xs = [x for x, y in self.pxl_locs]
+        ys = [y for x, y in self.pxl_locs]
+        left = max(0, min(xs) - ROI_MARGIN)
+        right = min(IMG_WIDTH, max(xs) + ROI_MARGIN)
+        top = max(0, min(ys) - ROI_MARGIN)
+        bottom = min(IMG_HIGHT, max(ys) + ROI_MARGIN)
+
+        scale = min(1.0, float(ROI_SAMPLE_SIZE) / SAMPLE_SIZE)
+        width = int(math.ceil((right - left) * scale))
+        height = int(math.ceil((bottom - top) * scale))
+        scale_x = float(width) / (right - left)
+        scale_y = float(height) / (bottom - top)
+
+        zoom = (float(left) / IMG_WIDTH, float(top) / IMG_HIGHT, \
+                float(right - left) / IMG_WIDTH, \
+                float(bottom - top) / IMG_HIGHT)
+        locs = [((x - left) * scale_x, (y - top) * scale_y) \
+                for x, y in self.pxl_locs]
+
+        if(DEBUG == 1):
+            print("Scan pictures " + str(width) + "x" + str(height) + \
+                  ", zoom " + str(zoom))
+        return ((width, height), zoom, locs, SAMPLE_SIZE * min(scale_x, scale_y))
+
+
+    # Make an image buffer for a picture
+    #
+    # Input:
+    #   view        The camera settings of the picture
+    #
+    def new_buffer(self, view):
+        width, height = view[0]
+        width = ((width + 31) // 32) * 32
+        height = ((height + 15) // 16) * 16
+        return numpy.empty((height, width, 3), dtype=numpy.uint8)
+
+
+    # Change the camera resolution and zoom
+    #
+    # Input:
+    #   view        The new camera settings
+    #
+    def set_view(self, view):
+        self.camera.set_view(view[0], view[1])
+
+
     # Initialize the camera
     #
+    # The camera is only opened the first time. This should be called before
+    # the cube is loaded so the camera can adjust to the light meanwhile.
+    #
     def camera_init(self):
-        # Initialize the camera driver and hardware
-        self.camera = PiCamera()
-        self.camera.resolution = (IMG_WIDTH, IMG_HIGHT)
-        self.camera.start_preview()
-        self.camera.iso = 400
+        self.camera.warm_up()
+        self.set_view(self.scan_view)
+
+        if ((USE_MEMORY_CAPTURE == 1) and (self.buffers is None)):
+            self.buffers = [self.new_buffer(self.scan_view) \
+                            for face in range(0, 6)]
+
+        # Plan the scan now while waiting for the cube to be loaded
+        if (USE_SCAN_PLAN == 1):
+            self.get_scan_faces((T_POS_0, G_POS_CLOSED, T_POS_0, G_POS_CLOSED))
+
+
+    # Get the faces to take pictures of when scanning
+    #
+    # When only 5 faces are scanned the face left out is the one that
+    # gives the fastest scan.
+    #
+    # Input:
+    #   servo_pos   The (rt, rg, lt, lg) servo positions at the start
+    #
+    # Return:
+    #   A string with the faces to take pictures of
+    #
+    def get_scan_faces(self, servo_pos):
+        if ((USE_FIVE_FACES == 0) or (USE_COLOR_ASSIGNMENT == 0)):
+            return FACE_ORDER
+
+        best = None
+        for face in FACE_ORDER:
+            faces = FACE_ORDER.replace(face, "")
+            plan_time = self.scan_plan.plan(servo_pos, LOAD_FACE_L, \
+                                            LOAD_FACE_R, faces)[1]
+            if ((best is None) or (plan_time < best[0])):
+                best = (plan_time, faces)
+        return best[1]
+
+
+    # Get the orientation of a face image
+    #
+    # Inputs:
+    #   face        The face in the picture
+    #   up          The face next to it at the top of the picture
+    #
+    # Return:
+    #   The index into the pixel location orders, 0 to 3
+    #
+    def get_rotation(self, face, up):
+        faces = self.get_faces(face)
+        return (faces.index(up) - faces.index(FACE_UP[face])) % 4
 
 
     # Read cube faces
@@ -92,164 +405,513 @@ class RubikScan(object):
     #   5 = Back
     #
     # The faces are imaged out of order to reduce the necessary gripper
-    # movements. In addition, the Down face will be imaged upside down.
+    # movements. Some faces will be imaged turned or upside down.
     #
     def get_cube(self, display):
-        # Set the camera exposure settings.
-        # Using fixed settings rather than auto exposure produces more
-        # consistant colors from image to image. This make the color
-        # detection more reliable.
-        es = self.camera.exposure_speed
-        self.camera.exposure_mode = 'off'
-        self.camera.shutter_speed = es
-        g = self.camera.awb_gains
-        self.camera.awb_mode = 'off'
-        self.camera.awb_gains = g
-
-        self.camera.saturation = 50
-
-        # Give the camera time to adjust
-        sleep(2)
+        self.missing = None
+        if (USE_SCAN_PLAN == 1):
+            servo_pos = (self.servos.rt_pos, self.servos.rg_pos, \
+                         self.servos.lt_pos, self.servos.lg_pos)
+            faces = self.get_scan_faces(servo_pos)
+            for face in FACE_ORDER:
+                if (face not in faces):
+                    self.missing = FACE_ORDER.index(face)
+            self.run_scan_plan(display, faces=faces)
+            return
+
+        self.face_rotation = [0, 0, 0, 2, 0, 0]
+        self.face_l = 'U'
+        self.face_r = 'F'
+
+        # The servos don't wait for their moves to finish so make sure
+        # the cube is still before each picture.
+        display.write_body("Front")
+        self.wait_still()
+        self.capture_face(2)
+
+        self.servos.right_rotate_cube_90_cw()
+        self.servos.clear_camera()
+
+        display.write_body("Right")
+        self.wait_still()
+        self.capture_face(1)
+
+        self.servos.right_rotate_cube_90_cw()
+        self.servos.clear_camera()
+
+        display.write_body("Back")
+        self.wait_still()
+        self.capture_face(5)
+
+        self.servos.right_rotate_cube_90_cw()
+        self.servos.clear_camera()
+
+        display.write_body("Left")
+        self.wait_still()
+        self.capture_face(4)
+
+        self.servos.left_rotate_cube_90_cw()
+        self.servos.right_rotate_cube_90_cw()
+        self.servos.clear_camera()
+
+        display.write_body("Up")
+        self.wait_still()
+        self.capture_face(0)
+
+        if ((USE_FIVE_FACES == 1) and (USE_COLOR_ASSIGNMENT == 1)):
+            # The Down face is worked out from the others
+            self.missing = 3
+            self.face_l = 'D'
+            return
+
+        self.servos.right_rotate_cube_180()
+        self.servos.clear_camera()
+
+        # This face will be upside down
+        display.write_body("Down")
+        self.wait_still()
+        self.capture_face(3)
+
+
+    # Close the camera
+    #
+    def camera_close(self):
+        self.camera.close()
+
+
+    # Wait for the cube to be still before taking a picture
+    #
+    # The servo times are estimates on the safe side. When the pictures are
+    # checked for movement they are taken a bit before the estimated end.
+    #
+    def wait_still(self):
+        if ((USE_MOTION_CHECK == 1) and (USE_MEMORY_CAPTURE == 1)):
+            self.servos.wait_idle(CAPTURE_EARLY_TIME)
+        else:
+            self.servos.wait_idle()
 
-        try:
-            display.write_body("Front")
-            self.camera.capture('Cube/face2.jpg')
 
-            self.servos.right_rotate_cube_90_cw()
-            self.servos.clear_camera()
+    # Measure a face picture for the movement check
+    #
+    # Input:
+    #   index       The face number in the cube solver face order
+    #
+    # Return:
+    #   A tuple with the edge width and the (r, g, b) center color
+    #
+    def measure_motion(self, index):
+        view = self.face_view[index]
+        image = self.get_image(index)
+        blur = self.sampler.edge_width(image, view[2])
+        colors, spreads = self.sampler.sample_array(image, [view[2][4]], \
+                                                    view[3])
+        if(DEBUG == 1):
+            print("Face " + FACE_ORDER[index] + " edge width %.2f" % blur + \
+                  ", center " + str(colors[0]))
+        return blur, colors[0]
+
+
+    # Check a face picture for movement
+    #
+    # Inputs:
+    #   index       The face number in the cube solver face order
+    #   blur        The edge width of the picture
+    #   center      The (r, g, b) center color in the picture
+    #
+    # Return:
+    #   True if the picture looks like it was taken with the cube still
+    #
+    def is_still(self, index, blur, center):
+        if (blur > BLUR_MAX_WIDTH):
+            return False
+        ref_center = self.center_ref[index]
+        if (ref_center is None):
+            return True
+        dist = math.sqrt(sum([(a - b) ** 2 for a, b in zip(center, ref_center)]))
+        return dist <= CENTER_MAX_DIFF
 
-            display.write_body("Right")
-            self.camera.capture('Cube/face1.jpg')
 
-            self.servos.right_rotate_cube_90_cw()
-            self.servos.clear_camera()
+    # Take a picture of the face in front of the camera into memory
+    #
+    # The picture is taken again if it was taken while the cube was still
+    # moving. The center color of a picture that passes is used as the
+    # reference for the next picture of the face, in a rescan or the next
+    # scan. The first picture of each face only has its edges checked.
+    #
+    # Input:
+    #   index       The face number in the cube solver face order
+    #
+    def capture_still(self, index):
+        self.camera.capture(self.buffers[index], 'rgb')
+        if (USE_MOTION_CHECK == 0):
+            return
 
-            display.write_body("Back")
-            self.camera.capture('Cube/face5.jpg')
+        blur, center = self.measure_motion(index)
+        if (not self.is_still(index, blur, center)):
+            print("Face " + FACE_ORDER[index] + \
+                  " moved during the picture, taking it again")
+            # The servos should be done by now
+            self.servos.wait_idle()
+            self.camera.capture(self.buffers[index], 'rgb')
+            blur, center = self.measure_motion(index)
 
-            self.servos.right_rotate_cube_90_cw()
-            self.servos.clear_camera()
+        self.center_ref[index] = center
 
-            display.write_body("Left")
-            self.camera.capture('Cube/face4.jpg')
 
-            self.servos.left_rotate_cube_90_cw()
-            self.servos.right_rotate_cube_90_cw()
-            self.servos.clear_camera()
+    # Take a picture of the face in front of the camera
+    #
+    # Inputs:
+    #   index       The face number in the cube solver face order
+    #   full        True to always take a full resolution picture
+    #
+    def capture_face(self, index, full=False):
+        self.face_view[index] = self.scan_view
+        if (USE_MEMORY_CAPTURE == 1):
+            if (full and (self.scan_view is not self.full_view)):
+                self.capture_full(index)
+            else:
+                self.capture_still(index)
+                if ((self.scan_view is not self.full_view) and \
+                    not self.check_face(index)):
+                    print("Face " + FACE_ORDER[index] + \
+                          " captured again at full resolution")
+                    self.capture_full(index)
+        else:
+            self.camera.capture('Cube/face' + str(index) + '.jpg')
+        self.start_analysis(index)
+
+
+    # Start reading the colors of a face in the background
+    #
+    # The face image isn't changed again during the scan so it can be read
+    # while the servos move to the next face.
+    #
+    # Input:
+    #   index       The face number in the cube solver face order
+    #
+    def start_analysis(self, index):
+        if (USE_ANALYSIS_POOL == 1):
+            if (self.pool is None):
+                self.pool = concurrent.futures.ThreadPoolExecutor( \
+                    max_workers=ANALYSIS_WORKERS)
+            self.face_jobs[index] = self.pool.submit(self.sample_face, index)
 
-            display.write_body("Up")
-            self.camera.capture('Cube/face0.jpg')
 
-            self.servos.right_rotate_cube_180()
-            self.servos.clear_camera()
+    # Check that all squares can be read from a reduced face picture
+    #
+    # Input:
+    #   index       The face number in the cube solver face order
+    #
+    # Return:
+    #   True if the sample areas are even enough to trust their colors
+    #
+    def check_face(self, index):
+        view = self.face_view[index]
+        colors, spreads = self.sampler.sample_array(self.get_image(index), \
+                                                    view[2], view[3])
+        if(DEBUG == 1):
+            print("Face " + str(index) + " spread %.1f" % max(spreads))
+        return max(spreads) <= ROI_MAX_SPREAD
 
-            # This face will be upside down
-            display.write_body("Down")
-            self.camera.capture('Cube/face3.jpg')
 
+    # Take a full resolution picture of the face in front of the camera
+    #
+    # This picture isn't checked for movement so the servos must be done
+    # first, not just nearly done like for the scan pictures.
+    #
+    # Input:
+    #   index       The face number in the cube solver face order
+    #
+    def capture_full(self, index):
+        self.servos.wait_idle()
+        if (index not in self.full_buffers):
+            self.full_buffers[index] = self.new_buffer(self.full_view)
+        self.set_view(self.full_view)
+        try:
+            self.face_view[index] = self.full_view
+            self.camera.capture(self.full_buffers[index], 'rgb')
         finally:
-            # Release the camera
-            self.camera.close()
+            self.set_view(self.scan_view)
 
 
-    # Scan and analyse the colors on a scrambled cube
+    # Get the image of a face captured into memory
     #
     # Input:
-    #   display     The display contoller class
-    def scan_cube(self, display):
-        display.write_header("Scanning")
+    #   index       The face number in the cube solver face order
+    #
+    # Return:
+    #   The array of RGB pixels without the padding
+    #
+    def get_image(self, index):
+        view = self.face_view[index]
+        width, height = view[0]
+        if (view is self.scan_view):
+            return self.buffers[index][:height, :width]
+        return self.full_buffers[index][:height, :width]
 
-        # Get images for all sides of the cube.
-        self.get_cube(display)
 
-        display.write_header("Analysis")
-        display.write_body(" ")
+    # Save the memory images as files in the Cube directory
+    #
+    def save_images(self):
+        for index in range(0, 6):
+            if (index == self.missing):
+                continue
+            Image.fromarray(self.get_image(index)).save( \
+                'Cube/face' + str(index) + '.jpg')
 
-        # Determine the color of each square.
-        return self.get_colors() 
 
+    # Wait for the images to be saved
+    #
+    # This needs to be done before the image buffers are used again.
+    #
+    def wait_saved(self):
+        if (self.save_thread is not None):
+            self.save_thread.join()
+            self.save_thread = None
 
-    # Average the pixel colors in a 5x5 square area
-    # This is used to prevent single pixel errors from messing up the
-    # The color detection.
+
+    # Take pictures of faces using the scan planner
+    #
+    # The faces are imaged in the order that needs the least servo time.
+    # The orientation of each picture and the faces held by the grippers
+    # at the end are saved.
     #
     # Inputs:
-    #   im          The image of the cube face to process
-    #   x           The x coordinate of the center pixel of the area
-    #   y           The y coordinate of the center pixel of the area
+    #   display     The display contoller class
+    #   face_l      The face held by the left gripper at the start
+    #   face_r      The face held by the right gripper at the start
+    #   faces       The faces to take pictures of
+    #   full        True to take full resolution pictures
     #
-    def pix_average(self, im, x, y):
-        # Clear averages
-        r_avg = 0
-        g_avg = 0
-        b_avg = 0
+    def run_scan_plan(self, display, face_l=LOAD_FACE_L, face_r=LOAD_FACE_R, \
+                      faces=FACE_ORDER, full=False):
+        servo_pos = (self.servos.rt_pos, self.servos.rg_pos, \
+                     self.servos.lt_pos, self.servos.lg_pos)
+        plan, plan_time, self.face_l, self.face_r = \
+            self.scan_plan.plan(servo_pos, face_l, face_r, faces)
+        if(DEBUG == 1):
+            print("Planned scan servo time %.2f" % plan_time)
 
-        # Set x and y values to the corner pixel of the averaging area
-        x -= 2
-        y -= 2
+        for servo, pos in plan:
+            if (servo != 'camera'):
+                self.servos.set_servo(servo, pos)
+                continue
 
-        # Add the RGB values of all pixels
-        for x_inc in range (0,5):
-            for y_inc in range (0,5):
-                # Read the RGB values for a single pixel
-                r_pix, g_pix, b_pix = im.getpixel((x + x_inc, y + y_inc))
-                r_avg += r_pix
-                g_avg += g_pix
-                b_avg += b_pix
+            face, up = pos
+            index = FACE_ORDER.index(face)
+            self.face_rotation[index] = self.get_rotation(face, up)
 
-        # Divide by the number of pixels
-        r_avg = r_avg / 25
-        g_avg = g_avg / 25
-        b_avg = b_avg / 25
+            # The servos don't wait for their moves to finish so make sure
+            # the cube is still before each picture.
+            display.write_body(FACE_NAMES[face])
+            self.wait_still()
+            self.capture_face(index, full)
 
-        return r_avg, g_avg, b_avg
+
+    # Get the faces to take new pictures of after a failed scan
+    #
+    # Return:
+    #   A string with the faces that have the least certain square colors
+    #
+    def get_rescan_faces(self):
+        worst = [min(self.confidence[face * 9:face * 9 + 9]) \
+                 for face in range(0, 6)]
+        order = sorted(range(0, 6), key=lambda face: worst[face])
+        faces = [face for face in order if (worst[face] < LOW_CONFIDENCE)]
+        if (len(faces) == 0):
+            faces = order[:1]
+        faces = sorted(faces[:RESCAN_MAX_FACES])
+        return "".join([FACE_ORDER[face] for face in faces])
 
 
-    # Get the color of the center square of a cube side.
-    # This sets the correct color for the entire side since the
-    # centers quares don't move when solving the cube.
+    # Scan and analyse the colors on a scrambled cube
     #
-    # Inputs:
-    #   text        Cube side name used in debug messages
-    #   file        Image file for one side of the cube
+    # Input:
+    #   display     The display contoller class
+    def scan_cube(self, display):
+        display.write_header("Scanning")
+        self.wait_saved()
+        self.face_jobs = [None] * 6
+
+        # Lock the camera exposure settings once they have settled
+        self.camera.lock()
+        try:
+            # Get images for all sides of the cube.
+            self.get_cube(display)
+
+            display.write_header("Analysis")
+            display.write_body(" ")
+
+            # Determine the color of each square.
+            success, cube_def_string = self.get_colors()
+
+            # Take a picture of the face that wasn't scanned if it couldn't
+            # be worked out
+            if ((not success) and (self.missing is not None)):
+                face = FACE_ORDER[self.missing]
+                self.missing = None
+                display.write_header("Scanning")
+                self.run_scan_plan(display, self.face_l, self.face_r, face)
+
+                display.write_header("Analysis")
+                display.write_body(" ")
+                success, cube_def_string = self.get_colors()
+
+            # The cube is still held so new pictures can be taken of the
+            # faces that couldn't be read
+            tries = 0
+            while ((not success) and (USE_RESCAN == 1) and \
+                   (USE_COLOR_ASSIGNMENT == 1) and (tries < RESCAN_TRIES)):
+                faces = self.get_rescan_faces()
+                print("Scanning faces " + faces + " again")
+                display.write_header("Rescanning")
+                self.run_scan_plan(display, self.face_l, self.face_r, faces, \
+                                   True)
+
+                display.write_header("Analysis")
+                display.write_body(" ")
+                success, cube_def_string = self.get_colors()
+                tries += 1
+        finally:
+            # Let the camera follow the light until the next scan
+            self.camera.unlock()
+
+        if ((USE_MEMORY_CAPTURE == 1) and (SAVE_IMAGES == 1)):
+            self.save_thread = threading.Thread(target=self.save_images)
+            self.save_thread.start()
+
+        return success, cube_def_string
+
+
+    # Read the colors of the squares from a face image
     #
-    def get_center_color(self, text, file):
-        if(DEBUG == 1):
-            print(text)
-        im = Image.open(file)
-        im = im.convert('RGB')
-        r, g, b = self.pix_average(im, \
-                                   self.pxl_locs[4][0], \
-                                   self.pxl_locs[4][1])
-        if(DEBUG == 1):
-            print("rgb,%6.2f,%6.2f,%6.2f\n" % (r, g, b))
-        return r, g, b 
+    # Each image is only decoded once. The squares are read in the order
+    # expected by the cube solver for the way the image is turned.
+    #
+    # Input:
+    #   index       The face number in the cube solver face order
+    #
+    # Return:
+    #   A list of (r, g, b) colors for the 9 squares
+    #
+    def sample_face(self, index):
+        order = self.pxl_order[self.face_rotation[index]]
+        resolution, zoom, pxl_locs, size = self.face_view[index]
+        locs = [pxl_locs[order[pix_iter]] for pix_iter in range(0, 9)]
+        if (USE_MEMORY_CAPTURE == 1):
+            colors, spreads = self.sampler.sample_array( \
+                self.get_image(index), locs, size)
+            return colors
+        img_path = "Cube/face" + str(index) + ".jpg"
+        return self.sampler.sample(img_path, locs, size)
+
 
     # Get the color of each square on the cube
     #
     def get_colors(self):
-        # First get the center colors of each face.
-        # These will set the face color for the solved cube and also
-        # be used as a reference when identifying the other squares.
-        center_colors = []
-
-        r, g, b = self.get_center_color("Face 0 - Up", "Cube/face0.jpg")
-        center_colors.append((r, g, b, "U"))
+        # Use the face colors read during the scan, or read them now
+        face_colors = []
+        for img_iter in range(0, 6):
+            if (img_iter == self.missing):
+                face_colors.append(None)
+            elif (self.face_jobs[img_iter] is not None):
+                face_colors.append(self.face_jobs[img_iter].result())
+            else:
+                face_colors.append(self.sample_face(img_iter))
+
+        if (self.missing is not None):
+            return self.infer_missing(face_colors)
+
+        if (USE_COLOR_ASSIGNMENT == 0):
+            self.confidence = [1.0] * 54
+            success, cube_def_string = self.match_nearest(face_colors)
+            if (success and (USE_VALIDATE == 1)):
+                problem = self.validator.check(cube_def_string)
+                if (problem is not None):
+                    print("Scanned cube can't be solved, " + problem)
+                    success = False
+            return success, cube_def_string
+
+        # Share out the squares between the faces by color
+        faces, self.confidence = self.classifier.classify(face_colors)
+        cube_def_string = "".join([FACE_ORDER[face] for face in faces])
+
+        # Swap the colors of the least certain squares until the cube can
+        # be solved. The swapped squares are no longer trusted.
+        if (USE_VALIDATE == 1):
+            problem = self.validator.check(cube_def_string)
+            if (problem is not None):
+                print(cube_def_string)
+                print("Scanned cube can't be solved, " + problem)
+                result = self.validator.repair(cube_def_string, \
+                                               self.classifier.dist)
+                if (result is None):
+                    return False, cube_def_string
+                cube_def_string, changed = result
+                for index in changed:
+                    self.confidence[index] = 0.0
+                print("Repaired squares " + \
+                      " ".join([str(index) for index in changed]))
 
-        r, g, b = self.get_center_color("Face 1 - Right", "Cube/face1.jpg")
-        center_colors.append((r, g, b, "R"))
+        print(cube_def_string)
 
-        r, g, b = self.get_center_color("Face 2 - Front", "Cube/face2.jpg")
-        center_colors.append((r, g, b, "F"))
+        low = [index for index in range(0, 54) \
+               if (self.confidence[index] < LOW_CONFIDENCE)]
+        if (len(low) > 0):
+            print("Low color confidence for squares " + \
+                  " ".join([str(index) for index in low]))
 
-        r, g, b = self.get_center_color("Face 3 - Down", "Cube/face3.jpg")
-        center_colors.append((r, g, b, "D"))
+        return True, cube_def_string
 
-        r, g, b = self.get_center_color("Face 4 - Left", "Cube/face4.jpg")
-        center_colors.append((r, g, b, "L"))
 
-        r, g, b = self.get_center_color("Face 5 - Back", "Cube/face5.jpg")
-        center_colors.append((r, g, b, "B"))
+    # Work out the colors of the face that wasn't scanned
+    #
+    # Input:
+    #   face_colors     List of 6 faces in the cube solver face order, each
+    #                   a list of the (r, g, b) colors of its 9 squares
+    #
+    # Return:
+    #   A tuple with True if there is only one possible cube and the cube
+    #   definition string
+    #
+    def infer_missing(self, face_colors):
+        faces, self.confidence = self.classifier.classify(face_colors, \
+                                                          self.missing)
+        cube_def_string = "".join(['?' if (face < 0) else FACE_ORDER[face] \
+                                   for face in faces])
+        results = self.validator.complete(cube_def_string)
+        if (len(results) != 1):
+            print(cube_def_string)
+            print("Face " + FACE_ORDER[self.missing] + " can't be worked out, " + \
+                  str(len(results)) + " possible cubes")
+            return False, cube_def_string
+
+        print(results[0])
+        return True, results[0]
+
+
+    # Match each square to the face center with the closest color
+    #
+    # Input:
+    #   face_colors     List of 6 faces in the cube solver face order, each
+    #                   a list of the (r, g, b) colors of its 9 squares
+    #
+    # Return:
+    #   A tuple with True if there are 9 squares of each color and the cube
+    #   definition string
+    #
+    def match_nearest(self, face_colors):
+        # First get the center colors of each face.
+        # These will set the face color for the solved cube and also
+        # be used as a reference when identifying the other squares.
+        # The centers quares don't move when solving the cube.
+        center_colors = []
+        for img_iter in range(0, 6):
+            r, g, b = face_colors[img_iter][4]
+            if(DEBUG == 1):
+                print("Face " + str(img_iter) + " - " + FACE_ORDER[img_iter])
+                print("rgb,%6.2f,%6.2f,%6.2f\n" % (r, g, b))
+            center_colors.append((r, g, b, FACE_ORDER[img_iter]))
 
         # This string will be used to hold the cube definition.
         # This defines the color of all squaares on the cube.
@@ -266,23 +928,10 @@ class RubikScan(object):
         for img_iter in range(0, 6):
             if(DEBUG == 1):
                 print("-- Face " + str(img_iter))
-            img_path = "Cube/face" + str(img_iter) + ".jpg"
-            im = Image.open(img_path)
-            im = im.convert('RGB')
 
             # Loop through the 9 squares on a face
             for pix_iter in range(0,9):
-                if (img_iter == 3):
-                    # The Down face's image is upside down.
-                    # Scan the pixels in reverse order.
-                    r, g, b = self.pix_average(im, \
-                                              self.pxl_locs[8 - pix_iter][0], \
-                                              self.pxl_locs[8 - pix_iter][1])
-                else:
-                    # All other images are right side up.
-                    r, g, b = self.pix_average(im, \
-                                              self.pxl_locs[pix_iter][0], \
-                                              self.pxl_locs[pix_iter][1])
+                r, g, b = face_colors[img_iter][pix_iter]
                 if(DEBUG == 1):
                     print("rgb,%6.2f,%6.2f,%6.2f" % (r, g, b))
 
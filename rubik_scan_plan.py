@@ -0,0 +1,201 @@
+#!/usr/bin/python
+
+#
+# The code in this file plans the servo movements used to take pictures of
+# all 6 sides of the cube.
+#
+# The camera looks at the side of the cube opposite the left gripper. A
+# picture can only be taken when the right gripper is horizontal, otherwise
+# it blocks the view. The cube is rotated by the grippers to bring each side
+# in front of the camera.
+#
+# The planner searches all possible single servo movements and pictures to
+# find the order that takes pictures of all 6 sides in the shortest total
+# servo time. It uses the same servo movement rules as the solution planner
+# except that faces are never turned. The grippers are left closed at the
+# end and the faces they hold are returned so the solve can start from
+# there instead of a fixed orientation. The same search can also plan new
+# pictures of just a few sides.
+#
+
+import heapq
+
+import my_exceptions
+
+# Servo positions
+from rubik_servos import T_POS_0, G_POS_CLOSED
+
+# All positions of the turn servos
+from rubik_plan import TURN_POSITIONS
+
+
+# Set this to 0 to disable debug logging, 1 to enable.
+DEBUG = 0
+
+
+# The face on the opposite side of the cube from each face
+OPPOSITE = {'U': 'D', 'D': 'U', 'R': 'L', 'L': 'R', 'F': 'B', 'B': 'F'}
+
+# Faces in the order used by the cube solver
+FACE_ORDER = "URFDLB"
+
+
+# Rubik's cube scan planner class
+#
+# Inputs:
+#   serv        The servo controller class
+#   planner     The servo motion planner class
+#
+class RubikScanPlan(object):
+    def __init__(self, serv, planner):
+        # Save the servo info provided by the caller
+        self.servos = serv
+        # Save the planner provided by the caller
+        self.planner = planner
+
+        # Plans already found, indexed by the start state and move times
+        self.cache = {}
+
+        # Shortest servo time needed to take a picture of a new side
+        self.min_side = 0.0
+
+
+    # Find the fastest way to take pictures of the sides of the cube
+    #
+    # The cube must be held by both grippers with the right gripper
+    # horizontal at the start, the same as after loading the cube.
+    # The search can take a while so the result is saved. It can be called
+    # ahead of time with the positions expected at the start of the scan.
+    #
+    # Inputs:
+    #   servo_pos   The (rt, rg, lt, lg) servo positions at the start
+    #   face_l      The face held by the left gripper at the start
+    #   face_r      The face held by the right gripper at the start
+    #   faces       The sides to take pictures of
+    #
+    # Return:
+    #   A tuple with the list of steps, the total servo time and the faces
+    #   held by the left and right grippers at the end. Each step is a
+    #   (servo, position) servo movement or ('camera', (face, up)) to take
+    #   a picture. Face is the side in front of the camera and up is the
+    #   side at the top of the picture.
+    #
+    def plan(self, servo_pos, face_l, face_r, faces=FACE_ORDER):
+        times = self.planner.move_times()
+        start = (0,) + tuple(servo_pos) + (face_l, face_r)
+        key = (start, faces, tuple(sorted(times.items())))
+        if (key not in self.cache):
+            self.cache[key] = self.search(start, times, faces)
+        return self.cache[key]
+
+
+    # Get the lower bound of the servo time still needed
+    #
+    # Inputs:
+    #   node        The search node (planner state, sides already taken)
+    #   wanted      The sides to take pictures of
+    #
+    def estimate(self, node, wanted):
+        state, taken = node
+        left = bin(wanted & ~taken).count("1")
+        bit = 1 << FACE_ORDER.index(OPPOSITE[state[5]])
+        if ((left > 0) and (wanted & bit) and not (taken & bit)):
+            # The side in front of the camera needs no rotation
+            left -= 1
+        return left * self.min_side
+
+
+    # Search for the fastest picture taking sequence
+    #
+    # This is a shortest path search where the path cost is the total
+    # servo move time. The search state is a planner state plus the set of
+    # sides already in a picture.
+    #
+    # Inputs:
+    #   start       The planner state at the start
+    #   times       The servo move times from the planner
+    #   faces       The sides to take pictures of
+    #
+    # Return:
+    #   The same as plan()
+    #
+    def search(self, start, times, faces):
+        index = {'rt': 1, 'rg': 2, 'lt': 3, 'lg': 4}
+        grip = {'rt': 2, 'rg': 0, 'lt': 4, 'lg': 0}
+        wanted = 0
+        for face in faces:
+            wanted |= 1 << FACE_ORDER.index(face)
+
+        # The left gripper turns the cube around the camera axis so only
+        # the right gripper can bring a new side in front of the camera.
+        # For every new side it must turn the cube and then get back to
+        # horizontal. This is used as the lower bound of the remaining cost.
+        turn_times = {True: [], False: []}
+        for start_pos in TURN_POSITIONS:
+            for end_pos in TURN_POSITIONS:
+                if (start_pos != end_pos):
+                    for loaded in [True, False]:
+                        turn_times[loaded].append( \
+                            times[('rt', start_pos, end_pos, loaded)])
+        self.min_side = min(turn_times[True]) + min(turn_times[False])
+
+        node = (start, 0)
+        cost = {node: 0.0}
+        prev = {node: None}
+        queue = [(self.estimate(node, wanted), 0, node)]
+        count = 1
+        end = None
+
+        while (len(queue) > 0):
+            total, n, node = heapq.heappop(queue)
+            state, taken = node
+            if (total > cost[node] + self.estimate(node, wanted)):
+                # A faster path to this node was already found
+                continue
+            if ((taken == wanted) and (state[2] == G_POS_CLOSED) and \
+                (state[4] == G_POS_CLOSED)):
+                end = node
+                break
+
+            steps = []
+            face = OPPOSITE[state[5]]
+            bit = 1 << FACE_ORDER.index(face)
+            if ((state[1] == T_POS_0) and (wanted & bit) and \
+                not (taken & bit)):
+                # Take a picture of the side in front of the camera.
+                # The top of the picture is the side opposite the right
+                # gripper.
+                steps.append(('camera', (face, OPPOSITE[state[6]]), \
+                              (state, taken | bit), 0.0))
+            for servo, pos, new_state in self.planner.next_states(state, []):
+                loaded = (grip[servo] != 0) and \
+                         (state[grip[servo]] == G_POS_CLOSED)
+                steps.append((servo, pos, (new_state, taken), \
+                              times[(servo, state[index[servo]], pos, loaded)]))
+
+            for servo, pos, new_node, delay in steps:
+                new_cost = cost[node] + delay
+                if ((new_node not in cost) or (new_cost < cost[new_node])):
+                    cost[new_node] = new_cost
+                    prev[new_node] = (node, servo, pos)
+                    heapq.heappush(queue, \
+                        (new_cost + self.estimate(new_node, wanted), count, \
+                         new_node))
+                    count += 1
+
+        if (end is None):
+            raise my_exceptions.FaceException('No scan plan found')
+
+        # Walk back from the end to get the steps
+        path = []
+        node = end
+        while (prev[node] is not None):
+            node, servo, pos = prev[node]
+            path.append((servo, pos))
+        path.reverse()
+
+        if(DEBUG == 1):
+            print("Scan plan " + str(len(path)) + " steps, " + \
+                  "%.2f seconds" % cost[end])
+
+        return path, cost[end], end[0][5], end[0][6]
@@ -0,0 +1,499 @@
+#!/usr/bin/python
+
+#
+# This class runs the two-phase cube solver library to find the moves that
+# solve a scanned cube.
+#
+# The search is run in a separate process so it can be stopped right away
+# when the user aborts. The process is forked after the solver tables have
+# been loaded so it starts quickly and shares the tables with this process.
+#
+# Loading the solver library reads its tables, or builds them the first
+# time, which takes a long time. It is loaded by a background thread so the
+# rest of the program can start right away. A search waits for the loading
+# to finish only if it hasn't yet.
+#
+# Several searches are run at the same time on the other cores, each with
+# the cube turned to a different orientation or mirrored. Each is a
+# different problem for the solver and gives different solutions, which are
+# turned back into moves of the cube as it is held.
+#
+# The search can also stop early. Each solution is given to a function that
+# predicts how long the robot will take to carry it out. The search stops
+# once the robot time saved for each second of search drops too low, since
+# searching longer would then likely cost more time than it saves.
+#
+# The solutions found for each cube are saved by rubik_cache.py and used
+# again without a search when the same cube is solved again.
+#
+# If the solver service in rubik_solver_server.py is running the searches
+# are sent to it instead and the library is never loaded here. The service
+# keeps the tables loaded when this program is restarted.
+#
+
+import multiprocessing
+import multiprocessing.connection
+import os
+import threading
+import time
+
+# Describes the cube in other orientations
+from rubik_orient import RubikOrient
+
+# Saves the solutions found for each cube
+from rubik_cache import RubikCache
+
+
+# Time between abort checks while waiting for the search (seconds)
+CANCEL_POLL_TIME = 0.02
+
+# Longest solution accepted as the first candidate
+FIRST_MAX_LENGTH = 24
+
+# Set this to 1 to use the saved solutions of a cube solved before
+USE_SOLUTION_CACHE = 1
+
+# Set this to 1 to search several orientations of the cube at the same
+# time, 0 to only search the cube as it is held
+USE_ORIENTATIONS = 1
+
+# The orientations searched, one search process each. See rubik_orient.py.
+# The solver library already tries the cube turned about the URF corner
+# so turns about the faces and the mirror image are used here.
+SEARCH_ORIENTATIONS = ["", "y", "z", "m"]
+
+# Shortest time to search after the first solution is found before the
+# search can stop early (seconds)
+ANYTIME_MIN_TIME = 0.5
+
+# The search stops early when it has saved less robot time than this for
+# each second searched since the first solution was found
+ANYTIME_MIN_RATE = 1.0
+
+# Time between updates of the display while waiting for the solver library
+# to load (seconds)
+LOAD_DISPLAY_TIME = 1.0
+
+# Set this to 1 to use the solver service when it is running, 0 to always
+# load the solver library in this process
+USE_SOLVER_SERVICE = 1
+
+# The directory of the solver service socket. Only the user running the
+# robot can write to it so no other user can put a fake service there.
+SOLVER_DIR = "~/.rubik"
+
+# The Unix socket the solver service listens on, in SOLVER_DIR
+SOLVER_SOCKET = "solver.sock"
+
+# Key used to check connections to the solver service
+SOLVER_AUTHKEY = b"rubik solver"
+
+# Time to keep trying to connect to the solver service in case it is still
+# starting (seconds)
+SERVICE_START_TIME = 2.0
+
+# Time between checks while the solver service is starting or loading the
+# library (seconds)
+SERVICE_POLL_TIME = 0.25
+
+
+# Get the file name of the solver service socket
+# Raises OSError if other users can write to its directory.
+#
+# The directory is made if it doesn't exist yet.
+#
+def solver_socket():
+    path = os.path.expanduser(SOLVER_DIR)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if ((info.st_uid != os.getuid()) or ((info.st_mode & 0o022) != 0)):
+        raise OSError(path + " can be written by other users")
+    return os.path.join(path, SOLVER_SOCKET)
+
+
+# Get the number of moves in a solution string
+#
+# Input:
+#   solve_string    The solution string from the solver library
+#
+# Return:
+#   The number of moves, or -1 if the string is an error message
+#
+def solution_length(solve_string):
+    if (solve_string.startswith("Error")):
+        return -1
+    return len(solve_string.split(" ")) - 1
+
+
+# Rubik's cube solution search class
+#
+# Inputs:
+#   abort       The cancel token used to stop the search
+#   service     1 to use the solver service when it is running
+#   cache       1 to use the saved solutions of cubes solved before
+#
+class RubikSearch(object):
+    def __init__(self, abort, service=USE_SOLVER_SERVICE, \
+                 cache=USE_SOLUTION_CACHE):
+        # Save the cancel token provided by the caller
+        self.abort = abort
+
+        # True when the searches are sent to the solver service
+        self.service = service
+        self.remote = False
+
+        # The saved solutions, None if they aren't used
+        self.cache = None
+        if (cache == 1):
+            self.cache = RubikCache()
+
+        # The solver library once it is loaded
+        self.solver = None
+
+        # Set when the loading is done, and the error if it failed
+        self.ready = threading.Event()
+        self.error = None
+
+        # The time the loading started
+        self.load_start = None
+
+
+    # Start loading the solver library in the background
+    #
+    def start_loading(self):
+        if (self.load_start is None):
+            self.load_start = time.monotonic()
+            threading.Thread(target=self.load, daemon=True).start()
+
+
+    # Loader thread function
+    #
+    def load(self):
+        try:
+            if ((self.service == 1) and self.wait_service()):
+                self.remote = True
+                print("Using solver service")
+                return
+
+            # This library provides the moves needed to solve the cube.
+            import twophase.solver as solver
+            self.solver = solver
+            print("Solver loaded in %.1f s" % \
+                  (time.monotonic() - self.load_start))
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.ready.set()
+
+
+    # Connect to the solver service
+    # Raises OSError if the service isn't running.
+    #
+    # Return:
+    #   The connection
+    #
+    def connect(self):
+        return multiprocessing.connection.Client(solver_socket(), 'AF_UNIX', \
+                                                 authkey=SOLVER_AUTHKEY)
+
+
+    # Wait for the solver service to load the solver library
+    #
+    # The service is started at the same time as this program so it may
+    # not be listening yet.
+    #
+    # Return:
+    #   True if the service is running and ready
+    #
+    def wait_service(self):
+        end = time.monotonic() + SERVICE_START_TIME
+        while (1):
+            try:
+                conn = self.connect()
+                break
+            except OSError:
+                if (time.monotonic() >= end):
+                    return False
+                time.sleep(SERVICE_POLL_TIME)
+        try:
+            while (1):
+                conn.send(("state",))
+                state = conn.recv()
+                if (state != "loading"):
+                    return (state == "ready")
+                time.sleep(SERVICE_POLL_TIME)
+        except (OSError, EOFError):
+            return False
+        finally:
+            conn.close()
+
+
+    # Get the loading state of the solver library to show on the display
+    #
+    # Return:
+    #   None when the solver is ready, otherwise a short description
+    #
+    def status(self):
+        if (self.load_start is None):
+            return "Solver idle"
+        if (not self.ready.is_set()):
+            return "Solver %d s" % (time.monotonic() - self.load_start)
+        if (self.error is not None):
+            return "Solver error"
+        return None
+
+
+    # Wait for the solver library to be loaded
+    # Raises KeyboardInterrupt if the wait is aborted and the loading error
+    # if the library couldn't be loaded.
+    #
+    # Input:
+    #   display     The display controller class, None for no display
+    #
+    def wait_ready(self, display=None):
+        self.start_loading()
+        next_display = 0.0
+        while (not self.ready.wait(CANCEL_POLL_TIME)):
+            self.abort.check()
+            if ((display is not None) and (time.monotonic() >= next_display)):
+                display.write_body(self.status())
+                next_display = time.monotonic() + LOAD_DISPLAY_TIME
+        if (self.error is not None):
+            raise self.error
+
+
+    # Search process function
+    #
+    # Inputs:
+    #   conn            Pipe used to return the solution
+    #   cube_string     The cube definition string
+    #   max_length      Stop when a solution this short is found
+    #   timeout         Search time limit (seconds)
+    #
+    def search(self, conn, cube_string, max_length, timeout):
+        conn.send(self.solver.solve(cube_string, max_length, timeout))
+        conn.close()
+
+
+    # Candidate search process function
+    #
+    # The solver library only returns its shortest solution. To get more
+    # than one candidate the search is repeated, each time asking for a
+    # solution shorter than the last one, until the time runs out.
+    # Each solution is sent as soon as it is found.
+    #
+    # Inputs:
+    #   conn            Pipe used to return the solutions
+    #   cube_string     The cube definition string
+    #   timeout         Search time limit (seconds)
+    #
+    def search_candidates(self, conn, cube_string, timeout):
+        end_time = time.monotonic() + timeout
+        max_length = FIRST_MAX_LENGTH
+        while (max_length >= 0):
+            remaining = end_time - time.monotonic()
+            if (remaining <= 0):
+                break
+            solve_string = self.solver.solve(cube_string, max_length, \
+                                             remaining)
+            length = solution_length(solve_string)
+            if (length > max_length):
+                # Nothing shorter was found before the time ran out
+                break
+            conn.send(solve_string)
+            if (length < 0):
+                break
+            max_length = length - 1
+        conn.close()
+
+
+    # Start a search process, or send the search to the solver service
+    #
+    # Inputs:
+    #   name        The name of the search process function
+    #   args        The search function arguments after the pipe
+    #
+    # Return:
+    #   The process, None for the solver service, and the pipe or
+    #   connection used to receive the results
+    #
+    def start(self, name, args):
+        if (self.remote):
+            try:
+                conn = self.connect()
+                conn.send((name,) + args)
+                return None, conn
+            except (OSError, EOFError):
+                # The service has stopped, load the library here instead
+                print("Solver service stopped")
+                self.remote = False
+                self.service = 0
+                self.load_start = None
+                self.ready.clear()
+                self.wait_ready()
+
+        ctx = multiprocessing.get_context('fork')
+        recv, send = ctx.Pipe(False)
+        proc = ctx.Process(target=getattr(self, name), args=(send,) + args, \
+                           daemon=True)
+        proc.start()
+        send.close()
+        return proc, recv
+
+
+    # Stop a search process
+    #
+    # Closing the connection to the solver service stops its search.
+    #
+    # Inputs:
+    #   proc        The search process, None for the solver service
+    #   recv        The pipe used to receive the results
+    #
+    def stop(self, proc, recv):
+        if (proc is not None):
+            if (proc.is_alive()):
+                proc.terminate()
+            proc.join()
+        recv.close()
+
+
+    # Wait for the next result from a search process
+    # Raises KeyboardInterrupt if the search is aborted.
+    #
+    # Input:
+    #   recv        The pipe used to receive the results
+    #
+    # Return:
+    #   The next result, or None when the search is finished
+    #
+    def receive(self, recv):
+        try:
+            while (not recv.poll(CANCEL_POLL_TIME)):
+                self.abort.check()
+            return recv.recv()
+        except (EOFError, OSError):
+            return None
+
+
+    # Find the moves that solve a cube
+    #
+    # Inputs:
+    #   cube_string     The cube definition string
+    #   max_length      Stop when a solution this short is found, 0 to
+    #                   search for the full time
+    #   timeout         Search time limit (seconds)
+    #
+    # Return:
+    #   The solution string from the solver library
+    #
+    def solve(self, cube_string, max_length, timeout):
+        self.wait_ready()
+        proc, recv = self.start("search", (cube_string, max_length, timeout))
+        try:
+            return self.receive(recv)
+        finally:
+            # Stop the search if it is still running
+            self.stop(proc, recv)
+
+
+    # Find several different solutions for a cube
+    #
+    # A search is started for each orientation and they all run for the
+    # same time. The saved solutions are used instead if the cube was
+    # solved before.
+    #
+    # Inputs:
+    #   cube_string     The cube definition string
+    #   timeout         Search time limit (seconds)
+    #   estimate        Function that predicts the robot time of a solution
+    #                   in seconds, or returns None for a solution not worth
+    #                   planning. None to always search for the full time
+    #                   limit.
+    #
+    # Return:
+    #   A list of solution strings in the order they were found
+    #
+    def solve_candidates(self, cube_string, timeout, estimate=None):
+        if (self.cache is not None):
+            saved = self.cache.lookup(cube_string)
+            if (saved is not None):
+                if (saved[1] is None):
+                    print("Using saved solutions")
+                else:
+                    print("Using saved solutions, last solved in %.1f s" % \
+                          saved[1])
+                return saved[0]
+
+        self.wait_ready()
+        if (USE_ORIENTATIONS == 1):
+            orients = [RubikOrient(steps) for steps in SEARCH_ORIENTATIONS]
+        else:
+            orients = [RubikOrient("")]
+
+        searches = []
+        candidates = []
+        start = time.monotonic()
+        # Time the first solution was found, its robot time and the best
+        # robot time found
+        first = None
+        best = None
+        try:
+            for orient in orients:
+                proc, recv = self.start("search_candidates", \
+                    (orient.to_orient(cube_string), timeout))
+                searches.append((proc, recv))
+            active = dict(zip([recv for proc, recv in searches], orients))
+
+            while (len(active) > 0):
+                self.abort.check()
+                for recv in multiprocessing.connection.wait(list(active), \
+                                                            CANCEL_POLL_TIME):
+                    try:
+                        solve_string = active[recv].from_orient(recv.recv())
+                    except (EOFError, OSError):
+                        # This search is finished
+                        del active[recv]
+                        continue
+                    if (solve_string in candidates):
+                        continue
+                    candidates.append(solve_string)
+                    if ((estimate is not None) and \
+                        (not solve_string.startswith("Error"))):
+                        robot_time = estimate(solve_string)
+                        if (robot_time is None):
+                            # Too long to be worth planning
+                            continue
+                        if (first is None):
+                            first = (time.monotonic(), robot_time)
+                            best = robot_time
+                        best = min(best, robot_time)
+
+                # Stop when more search isn't likely to pay for itself
+                if (first is not None):
+                    searched = time.monotonic() - first[0]
+                    if ((searched >= ANYTIME_MIN_TIME) and \
+                        (first[1] - best < ANYTIME_MIN_RATE * searched)):
+                        break
+        finally:
+            for proc, recv in searches:
+                self.stop(proc, recv)
+
+        if (first is not None):
+            print("Searched %.1f s, robot time %.1f s first, %.1f s best" % \
+                  (time.monotonic() - start, first[1], best))
+
+        if (self.cache is not None):
+            self.cache.store(cube_string, candidates)
+        return candidates
+
+
+    # Save the time the robot took to carry out a solution
+    #
+    # Inputs:
+    #   cube_string     The cube definition string
+    #   solve_string    The solution that was carried out
+    #   seconds         The time it took
+    #
+    def record(self, cube_string, solve_string, seconds):
+        if (self.cache is not None):
+            self.cache.record(cube_string, solve_string, seconds)
@@ -16,21 +16,25 @@
 # The clockwise position is 90 degrees.
 
 
-# Import I2C pins.
-import board
-import busio
+# Import I2C pins and the library to control the PCA9685 PWM board that
+# drives the servos.
+from rubik_hw import board, busio, PCA9685
 
 # Needed for file I/O functions
 import os
 
-from time import sleep
-
-# Library to control the PCA9685 PWM board that drives the servos
-from adafruit_pca9685 import PCA9685
-
 # Display controller class
 from rubik_display import RubikDisplay
 
+# Servo motion timeline class
+from rubik_motion import RubikMotion
+
+# PWM output class
+from rubik_pwm import RubikPwm
+
+# Cancel token class
+from rubik_cancel import RubikCancel
+
 # Button detection class
 from rubik_buttons import RubikButtons, UP_BUTTON, DOWN_BUTTON, ENTER_BUTTON
 
@@ -39,11 +43,24 @@ from rubik_buttons import RubikButtons, UP_BUTTON, DOWN_BUTTON, ENTER_BUTTON
 DEBUG = 0
 
 
-# Delay to allow servos to move (seconds)
+# Maximum delay to allow servos to move (seconds)
 # This time is probably conservative but I would rather be a litle slow
 # than have errors caused by moving the servos too fast.
 SERVO_MOVE_DELAY = 1.0
 
+# Set this to 1 to estimate the time of moves that aren't listed in the
+# servo timing file from the size of the PWM count change. Only do this
+# once the constants below have been measured for your servos.
+# Set this to 0 to wait SERVO_MOVE_DELAY for those moves.
+USE_MOVE_ESTIMATE = 0
+
+# Servo move time estimate
+# A servo holding the cube moves slower so the time is increased for
+# loaded moves. The estimate is never more than SERVO_MOVE_DELAY.
+SERVO_SETTLE_TIME = 0.15    # Fixed time for every move (seconds)
+SERVO_COUNT_TIME  = 0.0015  # Time per PWM count moved (seconds)
+SERVO_LOAD_FACTOR = 1.25    # Time multiplier for loaded moves
+
 # Current servo positions
 # These are used to optimize the servo move functions by keeping track
 # of the current servo positions. This avoids having to move the servos
@@ -59,17 +76,36 @@ T_POS_P90    = 2    # Clockwise 90 degree position
 G_POS_OPEN   = 0    # Grip fully open position
 G_POS_LOAD   = 1    # Grip in the load cube position
 G_POS_CLOSED = 2    # Grip closed position
+G_POS_PART   = 3    # Grip opened just a little from the closed position
+
+# Position names used in the servo timing file
+POS_NAMES = {'t': {T_POS_M90: "m90", T_POS_0: "0", T_POS_P90: "90"},
+             'g': {G_POS_OPEN: "open", G_POS_LOAD: "load", \
+                   G_POS_CLOSED: "close", G_POS_PART: "part"}}
 
 
 # Rubik solver servo class
 #
+# Inputs:
+#   button_q    The queue used to get button press events
+#   abort       The cancel token used to abort servo moves
+#   cal_file    The servo calibration file name
+#
 class RubikServo(object):
-    def __init__(self, button_q):
+    def __init__(self, button_q, abort=None, cal_file="servo_tune.txt"):
         # Save the button queue class reference
         self.btn_q = button_q
 
+        # Save the cancel token, servo moves can't be aborted without one
+        if (abort is None):
+            abort = RubikCancel()
+        self.abort = abort
+
         # Servo calibration file name
-        self.cal_file = "servo_tune.txt"
+        self.cal_file = cal_file
+
+        # Servo timing file name
+        self.timing_file = "servo_timing.txt"
 
         # I2C bus used to communicate with the PWM hardware
         i2c = busio.I2C(board.SCL, board.SDA)
@@ -113,21 +149,52 @@ class RubikServo(object):
         else:
             print("Calibration file found")
 
+        # Read the measured servo move times
+        self.timing = self.read_timing()
+
         # Set the frequency for all PWM channels
         self.pca.frequency = self.pwm_freq
 
+        # PWM output used for all servo writes
+        self.pwm = RubikPwm(self.pca)
+
+        # Keeps track of when each servo finishes moving
+        self.motion = RubikMotion(self.abort)
+
         # Set the initial PWM value for all ports
-        # The shift left is needed to put a 12 bit value into a
-        # 16 bit register
-        self.set_pwm_value(self.rt, self.rt_cal_0)
+        self.set_pwm_values([(self.rt, self.rt_cal_0), \
+                             (self.rg, self.rg_cal_open), \
+                             (self.lt, self.lt_cal_0), \
+                             (self.lg, self.lg_cal_open)])
         self.rt_pos = T_POS_0
-        self.set_pwm_value(self.rg, self.rg_cal_open)
         self.rg_pos = G_POS_OPEN
-        self.set_pwm_value(self.lt, self.lt_cal_0)
         self.lt_pos = T_POS_0
-        self.set_pwm_value(self.lg, self.lg_cal_open)
         self.lg_pos = G_POS_OPEN
 
+        # Servo moves recorded instead of run when compiling, or None
+        self.compiled = None
+
+        # The starting servo positions are unknown so allow the longest
+        # move time for all servos
+        for servo in ['rt', 'rg', 'lt', 'lg']:
+            self.motion.start(servo, SERVO_MOVE_DELAY)
+
+        # Single servo move functions indexed by servo name and position.
+        # These are used to run the servo primitive sequences created by
+        # the motion planner.
+        self.move_funcs = {('rt', T_POS_M90):    self.set_right_turn_m90,
+                           ('rt', T_POS_0):      self.set_right_turn_0,
+                           ('rt', T_POS_P90):    self.set_right_turn_90,
+                           ('rg', G_POS_OPEN):   self.set_right_grip_open,
+                           ('rg', G_POS_LOAD):   self.set_right_grip_load,
+                           ('rg', G_POS_CLOSED): self.set_right_grip_closed,
+                           ('lt', T_POS_M90):    self.set_left_turn_m90,
+                           ('lt', T_POS_0):      self.set_left_turn_0,
+                           ('lt', T_POS_P90):    self.set_left_turn_90,
+                           ('lg', G_POS_OPEN):   self.set_left_grip_open,
+                           ('lg', G_POS_LOAD):   self.set_left_grip_load,
+                           ('lg', G_POS_CLOSED): self.set_left_grip_closed}
+
 
     # Read a value from the servo tune file
     #
@@ -140,21 +207,297 @@ class RubikServo(object):
         val = int(tune_spilt[0])
         return val
 
+    # Read the servo timing file
+    #
+    # The timing file is optional. Each line has a measured move time for
+    # one servo move in the form:
+    #   <servo> <start> <end> <loaded> <seconds> <optional comment>
+    # For example "rt 0 90 1 0.45 Right turn 0 to 90 holding the cube".
+    # The servo is rt, rg, lt or lg. The positions are m90, 0 or 90 for the
+    # turn servos and open, load, close or part for the grip servos.
+    # Loaded is 1 if the gripper holds the cube during the move, else 0.
+    #
+    # Return:
+    #   Dictionary of move times indexed by (servo, start, end, loaded)
+    #
+    def read_timing(self):
+        timing = {}
+        if (not os.path.exists(self.timing_file)):
+            return timing
+
+        with open(self.timing_file, 'r') as f:
+            for number, line in enumerate(f, 1):
+                if (line.strip() == ""):
+                    continue
+                move = self.read_timing_line(line)
+                if (move is None):
+                    print("Servo timing file error, line " + str(number) + \
+                          " ignored: " + line.rstrip())
+                    continue
+                timing[move[0]] = move[1]
+        print("Servo timing file found")
+        return timing
+
+
+    # Read one line of the servo timing file
+    #
+    # Input:
+    #   line    The line from the file
+    #
+    # Return:
+    #   A tuple with the (servo, start, end, loaded) key and the move time,
+    #   or None if the line isn't a valid move
+    #
+    def read_timing_line(self, line):
+        fields = line.split()
+        if ((len(fields) < 5) or \
+            (fields[0] not in ['rt', 'rg', 'lt', 'lg']) or \
+            (fields[3] not in ['0', '1'])):
+            return None
+        names = POS_NAMES[fields[0][1]]
+        positions = dict([(names[pos], pos) for pos in names])
+        if ((fields[1] not in positions) or (fields[2] not in positions)):
+            return None
+        try:
+            seconds = float(fields[4])
+        except ValueError:
+            return None
+        if (seconds < 0.0):
+            return None
+        return ((fields[0], positions[fields[1]], positions[fields[2]], \
+                 int(fields[3])), seconds)
+
+
     # Program the PWM hardware to drive a servo.
-    # The 12 bit pwm value must be shifted left 4 bits to put it into
-    # the most significant bits of the 16 register.
     #
     # Inputs:
     #   port    Servo port number
     #   pwm     PWM count
     def set_pwm_value(self, port, pwm):
-        # If the user pressed a button then abort
-        if (self.btn_q.qsize() > 0):
-            # Discard the button
-            self.btn_q.get(False, 0)
-            raise KeyboardInterrupt
+        self.set_pwm_values([(port, pwm)])
+
+
+    # Program the PWM hardware to drive several servos at the same time.
+    # All the values are sent in one I2C transaction.
+    #
+    # Input:
+    #   values  List of (port, pwm) tuples
+    def set_pwm_values(self, values):
+        for port, pwm in values:
+            self.pwm.set_value(port, pwm)
+        self.pwm.commit()
+
+
+    # Get the current position of a servo
+    #
+    # Input:
+    #   servo   Servo name ('rt', 'rg', 'lt' or 'lg')
+    #
+    def get_servo(self, servo):
+        return getattr(self, servo + "_pos")
+
+
+    # Move a single servo to a new position
+    #
+    # Inputs:
+    #   servo   Servo name ('rt', 'rg', 'lt' or 'lg')
+    #   pos     The new servo position (T_POS_xxx or G_POS_xxx)
+    #
+    def set_servo(self, servo, pos):
+        self.move_funcs[(servo, pos)]()
+
+
+    # Get the calibrated PWM count for a servo position
+    #
+    # Inputs:
+    #   servo   Servo name ('rt', 'rg', 'lt' or 'lg')
+    #   pos     The servo position
+    #
+    def get_pwm(self, servo, pos):
+        if (servo[1] == 't'):
+            if (pos == T_POS_M90):
+                return getattr(self, servo + "_cal_m90")
+            elif (pos == T_POS_0):
+                return getattr(self, servo + "_cal_0")
+            else: # pos == T_POS_P90
+                return getattr(self, servo + "_cal_90")
+        else:
+            if (pos == G_POS_OPEN):
+                return getattr(self, servo + "_cal_open")
+            elif (pos == G_POS_LOAD):
+                return getattr(self, servo + "_cal_load")
+            elif (pos == G_POS_CLOSED):
+                return getattr(self, servo + "_cal_close")
+            else: # pos == G_POS_PART
+                return int((getattr(self, servo + "_cal_close") + \
+                            getattr(self, servo + "_cal_load")) / 2)
+
+
+    # Get the time needed to move a single servo
+    #
+    # The time comes from the servo timing file if the move is listed there.
+    # Otherwise it is estimated from the calibrated PWM counts when
+    # USE_MOVE_ESTIMATE is set, or is the longest move time.
+    #
+    # Inputs:
+    #   servo   Servo name ('rt', 'rg', 'lt' or 'lg')
+    #   start   The current servo position
+    #   end     The new servo position
+    #   loaded  True if the gripper holds the cube during the move.
+    #           If not given the current grip position is used.
+    #
+    # Return:
+    #   The time in seconds the servo move functions wait for the move
+    #
+    def move_time(self, servo, start, end, loaded=None):
+        if (start == end):
+            return 0.0
+
+        if (servo[1] == 'g'):
+            if ((start == G_POS_CLOSED) and (end == G_POS_OPEN)):
+                # The grip is opened in two steps
+                return self.move_time(servo, G_POS_CLOSED, G_POS_PART) + \
+                       self.move_time(servo, G_POS_PART, G_POS_OPEN)
+            # A grip holds the cube when it closes on it or opens from it
+            loaded = (start == G_POS_CLOSED) or (end == G_POS_CLOSED)
+        elif (loaded is None):
+            # A turn servo holds the cube when its grip is closed
+            loaded = (self.get_servo(servo[0] + 'g') == G_POS_CLOSED)
+
+        key = (servo, start, end, int(loaded))
+        if (key in self.timing):
+            return self.timing[key]
+        if (USE_MOVE_ESTIMATE == 0):
+            return SERVO_MOVE_DELAY
+
+        delay = SERVO_SETTLE_TIME + SERVO_COUNT_TIME * \
+                abs(self.get_pwm(servo, end) - self.get_pwm(servo, start))
+        if (loaded):
+            delay *= SERVO_LOAD_FACTOR
+        return min(delay, SERVO_MOVE_DELAY)
+
+
+    # List the servos that must stop moving before a servo can be moved
+    #
+    # A servo always waits for the other servo of its own gripper.
+    # A turn servo whose grip holds the cube waits for all servos since it
+    # will turn the cube or a face. A turn servo with an open grip only
+    # waits for the other turn servo, so it can be repositioned while the
+    # other grip closes on the cube. A grip servo closing on the cube
+    # or releasing it waits for the other turn servo so the cube isn't
+    # moving. A grip releasing the cube also waits for the other grip to
+    # finish closing so the cube is always held.
+    #
+    # Inputs:
+    #   servo   Servo name ('rt', 'rg', 'lt' or 'lg')
+    #   pos     The new servo position
+    #
+    def depends(self, servo, pos):
+        other = 'l' if (servo[0] == 'r') else 'r'
+        result = [servo[0] + 't', servo[0] + 'g']
+
+        if (servo[1] == 't'):
+            if (self.get_servo(servo[0] + 'g') == G_POS_CLOSED):
+                result += [other + 't', other + 'g']
+            elif (self.get_servo(other + 'g') == G_POS_CLOSED):
+                result.append(other + 't')
+        elif (pos == G_POS_CLOSED):
+            result.append(other + 't')
+        elif (self.get_servo(servo) == G_POS_CLOSED):
+            result.append(other + 't')
+            if (self.get_servo(other + 'g') == G_POS_CLOSED):
+                result.append(other + 'g')
+
+        return result
+
+
+    # Move a single servo
+    #
+    # The function returns as soon as the servo is programmed. The motion
+    # timeline is used to wait for the move to finish when needed.
+    #
+    # Inputs:
+    #   servo   Servo name ('rt', 'rg', 'lt' or 'lg')
+    #   pos     The new servo position
+    #
+    def move_servo(self, servo, pos):
+        self.move_servos([(servo, pos)])
 
-        self.pca.channels[port].duty_cycle = pwm << 4
+
+    # Start moving several servos at the same time
+    #
+    # Input:
+    #   moves   List of (servo, position) tuples
+    #
+    def move_servos(self, moves):
+        if(DEBUG == 1):
+            print("move_servos " + str(moves))
+        if (self.compiled is not None):
+            self.compile_servos(moves)
+            return
+        wait = []
+        values = []
+        for servo, pos in moves:
+            wait += self.depends(servo, pos)
+            values.append((getattr(self, servo), self.get_pwm(servo, pos)))
+        self.motion.wait(wait)
+
+        self.set_pwm_values(values)
+        for servo, pos in moves:
+            delay = self.move_time(servo, self.get_servo(servo), pos)
+            setattr(self, servo + "_pos", pos)
+            self.motion.start(servo, delay)
+
+
+    # Wait for all servos to stop moving
+    #
+    # Input:
+    #   early       Stop waiting this long before the servos should be
+    #               done (seconds)
+    #
+    def wait_idle(self, early=0.0):
+        self.motion.wait_all(early)
+
+
+    # Start recording servo moves instead of moving the servos
+    #
+    # The servo move functions work normally but only the servo positions
+    # are updated. This is used to get the list of servo moves a sequence
+    # of cube movements needs without any hardware I/O.
+    #
+    def begin_compile(self):
+        self.compiled = []
+        self.compile_pos = (self.rt_pos, self.rg_pos, self.lt_pos, self.lg_pos)
+
+
+    # Stop recording servo moves
+    #
+    # The servo positions are set back to where they were when recording
+    # started.
+    #
+    # Return:
+    #   List of (servo, position) servo moves. These can be run with
+    #   set_servo().
+    #
+    def end_compile(self):
+        moves = self.compiled
+        self.compiled = None
+        self.rt_pos, self.rg_pos, self.lt_pos, self.lg_pos = self.compile_pos
+        return moves
+
+
+    # Record servo moves while compiling
+    #
+    # Input:
+    #   moves   List of (servo, position) tuples
+    #
+    def compile_servos(self, moves):
+        for servo, pos in moves:
+            # The partly open position is added by set_servo() when a
+            # closed grip is opened so it isn't recorded.
+            if (pos != G_POS_PART):
+                self.compiled.append((servo, pos))
+            setattr(self, servo + "_pos", pos)
 
 
     ######################################################
@@ -169,9 +512,7 @@ class RubikServo(object):
         if (DEBUG == 1):
             print("set_right_turn_m90")
         if (self.rt_pos != T_POS_M90):
-            self.set_pwm_value(self.rt, self.rt_cal_m90)
-            self.rt_pos = T_POS_M90
-            sleep(SERVO_MOVE_DELAY)
+            self.move_servo('rt', T_POS_M90)
 
 
     # Set the Right Turn servo to the center (horizontal) position
@@ -180,9 +521,7 @@ class RubikServo(object):
         if (DEBUG == 1):
             print("set_right_turn_0")
         if (self.rt_pos != T_POS_0):
-            self.set_pwm_value(self.rt, self.rt_cal_0)
-            self.rt_pos = T_POS_0
-            sleep(SERVO_MOVE_DELAY)
+            self.move_servo('rt', T_POS_0)
 
 
     # Set the Right Turn servo to the clockwise position
@@ -191,9 +530,7 @@ class RubikServo(object):
         if (DEBUG == 1):
             print("set_right_turn_90")
         if (self.rt_pos != T_POS_P90):
-            self.set_pwm_value(self.rt, self.rt_cal_90)
-            self.rt_pos = T_POS_P90
-            sleep(SERVO_MOVE_DELAY)
+            self.move_servo('rt', T_POS_P90)
 
 
     # Set the Right Grip server to the open position
@@ -204,12 +541,8 @@ class RubikServo(object):
         if (self.rg_pos != G_POS_OPEN):
             if (self.rg_pos == G_POS_CLOSED):
                 # Open just a little first to avoid messing up the cube
-                self.set_pwm_value(self.rg, \
-                             int((self.rg_cal_close + self.rg_cal_load)/2))
-                sleep(SERVO_MOVE_DELAY / 4)
-            self.set_pwm_value(self.rg, self.rg_cal_open)
-            self.rg_pos = G_POS_OPEN
-            sleep(SERVO_MOVE_DELAY)
+                self.move_servo('rg', G_POS_PART)
+            self.move_servo('rg', G_POS_OPEN)
 
 
     # Set the Right Grip server to the cube load position
@@ -218,9 +551,7 @@ class RubikServo(object):
         if (DEBUG == 1):
             print("set_right_grip_load")
         if (self.rg_pos != G_POS_LOAD):
-            self.set_pwm_value(self.rg, self.rg_cal_load)
-            self.rg_pos = G_POS_LOAD
-            sleep(SERVO_MOVE_DELAY)
+            self.move_servo('rg', G_POS_LOAD)
 
 
     # Set the Right Grip server to the closed position
@@ -229,9 +560,7 @@ class RubikServo(object):
         if (DEBUG == 1):
             print("set_right_grip_closed")
         if (self.rg_pos != G_POS_CLOSED):
-            self.set_pwm_value(self.rg, self.rg_cal_close)
-            self.rg_pos = G_POS_CLOSED
-            sleep(SERVO_MOVE_DELAY)
+            self.move_servo('rg', G_POS_CLOSED)
 
 
     # Set the Left Turn servo to the counterclockwise position
@@ -240,9 +569,7 @@ class RubikServo(object):
         if (DEBUG == 1):
             print("set_left_turn_m90")
         if (self.lt_pos != T_POS_M90):
-            self.set_pwm_value(self.lt, self.lt_cal_m90)
-            self.lt_pos = T_POS_M90
-            sleep(SERVO_MOVE_DELAY)
+            self.move_servo('lt', T_POS_M90)
 
 
     # Set the Left Turn servo to the center (horizontal) position
@@ -251,9 +578,7 @@ class RubikServo(object):
         if (DEBUG == 1):
             print("set_left_turn_0")
         if (self.lt_pos != T_POS_0):
-            self.set_pwm_value(self.lt, self.lt_cal_0)
-            self.lt_pos = T_POS_0
-            sleep(SERVO_MOVE_DELAY)
+            self.move_servo('lt', T_POS_0)
 
 
     # Set the Left Turn servo to the clockwise position
@@ -262,9 +587,7 @@ class RubikServo(object):
         if (DEBUG == 1):
             print("set_left_turn_90")
         if (self.lt_pos != T_POS_P90):
-            self.set_pwm_value(self.lt, self.lt_cal_90)
-            self.lt_pos = T_POS_P90
-            sleep(SERVO_MOVE_DELAY)
+            self.move_servo('lt', T_POS_P90)
 
 
     # Set the Left Grip server to the open position
@@ -275,12 +598,8 @@ class RubikServo(object):
         if (self.lg_pos != G_POS_OPEN):
             if (self.lg_pos == G_POS_CLOSED):
                 # Open just a little first to avoid messing up the cube
-                self.set_pwm_value(self.lg, \
-                             int((self.lg_cal_close + self.lg_cal_load)/2))
-                sleep(SERVO_MOVE_DELAY / 4)
-            self.set_pwm_value(self.lg, self.lg_cal_open)
-            self.lg_pos = G_POS_OPEN
-            sleep(SERVO_MOVE_DELAY)
+                self.move_servo('lg', G_POS_PART)
+            self.move_servo('lg', G_POS_OPEN)
 
 
     # Set the Left Grip server to the cube load position
@@ -289,9 +608,7 @@ class RubikServo(object):
         if (DEBUG == 1):
             print("set_left_grip_load")
         if (self.lg_pos != G_POS_LOAD):
-            self.set_pwm_value(self.lg, self.lg_cal_load)
-            self.lg_pos = G_POS_LOAD
-            sleep(SERVO_MOVE_DELAY)
+            self.move_servo('lg', G_POS_LOAD)
 
 
     # Set the Left Grip server to the closed position
@@ -300,9 +617,7 @@ class RubikServo(object):
         if (DEBUG == 1):
             print("set_left_grip_closed")
         if (self.lg_pos != G_POS_CLOSED):
-            self.set_pwm_value(self.lg, self.lg_cal_close)
-            self.lg_pos = G_POS_CLOSED
-            sleep(SERVO_MOVE_DELAY)
+            self.move_servo('lg', G_POS_CLOSED)
 
 
     ######################################################
@@ -326,11 +641,8 @@ class RubikServo(object):
         self.set_right_turn_0()
         self.set_left_turn_0()
         # Put the grippers into the load cube position
-        self.set_pwm_value(self.rg, self.rg_cal_load)
-        self.rg_pos = G_POS_LOAD
-        self.set_pwm_value(self.lg, self.lg_cal_load)
-        self.lg_pos = G_POS_LOAD
-        sleep(SERVO_MOVE_DELAY)
+        # Both grippers move at the same time
+        self.move_servos([('rg', G_POS_LOAD), ('lg', G_POS_LOAD)])
 
         while 1:
             # Wait for a button event
@@ -338,11 +650,8 @@ class RubikServo(object):
 
             if (button_press == ENTER_BUTTON):
                 # Close the grippers
-                self.set_pwm_value(self.rg, self.rg_cal_close)
-                self.rg_pos = G_POS_CLOSED
-                self.set_pwm_value(self.lg, self.lg_cal_close)
-                self.lg_pos = G_POS_CLOSED
-                sleep(SERVO_MOVE_DELAY)
+                # Both grippers move at the same time
+                self.move_servos([('rg', G_POS_CLOSED), ('lg', G_POS_CLOSED)])
                 break
 
 
@@ -359,11 +668,8 @@ class RubikServo(object):
             self.set_left_grip_open()
             self.set_left_turn_0()
             self.set_left_grip_closed()
-        self.set_pwm_value(self.rg, self.rg_cal_load)
-        self.rg_pos = G_POS_LOAD
-        self.set_pwm_value(self.lg, self.lg_cal_load)
-        self.lg_pos = G_POS_LOAD
-        sleep(SERVO_MOVE_DELAY)
+        # Both grippers move at the same time
+        self.move_servos([('rg', G_POS_LOAD), ('lg', G_POS_LOAD)])
 
 
     # Make sure the right gripper doesn't block the camera
@@ -498,7 +804,7 @@ class RubikServo(object):
             self.set_right_grip_open()
             self.set_right_turn_0()
             self.set_right_grip_closed()
-        if (self.rt_pos == T_POS_M90):
+        if (self.rt_pos == T_POS_P90):
             self.set_right_turn_0()
         else:
             self.set_right_turn_m90()
@@ -728,6 +1034,7 @@ class RubikServo(object):
         self.rt_cal_90 = self.servo_cal("RT90", self.rt, self.rt_cal_90, \
                                         display, btn_q)
         self.set_pwm_value(self.rt, self.rt_cal_0)
+        self.rt_pos = T_POS_0
 
         # Adjust all the calibration values for the Right Grip servo
         self.rg_cal_close = self.servo_cal("RGC", self.rg, self.rg_cal_close, \
@@ -737,6 +1044,7 @@ class RubikServo(object):
         self.rg_cal_load = self.servo_cal("RGR", self.rg, self.rg_cal_load, \
                                           display, btn_q)
         self.set_pwm_value(self.rg, self.rg_cal_open)
+        self.rg_pos = G_POS_OPEN
 
         # Adjust all the calibration values for the Left Turn servo
         self.lt_cal_m90 = self.servo_cal("LTM90", self.lt, self.lt_cal_m90, \
@@ -746,6 +1054,7 @@ class RubikServo(object):
         self.lt_cal_90 = self.servo_cal("LT90", self.lt, self.lt_cal_90, \
                                         display, btn_q)
         self.set_pwm_value(self.lt, self.lt_cal_0)
+        self.lt_pos = T_POS_0
 
         # Adjust all the calibration values for the Left Grip servo
         self.lg_cal_close = self.servo_cal("LGC", self.lg, self.lg_cal_close, \
@@ -755,6 +1064,7 @@ class RubikServo(object):
         self.lg_cal_load = self.servo_cal("LGR", self.lg, self.lg_cal_load, \
                                           display, btn_q)
         self.set_pwm_value(self.lg, self.lg_cal_open)
+        self.lg_pos = G_POS_OPEN
 
         # Save the new calibration values
         f=open(self.cal_file,'w+')
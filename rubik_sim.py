@@ -0,0 +1,804 @@
+#!/usr/bin/python
+
+#
+# Simulated hardware for the Rubik's cube solver robot.
+#
+# This file provides fake versions of the PWM controller, display, camera
+# and GPIO buttons along with a model of the cube in the grippers. This lets
+# all of the robot code run on a normal Linux computer. The hardware is
+# selected in rubik_hw.py.
+#
+# The simulated clock is virtual. Sleeping moves the simulated time forward
+# immediately so a full solve runs in well under a second of real time,
+# while still reporting how long the real robot would have taken.
+#
+# The robot model follows the servo positions and moves the cube the same
+# way the real grippers would. Servo moves that would drop the cube, hit the
+# other gripper or start before the servos they depend on have finished
+# moving are recorded as faults.
+#
+# Running "python rubik_sim.py" does one complete load, scan, solve and
+# release cycle on a scrambled cube and reports the simulated robot time.
+# A scramble can be given on the command line, for example
+# "python rubik_sim.py R1 U2 F3". Otherwise a random scramble is used.
+# The --no-solver option undoes the scramble instead of using the solver
+# library.
+#
+# Running "python rubik.py --sim" runs the normal program with the
+# simulated hardware. The buttons are pressed by typing u (Up), d (Down)
+# or e (Enter) followed by return, and the display is drawn in the terminal.
+#
+
+import os, sys, math
+import random
+import tempfile
+import threading
+
+from PIL import Image, ImageDraw, ImageFilter
+
+
+# Simulated time for hardware operations (seconds)
+SIM_CAPTURE_TIME = 0.7          # Take a full resolution picture
+SIM_CAPTURE_FIXED = 0.3         # Part of the picture time not set by its size
+SIM_EXPOSURE = 20000            # Settled exposure time (microseconds)
+SIM_EXPOSURE_TIME = 0.5         # Automatic exposure time constant (seconds)
+SIM_BLUR = 60                   # Blur of a picture taken while moving (pixels)
+SIM_I2C_BYTE_TIME = 10 / 400000 # Send one byte on the 400 kHz I2C bus
+
+# Simulated servo speed
+# These are a little faster than the servo controller estimates so correct
+# code never waits too little.
+SIM_SERVO_SETTLE = 0.1          # Fixed time for every move (seconds)
+SIM_SERVO_COUNT = 0.0012        # Time per PWM count moved (seconds)
+SIM_SERVO_LOAD = 1.2            # Time multiplier for loaded moves
+
+# Colors of the cube faces
+SIM_COLORS = {'U': (235, 235, 235), 'R': (200, 20, 30), 'F': (20, 160, 60), \
+              'D': (230, 220, 30), 'L': (250, 120, 20), 'B': (20, 60, 200)}
+
+# Outward direction of each cube face when the cube is in the load position.
+# The right gripper holds the Down face, the left gripper holds the Back
+# face and the camera looks at the Front face.
+FACE_AXIS = {'U': (0, 1, 0), 'R': (1, 0, 0), 'F': (0, 0, 1), \
+             'D': (0, -1, 0), 'L': (-1, 0, 0), 'B': (0, 0, -1)}
+
+# Direction from the cube to each gripper and to the camera
+RIGHT_AXIS = (0, -1, 0)
+LEFT_AXIS = (0, 0, -1)
+CAMERA_AXIS = (0, 0, 1)
+
+# The top of the camera picture is away from the right gripper
+CAMERA_UP = (0, 1, 0)
+
+# Button GPIO numbers for the keyboard keys
+SIM_KEYS = {'u': 17, 'd': 27, 'e': 22}
+
+
+# Vector helper functions
+#
+def v_dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+def v_cross(a, b):
+    return (a[1] * b[2] - a[2] * b[1], \
+            a[2] * b[0] - a[0] * b[2], \
+            a[0] * b[1] - a[1] * b[0])
+
+# Rotate a vector about an axis in 90 degree steps
+#
+# Inputs:
+#   v           The vector to rotate
+#   axis        Unit axis vector
+#   quarters    Number of 90 degree steps, positive is counterclockwise
+#               looking from the end of the axis towards the center
+#
+def v_rotate(v, axis, quarters):
+    for step in range(0, quarters % 4):
+        d = v_dot(axis, v)
+        c = v_cross(axis, v)
+        v = (c[0] + d * axis[0], c[1] + d * axis[1], c[2] + d * axis[2])
+    return v
+
+
+# Simulated Rubik's cube
+#
+# The cube is a list of 54 stickers. Each sticker has a position, the
+# direction it faces and a color. The cube center is at 0, 0, 0 and the
+# stickers are at -1, 0 or 1 along each axis.
+#
+class SimCube(object):
+    def __init__(self, facelets = "UUUUUUUUURRRRRRRRRFFFFFFFFFDDDDDDDDDLLLLLLLLLBBBBBBBBB"):
+        self.stickers = []
+        for index in range(0, 54):
+            pos, normal = self.facelet_location(index)
+            self.stickers.append([pos, normal, facelets[index]])
+
+
+    # Get the location of a sticker in the cube solver facelet order
+    #
+    # The faces are in U, R, F, D, L, B order with the squares of each face
+    # in rows from the top left, the same as the cube solver uses.
+    #
+    # Input:
+    #   index       Facelet number 0 to 53
+    #
+    # Return:
+    #   The sticker position and direction in the load position
+    #
+    def facelet_location(self, index):
+        face = "URFDLB"[index // 9]
+        row = (index % 9) // 3
+        col = index % 3
+        if (face == 'U'):
+            pos = (col - 1, 1, row - 1)
+        elif (face == 'R'):
+            pos = (1, 1 - row, 1 - col)
+        elif (face == 'F'):
+            pos = (col - 1, 1 - row, 1)
+        elif (face == 'D'):
+            pos = (col - 1, -1, 1 - row)
+        elif (face == 'L'):
+            pos = (-1, 1 - row, col - 1)
+        else: # face == 'B'
+            pos = (1 - col, 1 - row, -1)
+        return pos, FACE_AXIS[face]
+
+
+    # Get the facelet string of the cube in the load position orientation
+    #
+    def facelets(self):
+        colors = {}
+        for pos, normal, color in self.stickers:
+            colors[(pos, normal)] = color
+        result = ""
+        for index in range(0, 54):
+            result += colors[self.facelet_location(index)]
+        return result
+
+
+    # Check if every face is a single color
+    #
+    def solved(self):
+        faces = {}
+        for pos, normal, color in self.stickers:
+            faces.setdefault(normal, set()).add(color)
+        return all([len(c) == 1 for c in faces.values()])
+
+
+    # Rotate the whole cube or one layer
+    #
+    # Inputs:
+    #   axis        Unit vector of the rotation axis
+    #   quarters    Number of 90 degree steps, positive is counterclockwise
+    #               looking from the end of the axis
+    #   layer       True to only rotate the layer at the end of the axis
+    #
+    def rotate(self, axis, quarters, layer):
+        for sticker in self.stickers:
+            if ((not layer) or (v_dot(sticker[0], axis) == 1)):
+                sticker[0] = v_rotate(sticker[0], axis, quarters)
+                sticker[1] = v_rotate(sticker[1], axis, quarters)
+
+
+    # Do a move using cube solver notation, for example ('R', 1)
+    #
+    # The move is done on the face with the named color center. A turn of 1
+    # is clockwise looking at the face, 2 is 180 degrees and 3 is
+    # counterclockwise.
+    #
+    # Inputs:
+    #   face        The face name
+    #   turn        The amount of rotation
+    #
+    def move(self, face, turn):
+        for pos, normal, color in self.stickers:
+            if ((color == face) and (pos == normal)):
+                axis = normal
+        self.rotate(axis, -turn, True)
+
+
+    # Get the colors of the face looking in a direction
+    #
+    # Inputs:
+    #   axis        The direction the face looks
+    #   up          The direction that is the top of the picture
+    #
+    # Return:
+    #   A list of 9 colors in rows from the top left of the picture
+    #
+    def view(self, axis, up):
+        right = v_cross((-axis[0], -axis[1], -axis[2]), up)
+        result = [' '] * 9
+        for pos, normal, color in self.stickers:
+            if (normal == axis):
+                col = v_dot(pos, right) + 1
+                row = 1 - v_dot(pos, up)
+                result[row * 3 + col] = color
+        return result
+
+
+# Simulated clock
+#
+# Sleeping moves the time forward without waiting.
+#
+class SimClock(object):
+    def __init__(self):
+        self.now = 0.0
+        self.lock = threading.Lock()
+
+    def sleep(self, seconds):
+        if (seconds > 0):
+            with self.lock:
+                self.now += seconds
+
+    def monotonic(self):
+        return self.now
+
+    def wait(self, event, seconds):
+        self.sleep(seconds)
+        return event.is_set()
+
+
+# Simulated robot
+#
+# Tracks the servo positions and moves the cube to match.
+#
+class SimRobot(object):
+    def __init__(self):
+        self.cube = SimCube()
+
+        # Servo calibration file name
+        self.cal_file = "servo_tune.txt"
+        self.cal = None
+
+        # Servo positions and the time each servo stops moving
+        self.pos = {'rt': '0', 'rg': 'open', 'lt': '0', 'lg': 'open'}
+        self.pwm = {}
+        self.busy_until = {'rt': 0.0, 'rg': 0.0, 'lt': 0.0, 'lg': 0.0}
+
+        # Problems found while running
+        self.faults = []
+
+        # Number of pictures taken while a servo was moving
+        self.moving_pictures = 0
+
+        # Press Enter when the grippers are ready for a cube to be loaded
+        self.operator = False
+
+        # True when the cube is in the grippers
+        self.has_cube = False
+
+        # Read button presses from the keyboard
+        self.keyboard = True
+
+        # Draw the display in the terminal
+        self.echo_display = True
+
+        # Simulated GPIO used to press buttons
+        self.gpio = None
+
+
+    # Read the servo calibration file
+    #
+    def read_calibration(self):
+        f = open(self.cal_file, 'r')
+        vals = [int(line.split(" ")[0]) for line in f.readlines()[0:19]]
+        f.close()
+        self.ports = {vals[3]: 'rg', vals[4]: 'rt', vals[5]: 'lg', vals[6]: 'lt'}
+        self.cal = {'rt': {'m90': vals[7], '0': vals[8], '90': vals[9]}, \
+                    'rg': {'close': vals[10], 'open': vals[11], 'load': vals[12]}, \
+                    'lt': {'m90': vals[13], '0': vals[14], '90': vals[15]}, \
+                    'lg': {'close': vals[16], 'open': vals[17], 'load': vals[18]}}
+
+
+    # Record a problem
+    #
+    def fault(self, text):
+        self.faults.append("%.2f " % clock.monotonic() + text)
+
+
+    # Get the position name for a servo PWM count
+    #
+    def position(self, servo, pwm):
+        for name in self.cal[servo]:
+            if (self.cal[servo][name] == pwm):
+                return name
+        if (servo[1] == 'g'):
+            # Part way open is not holding the cube
+            return 'part'
+        return None
+
+
+    # Check that servos have finished moving
+    #
+    def check_idle(self, servos, text):
+        for servo in servos:
+            if (self.busy_until[servo] > clock.monotonic() + 1e-9):
+                self.fault(text + " while " + servo + " is moving")
+
+
+    # A PWM channel was programmed
+    #
+    # Inputs:
+    #   port    The PWM channel
+    #   pwm     The 12 bit PWM count
+    #
+    def set_pwm(self, port, pwm):
+        if (self.cal is None):
+            self.read_calibration()
+        if (port not in self.ports):
+            return
+        servo = self.ports[port]
+        if (servo not in self.pwm):
+            # First value programmed after power up
+            self.pwm[servo] = pwm
+            self.pos[servo] = self.position(servo, pwm)
+            return
+        old_pwm = self.pwm[servo]
+        self.pwm[servo] = pwm
+        if (old_pwm == pwm):
+            return
+
+        other = 'l' if (servo[0] == 'r') else 'r'
+        axis = RIGHT_AXIS if (servo[0] == 'r') else LEFT_AXIS
+        holding = (self.pos[servo[0] + 'g'] == 'close')
+        other_holding = (self.pos[other + 'g'] == 'close')
+        new_pos = self.position(servo, pwm)
+        if (new_pos is None):
+            self.fault(servo + " moved to an unknown position " + str(pwm))
+            return
+
+        loaded = holding
+        if (servo[1] == 't'):
+            quarters = ['m90', '0', '90'].index(new_pos) - \
+                       ['m90', '0', '90'].index(self.pos[servo])
+            if (not self.has_cube):
+                pass
+            elif (holding and (self.pos[other + 't'] != '0')):
+                self.fault(servo + " turned into the other gripper")
+            elif ((not holding) and (not other_holding)):
+                self.fault(servo + " turned with no grip on the cube")
+            elif (not holding):
+                # Only the gripper moves, clear of the cube
+                self.check_idle([servo, servo[0] + 'g', other + 't'], \
+                                servo + " turned")
+            else:
+                self.check_idle([servo, servo[0] + 'g', other + 't', \
+                                 other + 'g'], servo + " turned")
+                # Turning the gripper clockwise is a positive rotation
+                # about the axis pointing from the cube to the gripper.
+                # If the other gripper holds the cube only the face
+                # turns, otherwise the whole cube turns.
+                self.cube.rotate(axis, quarters, other_holding)
+        else:
+            releasing = (self.pos[servo] == 'close') and (new_pos != 'close')
+            loaded = releasing or (new_pos == 'close')
+            if (self.has_cube and loaded):
+                self.check_idle([servo, servo[0] + 't', other + 't'], \
+                                servo + " moved on the cube")
+            if (self.has_cube and releasing):
+                if (other_holding):
+                    self.check_idle([other + 'g'], servo + " released the cube")
+                elif (new_pos != 'load'):
+                    self.fault(servo + " dropped the cube")
+
+        # Time for the servo to move
+        delay = SIM_SERVO_SETTLE + SIM_SERVO_COUNT * abs(pwm - old_pwm)
+        if (loaded):
+            delay *= SIM_SERVO_LOAD
+        self.busy_until[servo] = max(self.busy_until[servo], \
+                                     clock.monotonic()) + delay
+        self.pos[servo] = new_pos
+
+        if ((self.pos['rg'] == 'load') and (self.pos['lg'] == 'load')):
+            if (self.operator):
+                # The operator loads the cube and presses Enter
+                self.operator = False
+                self.has_cube = True
+                threading.Thread(target=self.gpio.click, \
+                                 args=(SIM_KEYS['e'],), daemon=True).start()
+            else:
+                # The operator removes the cube
+                self.has_cube = False
+
+
+    # Get the colors seen by the camera
+    #
+    # Return:
+    #   A tuple with the colors and True if a servo is still moving, which
+    #   blurs the picture
+    #
+    def camera_view(self):
+        if (self.pos['rt'] != '0'):
+            self.fault("picture taken with the right gripper in the way")
+        moving = False
+        for servo in ['rt', 'rg', 'lt', 'lg']:
+            if (self.busy_until[servo] > clock.monotonic() + 1e-9):
+                moving = True
+        if (moving):
+            self.moving_pictures += 1
+        return self.cube.view(CAMERA_AXIS, CAMERA_UP), moving
+
+
+# The simulated robot and clock used by all the fake devices
+clock = SimClock()
+robot = SimRobot()
+
+
+######################################################
+# Fake hardware libraries
+######################################################
+
+
+# Fake board pin information
+#
+class board(object):
+    SCL = 3
+    SDA = 2
+
+
+# Fake I2C bus
+#
+class busio(object):
+    class I2C(object):
+        def __init__(self, scl, sda):
+            pass
+
+
+# Fake I2C device used for raw register writes
+#
+class SimI2CDevice(object):
+    def __init__(self, pca):
+        self.pca = pca
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def write(self, buf):
+        clock.sleep(len(buf) * SIM_I2C_BYTE_TIME)
+        # Channel registers start at 6 with 4 registers per channel
+        first = (buf[0] - 6) // 4
+        for index in range(0, (len(buf) - 1) // 4):
+            data = buf[1 + index * 4: 5 + index * 4]
+            robot.set_pwm(first + index, data[2] + ((data[3] & 0x0F) << 8))
+
+
+# Fake PCA9685 PWM channel
+#
+class SimPwmChannel(object):
+    def __init__(self, index):
+        self.index = index
+        self.value = 0
+
+    @property
+    def duty_cycle(self):
+        return self.value
+
+    @duty_cycle.setter
+    def duty_cycle(self, value):
+        clock.sleep(5 * SIM_I2C_BYTE_TIME)
+        self.value = value
+        robot.set_pwm(self.index, (value + 1) >> 4)
+
+
+# Fake PCA9685 PWM controller
+#
+class PCA9685(object):
+    def __init__(self, i2c):
+        self.frequency = 50
+        self.mode1_reg = 0xA1
+        self.channels = [SimPwmChannel(index) for index in range(0, 16)]
+        self.i2c_device = SimI2CDevice(self)
+
+
+# Fake SSD1306 display
+#
+class SSD1306_I2C(object):
+    def __init__(self, width, height, i2c):
+        self.width = width
+        self.height = height
+        self.buffer = Image.new('1', (width, height))
+
+    def fill(self, color):
+        self.buffer = Image.new('1', (self.width, self.height), color)
+
+    def image(self, img):
+        self.buffer = img.copy()
+
+    def show(self):
+        # The whole display buffer is sent on each update
+        clock.sleep((self.width * self.height / 8) * SIM_I2C_BYTE_TIME)
+        if (robot.echo_display):
+            lines = []
+            for y in range(0, self.height, 4):
+                line = ""
+                for x in range(0, self.width, 2):
+                    line += "#" if self.buffer.getpixel((x, y)) else " "
+                lines.append(line.rstrip())
+            print("\n".join(lines).rstrip("\n") + "\n" + "-" * 64)
+
+
+# Fake Raspberry Pi camera
+#
+class PiCamera(object):
+    def __init__(self):
+        self.resolution = (3280, 2464)
+        self.zoom = (0.0, 0.0, 1.0, 1.0)
+        self.iso = 0
+        self.analog_gain = 1.0
+        self.digital_gain = 1.0
+        self.exposure_mode = 'auto'
+        self.open_time = clock.monotonic()
+        self.shutter_speed = 0
+        self.awb_gains = (1.5, 1.5)
+        self.awb_mode = 'auto'
+        self.saturation = 0
+        self.closed = False
+
+    # The automatic exposure starts too bright and settles over time
+    @property
+    def exposure_speed(self):
+        if (self.exposure_mode == 'off'):
+            return self.shutter_speed
+        age = clock.monotonic() - self.open_time
+        return int(SIM_EXPOSURE * (1.0 + math.exp(-age / SIM_EXPOSURE_TIME)))
+
+    def start_preview(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    # Make a picture of the cube face in front of the camera
+    #
+    # The squares are drawn at the locations the scanner reads. Only the
+    # zoomed part of the sensor is in the picture.
+    #
+    def render(self):
+        # Imported here because the scanner imports the hardware
+        import rubik_scan
+
+        width, height = self.resolution
+        zoom_x, zoom_y, zoom_w, zoom_h = self.zoom
+        scale_x = width / (rubik_scan.IMG_WIDTH * zoom_w)
+        scale_y = height / (rubik_scan.IMG_HIGHT * zoom_h)
+        left = zoom_x * rubik_scan.IMG_WIDTH
+        top = zoom_y * rubik_scan.IMG_HIGHT
+        xs = [rubik_scan.LEFT_COLUMN, rubik_scan.MID_COLUMN, \
+              rubik_scan.RIGHT_COLUMN]
+        ys = [rubik_scan.TOP_ROW, rubik_scan.MID_ROW, rubik_scan.BOTTOM_ROW]
+        size = min(xs[1] - xs[0], ys[1] - ys[0]) * 0.4
+
+        im = Image.new('RGB', (width, height), (40, 40, 40))
+        draw = ImageDraw.Draw(im)
+        colors, moving = robot.camera_view()
+        for index in range(0, 9):
+            x = xs[index % 3] - left
+            y = ys[index // 3] - top
+            draw.rectangle([((x - size) * scale_x, (y - size) * scale_y), \
+                            ((x + size) * scale_x, (y + size) * scale_y)], \
+                           fill=SIM_COLORS[colors[index]])
+        if (moving):
+            im = im.filter(ImageFilter.BoxBlur(max(1, int(SIM_BLUR * scale_x))))
+        return im
+
+    def capture(self, output, format='jpeg', **kwargs):
+        # Smaller pictures are quicker to read out and process
+        width, height = self.resolution
+        clock.sleep(SIM_CAPTURE_TIME * (SIM_CAPTURE_FIXED + \
+            (1.0 - SIM_CAPTURE_FIXED) * width * height / (3280.0 * 2464.0)))
+        im = self.render()
+        if (format == 'rgb'):
+            # Raw pixels padded to a multiple of 32 columns and 16 rows
+            width, height = im.size
+            frame = Image.new('RGB', (((width + 31) // 32) * 32, \
+                                      ((height + 15) // 16) * 16))
+            frame.paste(im, (0, 0))
+            data = frame.tobytes()
+            if (hasattr(output, "write")):
+                output.write(data)
+            else:
+                memoryview(output).cast('B')[:len(data)] = data
+        elif (isinstance(output, str)):
+            im.save(output)
+        else:
+            im.save(output, format)
+
+
+# Fake Raspberry Pi GPIO library
+#
+class GPIO(object):
+    BCM = 11
+    IN = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    BOTH = 33
+
+    levels = {}
+    callbacks = {}
+    key_thread = None
+
+    @staticmethod
+    def setmode(mode):
+        robot.gpio = GPIO
+
+    @staticmethod
+    def setup(pin, direction, pull):
+        GPIO.levels[pin] = 1
+
+    @staticmethod
+    def input(pin):
+        return GPIO.levels.get(pin, 1)
+
+    @staticmethod
+    def add_event_detect(pin, edge, callback=None, bouncetime=0):
+        GPIO.callbacks[pin] = callback
+        if (robot.keyboard and (GPIO.key_thread is None)):
+            GPIO.key_thread = threading.Thread(target=GPIO.read_keys, \
+                                               daemon=True)
+            GPIO.key_thread.start()
+
+    # Press and release a button
+    #
+    @staticmethod
+    def click(pin):
+        for level in [0, 1]:
+            GPIO.levels[pin] = level
+            if (pin in GPIO.callbacks):
+                GPIO.callbacks[pin](pin)
+
+    # Press buttons from keys typed on the keyboard
+    #
+    # The keys are read straight from the file instead of through sys.stdin.
+    # A search process forked while this thread waited inside sys.stdin
+    # would hang closing it because the lock is never released.
+    #
+    @staticmethod
+    def read_keys():
+        while (1):
+            data = os.read(sys.stdin.fileno(), 64)
+            if (len(data) == 0):
+                break
+            for key in data.decode(errors='ignore').lower():
+                if (key in SIM_KEYS):
+                    GPIO.click(SIM_KEYS[key])
+
+
+######################################################
+# Simulated solve cycle
+######################################################
+
+
+# Calibration values used by the simulation
+SIM_CALIBRATION = [50, 102, 512, 0, 1, 2, 3, \
+                   110, 307, 500, 300, 200, 280, \
+                   110, 307, 500, 300, 200, 280]
+
+
+# Make a random scramble
+#
+# Input:
+#   length      Number of moves
+#
+def random_scramble(length):
+    moves = []
+    while (len(moves) < length):
+        face = random.choice("URFDLB")
+        if ((len(moves) > 0) and (moves[-1][0] == face)):
+            continue
+        moves.append(face + str(random.randint(1, 3)))
+    return moves
+
+
+# Run one complete solve cycle on the simulated robot
+#
+def main():
+    # The display fonts are in the same directory as this file
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    # Undo the scramble instead of searching for a solution
+    no_solver = ("--no-solver" in sys.argv)
+    scramble = [arg for arg in sys.argv[1:] if (arg != "--no-solver")]
+    if (len(scramble) == 0):
+        scramble = random_scramble(20)
+
+    robot.keyboard = False
+    robot.echo_display = False
+
+    # Use a calibration file made for the simulation
+    fd, robot.cal_file = tempfile.mkstemp(suffix=".txt")
+    f = os.fdopen(fd, 'w')
+    for val in SIM_CALIBRATION:
+        f.write(str(val) + "\n")
+    f.close()
+
+    # Imported here so the simulated hardware is used
+    from queue import Queue
+    import rubik_servos
+    from rubik_display import RubikDisplay
+    from rubik_buttons import RubikButtons
+    from rubik_cancel import RubikCancel
+    from rubik_servos import RubikServo
+    from rubik_scan import RubikScan
+    from rubik_solve import RubikSolve
+
+    # The simulated servo speeds are known so the move times can be
+    # estimated instead of always waiting the longest time
+    rubik_servos.USE_MOVE_ESTIMATE = 1
+
+    display = RubikDisplay()
+    btn_q = Queue(maxsize = 8)
+    abort = RubikCancel()
+    button = RubikButtons(btn_q, abort)
+    button.start()
+    servos = RubikServo(btn_q, abort, robot.cal_file)
+    cube_solver = RubikSolve(servos, display)
+    scanner = RubikScan(servos, cube_solver.get_faces)
+
+    # Scramble the cube
+    for move in scramble:
+        robot.cube.move(move[0], int(move[1]))
+    cube_def = robot.cube.facelets()
+    print("Scramble " + " ".join(scramble))
+
+    # Load the cube
+    robot.operator = True
+    scanner.camera_init()
+    servos.cube_load(display, btn_q)
+    start = clock.monotonic()
+
+    # Scan
+    success, cube_string = scanner.scan_cube(display)
+    scan_time = clock.monotonic() - start
+    if (cube_string != cube_def):
+        print("Scan mismatch " + cube_def)
+
+    # Solve
+    if (success):
+        cube_solver.set_start_faces(scanner.face_l, scanner.face_r)
+        if (no_solver):
+            print("Solver skipped, undoing the scramble")
+            undo = [m[0] + str(4 - int(m[1])) for m in reversed(scramble)]
+            candidates = [" ".join(undo) + " (" + str(len(undo)) + "f)"]
+        else:
+            try:
+                from rubik_search import RubikSearch
+                candidates = RubikSearch(abort).solve_candidates( \
+                    cube_string, 6, cube_solver.estimate)
+            except ImportError:
+                print("The solver library isn't installed. Use --no-solver " + \
+                      "to undo the scramble instead.")
+                os.remove(robot.cal_file)
+                return False
+        solve_string, plan = cube_solver.choose_solution(candidates)
+        print(solve_string)
+        cube_solver.solve(display, servos, solve_string, plan)
+    solve_time = clock.monotonic() - start - scan_time
+
+    servos.cube_release()
+    servos.wait_idle()
+    total_time = clock.monotonic() - start
+
+    print("Scan   %7.2f s" % scan_time)
+    print("Solve  %7.2f s" % solve_time)
+    print("Total  %7.2f s" % total_time)
+    print("PWM I2C transactions %d, bytes %d" % \
+          (servos.pwm.transactions, servos.pwm.bytes_sent))
+    print("Pictures taken while moving %d" % robot.moving_pictures)
+    print("Solved " + str(robot.cube.solved()))
+    for text in robot.faults:
+        print("Fault " + text)
+
+    os.remove(robot.cal_file)
+    return robot.cube.solved() and (len(robot.faults) == 0)
+
+
+if __name__ == "__main__":
+    # Make sure the robot code uses this simulation
+    os.environ["RUBIK_SIM"] = "1"
+    import rubik_sim
+    sys.exit(0 if rubik_sim.main() else 1)
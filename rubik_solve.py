@@ -11,9 +11,41 @@ from rubik_display import RubikDisplay
 # Servo controller class
 from rubik_servos import RubikServo
 
+# Servo motion planner class
+from rubik_plan import RubikPlan
+
+# Servo move optimizer class
+from rubik_peephole import RubikPeephole
+
+# Solution rewrite class
+from rubik_rewrite import RubikRewrite
+
 # Set this to 0 to disable debug logging, 1 to enable.
 DEBUG = 0
 
+# Set this to 1 to plan the servo movements for the whole solution at once.
+# Set this to 0 to choose the gripper one move at a time.
+USE_PLANNER = 1
+
+# Set this to 1 to record the servo moves of the one move at a time method
+# for the whole solution and remove wasted moves before running them.
+# This is only used when the planner is disabled.
+USE_PEEPHOLE = 1
+
+# Set this to 1 to combine moves and reorder opposite face moves so the
+# solution needs fewer cube rotations.
+USE_REWRITE = 1
+
+# Candidate solutions with more moves than this over the shortest one
+# aren't planned. Planning takes a while and so many extra moves are
+# rarely made up for by needing fewer cube rotations.
+ESTIMATE_MAX_EXTRA = 2
+
+# The faces held by the left and right grippers after image scanning,
+# unless the scanner reports different ones
+START_FACE_L = 'U'
+START_FACE_R = 'F'
+
 
 # Rubic's cube solve class
 #
@@ -28,6 +60,39 @@ class RubikSolve(object):
         # Save the display info provided by the caller
         self.display = disp
 
+        # Planner used to find the fastest servo movements for a solution
+        self.planner = RubikPlan(serv, self.get_faces)
+
+        # Optimizer used to remove wasted servo moves
+        self.peephole = RubikPeephole(serv, self.planner)
+
+        # Used to reorder the solution moves
+        self.rewriter = RubikRewrite(self.get_faces)
+
+        # The faces held by the left and right grippers when solving starts
+        self.start_l = START_FACE_L
+        self.start_r = START_FACE_R
+
+        # The solution carried out and its servo plan for each solution
+        # already estimated from the current start faces
+        self.estimates = {}
+
+        # The number of moves of the shortest solution estimated
+        self.shortest = None
+
+
+    # Set the faces held by the grippers when solving starts
+    #
+    # Inputs:
+    #   face_l          The face held by the left gripper
+    #   face_r          The face held by the right gripper
+    #
+    def set_start_faces(self, face_l, face_r):
+        self.start_l = face_l
+        self.start_r = face_r
+        self.estimates = {}
+        self.shortest = None
+
 
     # List the faces that are reachable by a simple cube turn
     # based on the face currently held in the gripper.
@@ -158,30 +223,159 @@ class RubikSolve(object):
             return delta
 
 
+    # Run a servo movement sequence created by the planner
+    #
+    # Inputs:
+    #   display         The display class used to display user messages
+    #   plan            List of (servo, position, step) servo movements
+    #   num_moves       The number of moves in the solution
+    #
+    def run_plan(self, display, plan, num_moves):
+        step = -1
+        for servo, pos, move in plan:
+            if (move != step):
+                # Provide a count down for the user.
+                step = move
+                display.write_body(str(num_moves - step))
+            self.servos.set_servo(servo, pos)
+
+
+    # Combine and reorder the solution moves to need fewer cube rotations
+    #
+    # Input:
+    #   solve_string    The sequence of moves to be done to solve the cube
+    #
+    # Return:
+    #   The new solution string
+    #
+    def rewrite(self, solve_string):
+        if (USE_REWRITE == 1):
+            return self.rewriter.rewrite(solve_string, \
+                                         self.start_l, self.start_r)
+        return solve_string
+
+
+    # Predict how long the robot will take to carry out a solution
+    #
+    # Input:
+    #   solve_string    The sequence of moves to be done to solve the cube
+    #
+    # Return:
+    #   The servo plan tuple (movements, time, face_l, face_r) from the
+    #   planner. The time is the predicted servo time in seconds.
+    #
+    def predict(self, solve_string):
+        return self.planner.plan(solve_string, self.start_l, self.start_r)
+
+
+    # Predict how long the robot will take to carry out a solution
+    #
+    # The rewrite needs fewer cube rotations but that isn't always faster
+    # once the servo moves are planned, so the solution is planned with and
+    # without it and the faster one is kept. It is kept with its plan so
+    # choose_solution() doesn't need to plan it again.
+    #
+    # Solutions with more than ESTIMATE_MAX_EXTRA moves over the shortest
+    # one estimated so far aren't planned.
+    #
+    # Input:
+    #   solve_string    The solution string from the solver library
+    #
+    # Return:
+    #   The predicted servo time in seconds, or None if the solution is too
+    #   long to be worth planning
+    #
+    def estimate(self, solve_string):
+        if (solve_string not in self.estimates):
+            count = len(solve_string.split(" ")) - 1
+            if ((self.shortest is not None) and \
+                (count > self.shortest + ESTIMATE_MAX_EXTRA)):
+                return None
+            if ((self.shortest is None) or (count < self.shortest)):
+                self.shortest = count
+            best = (solve_string, self.predict(solve_string))
+            rewritten = self.rewrite(solve_string)
+            if (rewritten != solve_string):
+                plan = self.predict(rewritten)
+                if (plan[1] < best[1][1]):
+                    best = (rewritten, plan)
+            self.estimates[solve_string] = best
+        return self.estimates[solve_string][1][1]
+
+
+    # Choose the solution the robot can carry out the fastest.
+    # A solution with fewer moves isn't always faster because some moves
+    # need the cube to be rotated in the grippers first.
+    #
+    # Raises SolveException if there is no valid solution, for example when
+    # the search found nothing or the cube can't be solved.
+    #
+    # A solution with no moves, "(0f)", is valid. The solver returns it for
+    # a cube that is already solved and the rewrite returns it when all the
+    # moves cancel out, which also means the cube is already solved.
+    #
+    # Input:
+    #   candidates      List of solution strings
+    #
+    # Return:
+    #   A tuple (solve_string, plan) with the fastest solution, rewritten
+    #   if that is faster, and its servo plan
+    #
+    def choose_solution(self, candidates):
+        best_string = None
+        best_plan = None
+        for solve_string in candidates:
+            if (solve_string.startswith("Error")):
+                continue
+            if (self.estimate(solve_string) is None):
+                continue
+            solve_string, plan = self.estimates[solve_string]
+            print("%s predicted %.1f s" % (solve_string, plan[1]))
+            if ((best_plan is None) or (plan[1] < best_plan[1])):
+                best_string = solve_string
+                best_plan = plan
+
+        if (best_plan is None):
+            if (len(candidates) == 0):
+                raise my_exceptions.SolveException('No solution found')
+            # Report the solver error message
+            raise my_exceptions.SolveException(candidates[-1])
+        if (len(best_string.split(" ")) == 1):
+            print("No moves needed, the cube is already solved")
+        return (best_string, best_plan)
+
+
     # Manipulate the cube to solve it.
     #
     # Inputs:
     #   display         The display class used to display user messages
     #   servos          The servo class used to controll the grippers
     #   solve_string    The sequence of moves to be done to solve the cube
+    #   plan            The servo plan from choose_solution(), or None to
+    #                   rewrite the solution and plan the servo movements
+    #                   here
     #
     # It's important to note the all clockwise and counter clockwise
     # directions in this function are referenced to the gripper and not
     # to the cube. Turning the gripper clockwise turns the cube face
     # counter clockwise.
     #
-    def solve(self, display, servos, solve_string):
+    def solve(self, display, servos, solve_string, plan=None):
         display.write_header("Solving")
 
         # These variables will be used to track the current orientation of
         # cube in the grippers.
         # After image scanning, the left gripper holds the Up face and the
-        # right gripper holds the Front face.
-        self.current_l = 'U'
+        # right gripper holds the Front face unless the scanner reported
+        # different faces.
+        self.current_l = self.start_l
         self.faces_l = self.get_faces(self.current_l)
-        self.current_r = 'F'
+        self.current_r = self.start_r
         self.faces_r = self.get_faces(self.current_r)
 
+        if (plan is None):
+            solve_string = self.rewrite(solve_string)
+
         # Seperate the solution string into individual moves.
         solve_array = solve_string.split(" ")
         if (len(solve_array) == 1):
@@ -193,72 +387,127 @@ class RubikSolve(object):
             print("Current Right " + self.current_r)
             print(" ")
 
+        if (USE_PLANNER == 1):
+            # Find the fastest servo movements for the whole solution
+            if (plan is None):
+                plan = self.predict(solve_string)
+            moves, plan_time, self.current_l, self.current_r = plan
+            if(DEBUG == 1):
+                print("Planned servo time %.2f" % plan_time)
+            self.run_plan(display, moves, len(solve_array) - 1)
+            self.faces_l = self.get_faces(self.current_l)
+            self.faces_r = self.get_faces(self.current_r)
+            return
+
+        if (USE_PEEPHOLE == 1):
+            # Record the servo moves for the whole solution then remove
+            # the wasted ones
+            ops = self.compile(solve_array)
+            result = self.peephole.optimize(ops, solve_string, \
+                                            self.start_l, self.start_r)
+            if (result is not None):
+                ops, plan_time, self.current_l, self.current_r = result
+                self.faces_l = self.get_faces(self.current_l)
+                self.faces_r = self.get_faces(self.current_r)
+            self.run_plan(display, ops, len(solve_array) - 1)
+            return
+
         # Step through each move in the solution.
         # Skip the last element because it's a count of the number of moves.
         for step in range(0, len(solve_array) - 1):
             # Parse the move command into the face and rotation parts.
             next_chars = solve_array[step]
-            next_face = next_chars[0]
-            next_turn = int(next_chars[1])
 
             # Provide a count down for the user.
             display.write_body(str(len(solve_array) - 1 - step))
 
-            if(DEBUG == 1):
-                print("Next move " + next_face + " " + str(next_turn))
+            self.solve_move(next_chars[0], int(next_chars[1]))
 
-            # Check if the right gripper already holds the correct face
-            if (next_face == self.current_r):
-                self.rotate_face_right_grip(next_turn)
 
-            # Check if the left gripper already holds the correct face
-            elif (next_face == self.current_l):
-                self.rotate_face_left_grip(next_turn)
+    # Record the servo moves for a solution without moving the servos
+    #
+    # Input:
+    #   solve_array     The solution string split into individual moves
+    #
+    # Return:
+    #   List of (servo, position, step) servo moves
+    #
+    def compile(self, solve_array):
+        ops = []
+        self.servos.begin_compile()
+        try:
+            for step in range(0, len(solve_array) - 1):
+                next_chars = solve_array[step]
+                self.solve_move(next_chars[0], int(next_chars[1]))
+                for servo, pos in self.servos.compiled[len(ops):]:
+                    ops.append((servo, pos, step))
+        finally:
+            self.servos.end_compile()
+        return ops
 
-            else: # Need to rotate the cube to get the correct face
 
-                # Check if rotating the left gripper will put the
-                # desired face into the right gripper.
+    # Do a single solution move, rotating the cube first if needed
+    #
+    # Inputs:
+    #   next_face       The face to turn
+    #   next_turn       The amount of rotation needed
+    #
+    def solve_move(self, next_face, next_turn):
+        if(DEBUG == 1):
+            print("Next move " + next_face + " " + str(next_turn))
 
-                delta = self.find_face(self.current_r, next_face, self.faces_l)
+        # Check if the right gripper already holds the correct face
+        if (next_face == self.current_r):
+            self.rotate_face_right_grip(next_turn)
 
-                if (delta == 0):
-                    if(DEBUG == 1):
-                        print ("Error finding face left")
-                    # Should never get here
-                    raise FaceException('Error finding face')
+        # Check if the left gripper already holds the correct face
+        elif (next_face == self.current_l):
+            self.rotate_face_left_grip(next_turn)
+
+        else: # Need to rotate the cube to get the correct face
 
-                if (delta != -1):
-                    # Rotate the entire cube in the left gripper
-                    self.rotate_cube_left_grip(delta)
-                    self.current_r = next_face
-                    self.faces_r = self.get_faces(self.current_r)
+            # Check if rotating the left gripper will put the
+            # desired face into the right gripper.
 
-                    # Rotate the face using the right gripper
-                    self.rotate_face_right_grip(next_turn)
+            delta = self.find_face(self.current_r, next_face, self.faces_l)
 
-                else:
-                    # Check if rotating the right gripper will put the
-                    # desired face into the left gripper.
+            if (delta == 0):
+                if(DEBUG == 1):
+                    print ("Error finding face left")
+                # Should never get here
+                raise my_exceptions.FaceException('Error finding face')
 
-                    delta = self.find_face(self.current_l, next_face, \
-                                           self.faces_r)
-                    if ((delta == 0) or (delta == -1)):
-                        if(DEBUG == 1):
-                            print ("Error finding face right " + str(delta))
-                        # Should never get here
-                        raise FaceException('Error finding face')
+            if (delta != -1):
+                # Rotate the entire cube in the left gripper
+                self.rotate_cube_left_grip(delta)
+                self.current_r = next_face
+                self.faces_r = self.get_faces(self.current_r)
 
-                    # Rotate the entire cube in the right gripper
-                    self.rotate_cube_right_grip(delta)
-                    self.current_l, = next_face
-                    self.faces_l = self.get_faces(self.current_l)
+                # Rotate the face using the right gripper
+                self.rotate_face_right_grip(next_turn)
 
-                    # Rotate the face using the left gripper
-                    self.rotate_face_left_grip(next_turn)
+            else:
+                # Check if rotating the right gripper will put the
+                # desired face into the left gripper.
 
-            if(DEBUG == 1):
-                print("")
-                print("Current Left " + self.current_l)
-                print("Current Right " + self.current_r)
-                print("")
+                delta = self.find_face(self.current_l, next_face, \
+                                       self.faces_r)
+                if ((delta == 0) or (delta == -1)):
+                    if(DEBUG == 1):
+                        print ("Error finding face right " + str(delta))
+                    # Should never get here
+                    raise my_exceptions.FaceException('Error finding face')
+
+                # Rotate the entire cube in the right gripper
+                self.rotate_cube_right_grip(delta)
+                self.current_l, = next_face
+                self.faces_l = self.get_faces(self.current_l)
+
+                # Rotate the face using the left gripper
+                self.rotate_face_left_grip(next_turn)
+
+        if(DEBUG == 1):
+            print("")
+            print("Current Left " + self.current_l)
+            print("Current Right " + self.current_r)
+            print("")
@@ -0,0 +1,150 @@
+#!/usr/bin/python
+
+#
+# This program keeps the two-phase cube solver library loaded and runs
+# searches for other programs.
+#
+# Loading the solver library takes a long time and every start of the
+# robot program would have to do it again. This service is started once,
+# loads the library and then answers search requests on a Unix socket in
+# a directory only its user can write to.
+# rubik.py, rubik_sim.py and any other program using RubikSearch send their
+# searches here when the service is running and load the library themselves
+# when it isn't.
+#
+# Each search is run in a process forked from the service so the tables are
+# shared and not copied. A search is stopped as soon as the program that
+# asked for it closes the connection.
+#
+# Run it with "python rubik_solver_server.py".
+#
+
+import multiprocessing
+import multiprocessing.connection
+import os
+import threading
+
+# The search class, used here with the library loaded in this process
+from rubik_search import RubikSearch, SOLVER_AUTHKEY, solver_socket
+
+
+# Set this to 0 to disable debug logging, 1 to enable.
+DEBUG = 0
+
+
+# The search process functions that can be requested
+SEARCH_NAMES = ["search", "search_candidates"]
+
+
+# Rubik's cube solver service class
+#
+class RubikSolverServer(object):
+    def __init__(self):
+        # The search class that loads the library and runs the searches.
+        # It never waits for an abort so it doesn't need a cancel token.
+        self.search = RubikSearch(None, service=0, cache=0)
+
+
+    # Get the loading state of the solver library
+    #
+    # Return:
+    #   "loading", "ready" or "error"
+    #
+    def state(self):
+        if (not self.search.ready.is_set()):
+            return "loading"
+        if (self.search.error is not None):
+            return "error"
+        return "ready"
+
+
+    # Run a search and send each result to the client
+    #
+    # Inputs:
+    #   conn        The client connection
+    #   name        The name of the search process function
+    #   args        The search function arguments after the pipe
+    #
+    def run_search(self, conn, name, args):
+        self.search.ready.wait()
+        if (self.search.error is not None):
+            return
+
+        proc, recv = self.search.start(name, args)
+        try:
+            while (1):
+                ready = multiprocessing.connection.wait([recv, conn])
+                if (conn in ready):
+                    # The client closed the connection or sent something
+                    # else, either way it doesn't want the search anymore
+                    break
+                try:
+                    result = recv.recv()
+                except EOFError:
+                    break
+                conn.send(result)
+        finally:
+            self.search.stop(proc, recv)
+
+
+    # Client connection thread function
+    #
+    # Input:
+    #   conn        The client connection
+    #
+    def serve(self, conn):
+        try:
+            while (1):
+                request = conn.recv()
+                if (request[0] == "state"):
+                    conn.send(self.state())
+                elif (request[0] in SEARCH_NAMES):
+                    if(DEBUG == 1):
+                        print(request[0] + " " + request[1])
+                    self.run_search(conn, request[0], tuple(request[1:]))
+                    break
+                else:
+                    break
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+
+    # Load the solver library and answer requests until stopped
+    #
+    def run(self):
+        path = solver_socket()
+        if (os.path.exists(path)):
+            try:
+                self.search.connect().close()
+                print("Solver service already running")
+                return
+            except OSError:
+                # Remove the socket left behind by a service that was
+                # killed
+                os.unlink(path)
+
+        # Listen before loading so clients wait for this service instead of
+        # loading the library themselves
+        listener = multiprocessing.connection.Listener(path, 'AF_UNIX', \
+                                                       authkey=SOLVER_AUTHKEY)
+        self.search.start_loading()
+        print("Solver service listening on " + path)
+        try:
+            while (1):
+                try:
+                    conn = listener.accept()
+                except (multiprocessing.AuthenticationError, OSError):
+                    continue
+                threading.Thread(target=self.serve, args=(conn,), \
+                                 daemon=True).start()
+        finally:
+            listener.close()
+
+
+if __name__ == '__main__':
+    try:
+        RubikSolverServer().run()
+    except KeyboardInterrupt:
+        pass
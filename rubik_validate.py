@@ -0,0 +1,289 @@
+#!/usr/bin/python
+
+#
+# The code in this file checks that a scanned cube is one that can really
+# be solved, and repairs it if it isn't.
+#
+# The 54 squares are split into the 8 corner and 12 edge pieces of the cube.
+# Every piece must be a real piece that appears only once. The corner twists
+# must add up to a multiple of 3, the edge flips to a multiple of 2, and the
+# corner and edge orders must both be odd or both be even. Any other cube
+# can't be reached by turning faces and the solver would spend its whole
+# time limit before returning an error.
+#
+# A cube that isn't valid usually has a few squares given the wrong color.
+# Swapping the colors of two squares keeps 9 squares of each color, so the
+# repair tries swaps in order of how little they increase the total color
+# distance until it finds a valid cube.
+#
+# The same checks can fill in the squares of a face that wasn't scanned.
+# Every piece on that face has its other squares on the scanned faces and
+# only a few colors for the missing square make it a real piece.
+#
+
+import heapq
+import itertools
+
+# Set this to 0 to disable debug logging, 1 to enable.
+DEBUG = 0
+
+
+# Faces in the order used by the cube solver
+FACE_ORDER = "URFDLB"
+
+# Most square swaps tried together when repairing a cube
+REPAIR_MAX_SWAPS = 3
+
+# Most cubes checked when repairing a cube
+REPAIR_MAX_TRIES = 5000
+
+# Square numbers of the corner pieces (URF, UFL, ULB, UBR, DFR, DLF, DBL,
+# DRB). The first square of each corner is on the U or D face and the others
+# follow clockwise.
+CORNER_SQUARES = [(8, 9, 20), (6, 18, 38), (0, 36, 47), (2, 45, 11),
+                  (29, 26, 15), (27, 44, 24), (33, 53, 42), (35, 17, 51)]
+
+# Square numbers of the edge pieces (UR, UF, UL, UB, DR, DF, DL, DB, FR,
+# FL, BL, BR)
+EDGE_SQUARES = [(5, 10), (7, 19), (3, 37), (1, 46), (32, 16), (28, 25),
+                (30, 43), (34, 52), (23, 12), (21, 41), (50, 39), (48, 14)]
+
+# Face colors of each corner and edge piece in the solved cube
+CORNER_FACES = ["URF", "UFL", "ULB", "UBR", "DFR", "DLF", "DBL", "DRB"]
+EDGE_FACES = ["UR", "UF", "UL", "UB", "DR", "DF", "DL", "DB",
+              "FR", "FL", "BL", "BR"]
+
+
+# Get whether a list of numbers is an odd reordering of 0 to n-1
+#
+# Input:
+#   order       The list of numbers
+#
+# Return:
+#   1 if an odd number of swaps is needed to sort the list, 0 if even
+#
+def parity(order):
+    count = 0
+    for i in range(0, len(order)):
+        for j in range(i + 1, len(order)):
+            if (order[i] > order[j]):
+                count += 1
+    return count % 2
+
+
+# Rubik's cube state validator class
+#
+class RubikValidate(object):
+    # Find which corner piece has the given colors
+    #
+    # Input:
+    #   faces       The colors of the corner squares, clockwise
+    #
+    # Return:
+    #   A tuple with the corner number and its twist, or None if there is
+    #   no such corner
+    #
+    def get_corner(self, faces):
+        for ori in range(0, 3):
+            if (faces[ori] in "UD"):
+                # Read the colors clockwise from the U or D square
+                faces = faces[ori:] + faces[:ori]
+                if (faces in CORNER_FACES):
+                    return (CORNER_FACES.index(faces), ori)
+                return None
+        return None
+
+
+    # Find which edge piece has the given colors
+    #
+    # Input:
+    #   faces       The colors of the edge squares
+    #
+    # Return:
+    #   A tuple with the edge number and its flip, or None if there is no
+    #   such edge
+    #
+    def get_edge(self, faces):
+        if (faces in EDGE_FACES):
+            return (EDGE_FACES.index(faces), 0)
+        if (faces[::-1] in EDGE_FACES):
+            return (EDGE_FACES.index(faces[::-1]), 1)
+        return None
+
+
+    # Find what is wrong with a cube
+    #
+    # Input:
+    #   cube_string     The 54 square cube definition string
+    #
+    # Return:
+    #   None if the cube can be solved, otherwise a short description of
+    #   the problem
+    #
+    def check(self, cube_string):
+        for face in FACE_ORDER:
+            if (cube_string.count(face) != 9):
+                return "wrong color count"
+
+        corners = []
+        twist = 0
+        for squares in CORNER_SQUARES:
+            faces = "".join([cube_string[square] for square in squares])
+            corner = self.get_corner(faces)
+            if (corner is None):
+                return "impossible corner " + faces
+            corners.append(corner[0])
+            twist += corner[1]
+        if (len(set(corners)) != 8):
+            return "duplicate corner"
+        if (twist % 3 != 0):
+            return "corner twist"
+
+        edges = []
+        flip = 0
+        for squares in EDGE_SQUARES:
+            faces = "".join([cube_string[square] for square in squares])
+            edge = self.get_edge(faces)
+            if (edge is None):
+                return "impossible edge " + faces
+            edges.append(edge[0])
+            flip += edge[1]
+        if (len(set(edges)) != 12):
+            return "duplicate edge"
+        if (flip % 2 != 0):
+            return "edge flip"
+
+        if (parity(corners) != parity(edges)):
+            return "permutation parity"
+        return None
+
+
+    # Fill in the unknown squares of a cube
+    #
+    # Each unknown square must make its piece a real piece together with
+    # the known squares of the piece. All combinations of the colors
+    # that do are tried and the ones that give a valid cube are kept.
+    #
+    # Inputs:
+    #   cube_string     The 54 square cube definition string with '?' for
+    #                   each unknown square. Each piece can only have one
+    #                   unknown square.
+    #   max_count       Stop after this many valid cubes are found
+    #
+    # Return:
+    #   A list of the valid cube definition strings
+    #
+    def complete(self, cube_string, max_count=2):
+        squares = []
+        options = []
+        for pieces, get_piece in [(CORNER_SQUARES, self.get_corner), \
+                                  (EDGE_SQUARES, self.get_edge)]:
+            for piece in pieces:
+                unknown = [square for square in piece \
+                           if (cube_string[square] == '?')]
+                if (len(unknown) == 0):
+                    continue
+                if (len(unknown) > 1):
+                    return []
+                colors = []
+                for face in FACE_ORDER:
+                    faces = "".join([face if (square == unknown[0]) else \
+                                     cube_string[square] for square in piece])
+                    if (get_piece(faces) is not None):
+                        colors.append(face)
+                squares.append(unknown[0])
+                options.append(colors)
+
+        results = []
+        new_faces = list(cube_string)
+        for colors in itertools.product(*options):
+            for square, face in zip(squares, colors):
+                new_faces[square] = face
+            new_string = "".join(new_faces)
+            if (self.check(new_string) is None):
+                results.append(new_string)
+                if (len(results) >= max_count):
+                    break
+        if(DEBUG == 1):
+            print("Completed " + str(len(squares)) + " squares, " + \
+                  str(len(results)) + " valid cubes")
+        return results
+
+
+    # Get all square swaps in order of their cost
+    #
+    # Inputs:
+    #   faces       The face number of each square
+    #   dist        The color distance of each square to each face center
+    #
+    # Return:
+    #   A list of (cost, square, square) tuples, lowest cost first
+    #
+    def get_swaps(self, faces, dist):
+        swaps = []
+        for i in range(0, 54):
+            for j in range(i + 1, 54):
+                if ((i % 9 == 4) or (j % 9 == 4) or (faces[i] == faces[j])):
+                    continue
+                cost = dist[i][faces[j]] + dist[j][faces[i]] - \
+                       dist[i][faces[i]] - dist[j][faces[j]]
+                swaps.append((max(0.0, cost), i, j))
+        swaps.sort()
+        return swaps
+
+
+    # Repair a cube that can't be solved
+    #
+    # Sets of square swaps are tried in order of their total cost. Each
+    # set is a list of positions in the sorted swap list. The next sets are
+    # made by moving the last swap to the next one in the list or adding
+    # the swap after it, so every set is reached once and never before a
+    # cheaper one.
+    #
+    # Inputs:
+    #   cube_string     The 54 square cube definition string
+    #   dist            The color distance of each square to each face
+    #                   center, in the cube solver face order
+    #
+    # Return:
+    #   A tuple with the repaired cube definition string and the list of
+    #   squares changed, or None if no valid cube was found
+    #
+    def repair(self, cube_string, dist):
+        faces = [FACE_ORDER.index(face) for face in cube_string]
+        swaps = self.get_swaps(faces, dist)
+        if (len(swaps) == 0):
+            return None
+
+        queue = [(swaps[0][0], (0,))]
+        tries = 0
+        while ((len(queue) > 0) and (tries < REPAIR_MAX_TRIES)):
+            cost, chosen = heapq.heappop(queue)
+
+            last = chosen[-1]
+            if (last + 1 < len(swaps)):
+                heapq.heappush(queue, (cost - swaps[last][0] + \
+                    swaps[last + 1][0], chosen[:-1] + (last + 1,)))
+                if (len(chosen) < REPAIR_MAX_SWAPS):
+                    heapq.heappush(queue, (cost + swaps[last + 1][0], \
+                                           chosen + (last + 1,)))
+
+            # Each square can only be swapped once
+            squares = [square for index in chosen \
+                       for square in swaps[index][1:]]
+            if (len(set(squares)) != len(squares)):
+                continue
+
+            new_faces = list(cube_string)
+            for index in chosen:
+                swap_cost, i, j = swaps[index]
+                new_faces[i], new_faces[j] = new_faces[j], new_faces[i]
+            new_string = "".join(new_faces)
+            tries += 1
+            if (self.check(new_string) is None):
+                if(DEBUG == 1):
+                    print("Repaired after " + str(tries) + " tries, " + \
+                          "cost %.1f" % cost)
+                return new_string, sorted(squares)
+
+        return None
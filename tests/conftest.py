@@ -0,0 +1,63 @@
+#
+# Shared setup for the tests.
+#
+# The tests run on a normal computer so the robot code must use the
+# simulated hardware. This has to be set before rubik_hw is imported.
+#
+
+import os
+import sys
+from queue import Queue
+
+import pytest
+
+os.environ["RUBIK_SIM"] = "1"
+
+# The robot modules are in the directory above the tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Make a servo controller class using the simulated hardware
+#
+# The servo timing file is read from the current directory, so the test
+# runs in its own directory. The simulated robot is rubik_sim.robot.
+#
+@pytest.fixture
+def servos(tmp_path, monkeypatch):
+    import rubik_sim
+    from rubik_cancel import RubikCancel
+    from rubik_servos import RubikServo
+
+    monkeypatch.chdir(tmp_path)
+    cal_file = str(tmp_path / "servo_tune.txt")
+    with open(cal_file, 'w') as f:
+        for val in rubik_sim.SIM_CALIBRATION:
+            f.write(str(val) + "\n")
+    # Each test gets a new robot with an empty cube holder
+    robot = rubik_sim.SimRobot()
+    robot.cal_file = cal_file
+    robot.keyboard = False
+    robot.echo_display = False
+    monkeypatch.setattr(rubik_sim, "robot", robot)
+    return RubikServo(Queue(maxsize = 8), RubikCancel(), cal_file)
+
+
+# Get a function that puts a cube in the simulated grippers and closes both
+# grips on it
+#
+# In the load position the right gripper holds the Down face and the left
+# gripper holds the Back face of the cube.
+#
+@pytest.fixture
+def load_cube(servos):
+    import rubik_sim
+    from rubik_servos import G_POS_CLOSED
+
+    def load(facelets):
+        rubik_sim.robot.cube = rubik_sim.SimCube(facelets)
+        rubik_sim.robot.has_cube = True
+        servos.set_servo('rg', G_POS_CLOSED)
+        servos.set_servo('lg', G_POS_CLOSED)
+        servos.wait_idle()
+        return ('B', 'D')
+    return load
@@ -0,0 +1,116 @@
+#
+# Tests of the saved solution cache.
+#
+# A cube saved in one orientation must be found in every other one, with
+# solutions that solve the cube as it is held.
+#
+
+import random
+
+import rubik_cache
+from rubik_cache import RubikCache
+from rubik_sim import SimCube, random_scramble
+
+
+# Get a cube definition string and the solution that undoes its scramble
+#
+def scrambled(seed):
+    random.seed(seed)
+    moves = random_scramble(20)
+    cube = SimCube()
+    for move in moves:
+        cube.move(move[0], int(move[1]))
+    solve_array = [move[0] + str(4 - int(move[1])) for move in reversed(moves)]
+    return cube.facelets(), " ".join(solve_array) + " (20f)"
+
+
+# Check that a solution string solves a cube
+#
+def solves(cube_string, solve_string):
+    cube = SimCube(cube_string)
+    for move in solve_string.split(" ")[:-1]:
+        cube.move(move[0], int(move[1]))
+    return cube.solved()
+
+
+def test_every_orientation(tmp_path):
+    cache = RubikCache(str(tmp_path / "cache.txt"))
+    assert len(cache.orients) == 48
+    assert len(set([tuple(orient.source) for orient in cache.orients])) == 48
+
+
+def test_orient_solution_round_trip(tmp_path):
+    cache = RubikCache(str(tmp_path / "cache.txt"))
+    cube_string, solve_string = scrambled(1)
+    for orient in cache.orients:
+        turned_solution = orient.to_orient_solution(solve_string)
+        assert solves(orient.to_orient(cube_string), turned_solution)
+        assert orient.from_orient(turned_solution) == solve_string
+
+
+def test_lookup_any_orientation(tmp_path):
+    file = str(tmp_path / "cache.txt")
+    cube_string, solve_string = scrambled(2)
+    cache = RubikCache(file)
+    assert cache.lookup(cube_string) is None
+    cache.store(cube_string, [solve_string, "Error: 8"])
+
+    # The solutions are read back from the file
+    cache = RubikCache(file)
+    for orient in cache.orients:
+        turned = orient.to_orient(cube_string)
+        solutions, seconds = cache.lookup(turned)
+        assert seconds is None
+        assert len(solutions) == 1
+        assert solves(turned, solutions[0])
+
+
+def test_errors_not_saved(tmp_path):
+    cube_string, solve_string = scrambled(3)
+    cache = RubikCache(str(tmp_path / "cache.txt"))
+    cache.store(cube_string, ["Error: 8"])
+    assert cache.lookup(cube_string) is None
+
+
+def test_record(tmp_path):
+    file = str(tmp_path / "cache.txt")
+    cube_string, solve_string = scrambled(4)
+    other_string = "U1 U3 " + solve_string.replace("(20f)", "(22f)")
+    cache = RubikCache(file)
+    cache.store(cube_string, [solve_string, other_string])
+    cache.record(cube_string, other_string, 12.5)
+
+    cache = RubikCache(file)
+    solutions, seconds = cache.lookup(cube_string)
+    assert seconds == 12.5
+    assert solutions == [other_string, solve_string]
+
+
+def test_least_recently_used_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(rubik_cache, "CACHE_SIZE", 2)
+    file = str(tmp_path / "cache.txt")
+    cubes = [scrambled(seed) for seed in range(5, 8)]
+    cache = RubikCache(file)
+    cache.store(cubes[0][0], [cubes[0][1]])
+    cache.store(cubes[1][0], [cubes[1][1]])
+    # Using the first cube keeps it, even after a restart
+    assert cache.lookup(cubes[0][0]) is not None
+    cache = RubikCache(file)
+    cache.store(cubes[2][0], [cubes[2][1]])
+
+    cache = RubikCache(file)
+    assert cache.lookup(cubes[0][0]) is not None
+    assert cache.lookup(cubes[1][0]) is None
+    assert cache.lookup(cubes[2][0]) is not None
+
+
+def test_standard_orientation(tmp_path):
+    # The fast lookup table gives the same standard cube as turning the
+    # cube to every orientation one at a time
+    cache = RubikCache(str(tmp_path / "cache.txt"))
+    for seed in range(0, 10):
+        cube_string, solve_string = scrambled(seed)
+        turned = [(orient.to_orient(cube_string), orient) \
+                  for orient in cache.orients]
+        best = min(turned, key=lambda value: value[0])
+        assert cache.standard(cube_string) == best
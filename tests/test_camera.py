@@ -0,0 +1,41 @@
+#
+# Tests of the camera settings lock.
+#
+
+from rubik_camera import RubikCamera
+from rubik_cancel import RubikCancel
+
+
+def test_saved_setup_restores_gains():
+    camera = RubikCamera(RubikCancel())
+    camera.warm_up()
+    camera.camera.analog_gain = 2.0
+    camera.camera.digital_gain = 1.2
+    camera.lock()
+    assert len(camera.setups) == 1
+    assert camera.setups[0][1][2:] == (2.0, 1.2)
+    camera.unlock()
+
+    # The gains drift a little, but not enough to need a new setup
+    camera.camera.analog_gain = 2.05
+    camera.camera.digital_gain = 1.21
+    camera.warm_up()
+    camera.lock()
+    assert len(camera.setups) == 1
+    assert camera.camera.exposure_mode == 'off'
+    assert camera.camera.analog_gain == 2.0
+    assert camera.camera.digital_gain == 1.2
+    camera.close()
+
+
+def test_new_setup_for_new_light():
+    camera = RubikCamera(RubikCancel())
+    camera.warm_up()
+    camera.lock()
+    camera.unlock()
+    camera.camera.analog_gain = 4.0
+    camera.warm_up()
+    camera.lock()
+    assert len(camera.setups) == 2
+    assert camera.camera.analog_gain == 4.0
+    camera.close()
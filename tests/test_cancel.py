@@ -0,0 +1,70 @@
+#
+# Tests of the cancel token.
+#
+
+import threading
+
+import pytest
+
+import rubik_cancel
+from rubik_cancel import RubikCancel
+from rubik_hw import RubikClock, clock
+from rubik_servos import T_POS_P90
+from rubik_sim import SimCube
+
+
+def test_sleep_runs_out():
+    abort = RubikCancel()
+    start = clock.monotonic()
+    abort.sleep(1.5)
+    assert clock.monotonic() - start == pytest.approx(1.5)
+    abort.check()
+
+
+def test_sleep_raises_after_cancel():
+    abort = RubikCancel()
+    abort.arm()
+    abort.cancel()
+    assert abort.cancelled()
+    with pytest.raises(KeyboardInterrupt):
+        abort.sleep(1.0)
+    with pytest.raises(KeyboardInterrupt):
+        abort.sleep(0.0)
+    with pytest.raises(KeyboardInterrupt):
+        abort.check()
+
+
+def test_arm_and_disarm_clear():
+    abort = RubikCancel()
+    abort.cancel()
+    abort.arm()
+    assert abort.armed
+    assert not abort.cancelled()
+    abort.cancel()
+    abort.disarm()
+    assert not abort.armed
+    abort.sleep(0.1)
+
+
+def test_cancel_wakes_sleep(monkeypatch):
+    # With the real clock a cancel from another thread ends a long wait
+    real = RubikClock()
+    monkeypatch.setattr(rubik_cancel, "clock", real)
+    abort = RubikCancel()
+    abort.arm()
+    timer = threading.Timer(0.05, abort.cancel)
+    timer.start()
+    start = real.monotonic()
+    with pytest.raises(KeyboardInterrupt):
+        abort.sleep(30.0)
+    timer.join()
+    assert real.monotonic() - start < 5.0
+
+
+def test_cancel_servo_wait(servos, load_cube):
+    load_cube(SimCube().facelets())
+    servos.abort.arm()
+    servos.abort.cancel()
+    with pytest.raises(KeyboardInterrupt):
+        servos.set_servo('rt', T_POS_P90)
+        servos.wait_idle()
@@ -0,0 +1,101 @@
+#
+# Tests of the square color classifier.
+#
+
+import random
+
+import numpy
+
+from rubik_color import RubikColor
+from rubik_sim import SimCube, random_scramble, SIM_COLORS
+
+
+FACE_ORDER = "URFDLB"
+
+classifier = RubikColor()
+
+
+# Make a scrambled cube definition string
+#
+def scrambled(seed):
+    random.seed(seed)
+    cube = SimCube()
+    for move in random_scramble(20):
+        cube.move(move[0], int(move[1]))
+    return cube.facelets()
+
+
+# Get the face colors the scanner would read from a cube
+#
+# Inputs:
+#   cube_string     The cube definition string
+#   noise           Largest random change of each color channel
+#
+def face_colors(cube_string, noise):
+    faces = []
+    for face in range(0, 6):
+        colors = []
+        for square in cube_string[face * 9:face * 9 + 9]:
+            colors.append(tuple([min(255, max(0, channel + \
+                                     random.randint(-noise, noise))) \
+                                 for channel in SIM_COLORS[square]]))
+        faces.append(colors)
+    return faces
+
+
+def test_classify_scrambled():
+    for seed in range(0, 10):
+        cube_string = scrambled(seed)
+        faces, confidence = classifier.classify(face_colors(cube_string, 20))
+        assert "".join([FACE_ORDER[face] for face in faces]) == cube_string
+        assert min(confidence) > 0.0
+
+
+def test_nine_squares_per_face():
+    # Shading makes some squares much darker, but each face still gets
+    # exactly 9 squares
+    cube_string = scrambled(1)
+    colors = face_colors(cube_string, 0)
+    for face in colors:
+        face[0] = tuple([channel // 2 for channel in face[0]])
+    faces, confidence = classifier.classify(colors)
+    for face in range(0, 6):
+        assert faces.count(face) == 9
+
+
+# Get the colors of a cube with one face not scanned
+#
+def five_faces(cube_string, missing):
+    colors = face_colors(cube_string, 10)
+    colors[missing] = None
+    return colors
+
+
+def test_classify_missing_face():
+    for seed in range(0, 5):
+        cube_string = scrambled(seed)
+        for missing in range(0, 6):
+            faces, confidence = classifier.classify( \
+                five_faces(cube_string, missing), missing)
+            for square in range(0, 54):
+                if (square // 9 != missing):
+                    assert FACE_ORDER[faces[square]] == cube_string[square]
+                elif (square % 9 == 4):
+                    assert faces[square] == missing
+                else:
+                    assert faces[square] == -1
+
+
+def test_classify_missing_face_solved():
+    # The missing color is only on the missing face. With exact colors
+    # every scanned square matches a known center as well as the first
+    # guess of the missing center, so no square is closer to the guess.
+    cube_string = "".join([face * 9 for face in FACE_ORDER])
+    for missing in range(0, 6):
+        colors = face_colors(cube_string, 0)
+        colors[missing] = None
+        faces, confidence = classifier.classify(colors, missing)
+        assert not numpy.isnan(classifier.dist).any()
+        for square in range(0, 54):
+            if (square // 9 != missing):
+                assert FACE_ORDER[faces[square]] == cube_string[square]
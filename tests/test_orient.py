@@ -0,0 +1,87 @@
+#
+# Tests of describing the cube in another orientation.
+#
+# A cube turned to another orientation must be a valid cube, and a solution
+# of the turned cube turned back must solve the original cube.
+#
+
+import random
+
+from rubik_orient import RubikOrient, FACE_ORDER
+from rubik_sim import SimCube, random_scramble
+from rubik_validate import RubikValidate
+
+
+SOLVED = "UUUUUUUUURRRRRRRRRFFFFFFFFFDDDDDDDDDLLLLLLLLLBBBBBBBBB"
+
+ORIENTATIONS = ["", "x", "y", "z", "m", "yz", "xxm", "zyxm"]
+
+validate = RubikValidate()
+
+
+# Get a scramble and the cube definition string it leaves
+#
+def scrambled(seed):
+    random.seed(seed)
+    moves = random_scramble(20)
+    cube = SimCube()
+    for move in moves:
+        cube.move(move[0], int(move[1]))
+    return moves, cube.facelets()
+
+
+# Get the solution string that undoes a scramble
+#
+def undo(moves):
+    solve_array = [move[0] + str(4 - int(move[1])) for move in reversed(moves)]
+    return " ".join(solve_array) + " (" + str(len(solve_array)) + "f)"
+
+
+# Check that a solution string solves a cube
+#
+def solves(cube_string, solve_string):
+    cube = SimCube(cube_string)
+    for move in solve_string.split(" ")[:-1]:
+        cube.move(move[0], int(move[1]))
+    return cube.solved()
+
+
+def test_orient_squares():
+    for steps in ORIENTATIONS:
+        orient = RubikOrient(steps)
+        assert sorted(orient.source) == list(range(0, 54))
+        assert orient.to_orient(SOLVED) == SOLVED
+        assert sorted(orient.faces.values()) == sorted(FACE_ORDER)
+
+
+def test_mirror():
+    assert not RubikOrient("xy").mirror
+    assert RubikOrient("m").mirror
+    assert not RubikOrient("mzm").mirror
+
+
+def test_turned_cube_is_valid():
+    for seed in range(0, 20):
+        moves, cube_string = scrambled(seed)
+        for steps in ORIENTATIONS:
+            turned = RubikOrient(steps).to_orient(cube_string)
+            assert validate.check(turned) is None
+
+
+def test_solution_round_trip():
+    for seed in range(0, 20):
+        moves, cube_string = scrambled(seed)
+        solve_string = undo(moves)
+        for steps in ORIENTATIONS:
+            orient = RubikOrient(steps)
+            turned = orient.to_orient(cube_string)
+            turned_solution = orient.to_orient_solution(solve_string)
+            assert solves(turned, turned_solution)
+            assert orient.from_orient(turned_solution) == solve_string
+
+
+def test_errors_unchanged():
+    orient = RubikOrient("zm")
+    assert orient.from_orient("Error: 8") == "Error: 8"
+    assert orient.to_orient_solution("Error: 8") == "Error: 8"
+    assert orient.from_orient("(0f)") == "(0f)"
@@ -0,0 +1,102 @@
+#
+# Tests of the servo move optimizer.
+#
+# The optimized servo moves are run on the simulated robot and must solve
+# the cube as the compiled moves do.
+#
+
+import random
+
+import rubik_sim
+import rubik_solve
+from rubik_sim import SimCube, random_scramble
+from rubik_solve import RubikSolve
+
+
+# Display that shows nothing
+#
+class NoDisplay(object):
+    def write_header(self, text):
+        pass
+
+    def write_body(self, text):
+        pass
+
+
+# Get a scrambled cube and the solution that undoes the scramble
+#
+def scrambled(seed, length):
+    random.seed(seed)
+    moves = random_scramble(length)
+    cube = SimCube()
+    for move in moves:
+        cube.move(move[0], int(move[1]))
+    solve_array = [move[0] + str(4 - int(move[1])) for move in reversed(moves)]
+    return cube.facelets(), \
+           " ".join(solve_array) + " (" + str(len(solve_array)) + "f)"
+
+
+# Get the compiled and optimized servo moves for a solution
+#
+def compile_moves(solver, solve_string, face_l, face_r):
+    solver.set_start_faces(face_l, face_r)
+    solver.current_l = face_l
+    solver.faces_l = solver.get_faces(face_l)
+    solver.current_r = face_r
+    solver.faces_r = solver.get_faces(face_r)
+    ops = solver.compile(solve_string.split(" "))
+    return ops, solver.peephole.optimize(ops, solve_string, face_l, face_r)
+
+
+def test_optimized_moves_solve(servos, load_cube):
+    solver = RubikSolve(servos, NoDisplay())
+    for seed in range(0, 3):
+        cube_string, solve_string = scrambled(seed, 12)
+        face_l, face_r = load_cube(cube_string)
+        ops, result = compile_moves(solver, solve_string, face_l, face_r)
+        assert result is not None
+        new_ops, new_time, new_l, new_r = result
+        assert len(new_ops) <= len(ops)
+
+        solver.run_plan(NoDisplay(), new_ops, len(ops))
+        servos.wait_idle()
+        assert rubik_sim.robot.cube.solved()
+        assert rubik_sim.robot.faults == []
+        # The grippers hold the faces the optimizer reported
+        assert rubik_sim.robot.cube.view(rubik_sim.RIGHT_AXIS, \
+                                         (0, 0, 1))[4] == new_r
+        assert rubik_sim.robot.cube.view(rubik_sim.LEFT_AXIS, \
+                                         (0, 1, 0))[4] == new_l
+
+
+def test_optimizer_saves_time(servos, load_cube):
+    solver = RubikSolve(servos, NoDisplay())
+    cube_string, solve_string = scrambled(5, 20)
+    face_l, face_r = load_cube(cube_string)
+    ops, result = compile_moves(solver, solve_string, face_l, face_r)
+    states, times = solver.peephole.run(ops, (0, servos.rt_pos, \
+        servos.rg_pos, servos.lt_pos, servos.lg_pos, face_l, face_r), \
+        solver.planner.parse_moves(solve_string))
+    assert result[1] < sum(times)
+
+
+def test_wrong_moves_skipped(servos, load_cube):
+    solver = RubikSolve(servos, NoDisplay())
+    cube_string, solve_string = scrambled(6, 5)
+    face_l, face_r = load_cube(cube_string)
+    ops, result = compile_moves(solver, solve_string, face_l, face_r)
+    assert solver.peephole.optimize(ops[:-4], solve_string, \
+                                    face_l, face_r) is None
+
+
+def test_solve_without_planner(servos, load_cube, monkeypatch):
+    # The optimizer is used when the planner is turned off
+    monkeypatch.setattr(rubik_solve, "USE_PLANNER", 0)
+    solver = RubikSolve(servos, NoDisplay())
+    cube_string, solve_string = scrambled(7, 15)
+    face_l, face_r = load_cube(cube_string)
+    solver.set_start_faces(face_l, face_r)
+    solver.solve(NoDisplay(), servos, solve_string)
+    servos.wait_idle()
+    assert rubik_sim.robot.cube.solved()
+    assert rubik_sim.robot.faults == []
@@ -0,0 +1,104 @@
+#
+# Tests of the servo motion planner.
+#
+# The planned servo moves are run on the simulated robot, which records a
+# fault for any move that would drop the cube or hit the other gripper.
+#
+
+import random
+
+import rubik_sim
+from rubik_sim import SimCube, random_scramble
+from rubik_solve import RubikSolve
+
+
+# Display that shows nothing
+#
+class NoDisplay(object):
+    def write_header(self, text):
+        pass
+
+    def write_body(self, text):
+        pass
+
+
+# Get the faces held by the right and left simulated grippers
+#
+def held_faces():
+    cube = rubik_sim.robot.cube
+    return (cube.view(rubik_sim.RIGHT_AXIS, (0, 0, 1))[4], \
+            cube.view(rubik_sim.LEFT_AXIS, (0, 1, 0))[4])
+
+
+# Plan a solution on a loaded cube and run the servo moves
+#
+# Return:
+#   The planned faces held by the left and right grippers
+#
+def run_planned(servos, solver, solve_string, face_l, face_r):
+    moves, plan_time, end_l, end_r = solver.planner.plan(solve_string, \
+                                                         face_l, face_r)
+    assert plan_time > 0.0
+    for servo, pos, step in moves:
+        servos.set_servo(servo, pos)
+    servos.wait_idle()
+    return end_l, end_r
+
+
+def test_single_moves(servos, load_cube):
+    # Every face and turn does the same move as the solver string asks
+    solver = RubikSolve(servos, NoDisplay())
+    for face in "URFDLB":
+        for turn in range(1, 4):
+            face_l, face_r = load_cube(SimCube().facelets())
+            end_l, end_r = run_planned(servos, solver, \
+                face + str(turn) + " (1f)", face_l, face_r)
+            assert rubik_sim.robot.faults == []
+            assert held_faces() == (end_r, end_l)
+            # The cube may have been turned over, so undo the move by the
+            # face colours and check that this solves it
+            cube = rubik_sim.robot.cube
+            assert not cube.solved()
+            cube.move(face, 4 - turn)
+            assert cube.solved()
+
+
+def test_plan_solves(servos, load_cube):
+    solver = RubikSolve(servos, NoDisplay())
+    for seed in range(0, 3):
+        random.seed(seed)
+        scramble = random_scramble(15)
+        cube = SimCube()
+        for move in scramble:
+            cube.move(move[0], int(move[1]))
+        solve_array = [move[0] + str(4 - int(move[1])) \
+                       for move in reversed(scramble)]
+        solve_string = " ".join(solve_array) + \
+                       " (" + str(len(solve_array)) + "f)"
+
+        face_l, face_r = load_cube(cube.facelets())
+        end_l, end_r = run_planned(servos, solver, solve_string, \
+                                   face_l, face_r)
+        assert rubik_sim.robot.faults == []
+        assert rubik_sim.robot.cube.solved()
+        assert held_faces() == (end_r, end_l)
+
+
+def test_plan_from_end_faces(servos, load_cube):
+    # A second plan starts from where the first one left the grippers
+    solver = RubikSolve(servos, NoDisplay())
+    face_l, face_r = load_cube(SimCube().facelets())
+    face_l, face_r = run_planned(servos, solver, "F1 L2 (2f)", face_l, face_r)
+    run_planned(servos, solver, "L2 F3 (2f)", face_l, face_r)
+    assert rubik_sim.robot.faults == []
+    assert rubik_sim.robot.cube.solved()
+
+
+def test_empty_solution(servos, load_cube):
+    solver = RubikSolve(servos, NoDisplay())
+    face_l, face_r = load_cube(SimCube().facelets())
+    moves, plan_time, end_l, end_r = solver.planner.plan("(0f)", \
+                                                         face_l, face_r)
+    assert moves == []
+    assert plan_time == 0.0
+    assert (end_l, end_r) == (face_l, face_r)
@@ -0,0 +1,103 @@
+#
+# Tests of the PWM register writes.
+#
+# A fake PCA9685 driver records the bytes of every I2C transaction.
+#
+
+from rubik_pwm import RubikPwm, MODE1_AI, LED0_ON_L
+
+
+# I2C device that records the written bytes
+#
+class FakeI2C(object):
+    def __init__(self):
+        self.writes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def write(self, buf):
+        self.writes.append(bytes(buf))
+
+
+# PCA9685 driver with the parts used by RubikPwm
+#
+class FakePca(object):
+    def __init__(self):
+        self.mode1_reg = 0x91
+        self.i2c_device = FakeI2C()
+
+
+# Get the register bytes written for one channel
+#
+def channel(pwm):
+    return bytes([0, 0, pwm & 0xFF, (pwm >> 8) & 0x0F])
+
+
+def test_auto_increment():
+    pca = FakePca()
+    RubikPwm(pca)
+    # The restart bit is cleared and auto increment is set
+    assert pca.mode1_reg == (0x11 | MODE1_AI)
+
+
+def test_channel_bytes():
+    pca = FakePca()
+    pwm = RubikPwm(pca)
+    pwm.set_value(3, 0x5A7)
+    pwm.commit()
+    assert pca.i2c_device.writes == \
+        [bytes([LED0_ON_L + 3 * 4]) + channel(0x5A7)]
+    assert pwm.transactions == 1
+    assert pwm.bytes_sent == 5
+
+
+def test_gap_filled_with_known_values():
+    pca = FakePca()
+    pwm = RubikPwm(pca)
+    for port, value in [(0, 300), (1, 310), (2, 320), (3, 330)]:
+        pwm.set_value(port, value)
+    pwm.commit()
+    pca.i2c_device.writes = []
+
+    # Channels 1 and 2 aren't changed but are sent again so channels 0
+    # and 3 go out in one transaction
+    pwm.set_value(0, 400)
+    pwm.set_value(3, 0x123)
+    pwm.commit()
+    assert pca.i2c_device.writes == \
+        [bytes([LED0_ON_L]) + channel(400) + channel(310) + channel(320) + \
+         channel(0x123)]
+    assert pwm.shadow[0:4] == [400, 310, 320, 0x123]
+
+
+def test_unknown_gap_splits():
+    pca = FakePca()
+    pwm = RubikPwm(pca)
+    pwm.set_value(1, 200)
+    pwm.set_value(2, 210)
+    pwm.set_value(5, 250)
+    pwm.commit()
+    assert pca.i2c_device.writes == \
+        [bytes([LED0_ON_L + 1 * 4]) + channel(200) + channel(210), \
+         bytes([LED0_ON_L + 5 * 4]) + channel(250)]
+    assert pwm.shadow[3] is None
+    assert pwm.transactions == 2
+
+
+def test_unchanged_skipped():
+    pca = FakePca()
+    pwm = RubikPwm(pca)
+    pwm.set_value(4, 350)
+    pwm.commit()
+    pwm.set_value(4, 350)
+    pwm.commit()
+    # A value changed and changed back before the commit isn't sent
+    pwm.set_value(4, 360)
+    pwm.set_value(4, 350)
+    pwm.commit()
+    assert len(pca.i2c_device.writes) == 1
+    assert pwm.skipped == 2
@@ -0,0 +1,89 @@
+#
+# Tests of the solution rewrite.
+#
+# A rewritten solution must leave the cube exactly as the original does.
+#
+
+import random
+
+from rubik_rewrite import RubikRewrite, OPPOSITE
+from rubik_sim import SimCube, random_scramble
+from rubik_solve import RubikSolve
+
+
+# The face list function of the solver, which doesn't use the servos
+rewriter = RubikRewrite(RubikSolve(None, None).get_faces)
+
+
+# Get the cube left by a solution string when starting from a cube
+#
+def apply_solution(facelets, solve_string):
+    cube = SimCube(facelets)
+    for move in solve_string.split(" ")[:-1]:
+        cube.move(move[0], int(move[1]))
+    return cube.facelets()
+
+
+# Count the cube rotations a solution string needs
+#
+def count_rotations(solve_string, face_l, face_r):
+    count = 0
+    for move in solve_string.split(" ")[:-1]:
+        n, face_l, face_r = rewriter.do_move(move[0], face_l, face_r)
+        count += n
+    return count
+
+
+# Make a solution string that may have same face and opposite face moves
+# next to each other
+#
+def random_solution(length):
+    moves = []
+    for index in range(0, length):
+        if ((len(moves) > 0) and (random.random() < 0.3)):
+            face = random.choice([moves[-1][0], OPPOSITE[moves[-1][0]]])
+        else:
+            face = random.choice("URFDLB")
+        moves.append(face + str(random.randint(1, 3)))
+    return " ".join(moves) + " (" + str(len(moves)) + "f)"
+
+
+def test_rewrite_keeps_cube_state():
+    random.seed(2)
+    cube = SimCube()
+    for move in random_scramble(20):
+        cube.move(move[0], int(move[1]))
+    start = cube.facelets()
+
+    starts = [(l, r) for l in "URFDLB" for r in "URFDLB" \
+              if ((l != r) and (OPPOSITE[l] != r))]
+    for trial in range(0, 200):
+        solve_string = random_solution(random.randint(1, 25))
+        face_l, face_r = random.choice(starts)
+        new_string = rewriter.rewrite(solve_string, face_l, face_r)
+        assert apply_solution(start, new_string) == \
+               apply_solution(start, solve_string)
+        assert len(new_string.split(" ")) <= len(solve_string.split(" "))
+        assert count_rotations(new_string, face_l, face_r) <= \
+               count_rotations(solve_string, face_l, face_r)
+
+
+def test_same_face_moves_combine():
+    assert rewriter.rewrite("R1 R1 (2f)", 'U', 'F') == "R2 (1f)"
+    assert rewriter.rewrite("R1 L2 R1 (3f)", 'U', 'F') in \
+           ["R2 L2 (2f)", "L2 R2 (2f)"]
+
+
+def test_moves_cancel_out():
+    assert rewriter.rewrite("R1 R3 (2f)", 'U', 'F') == "(0f)"
+    assert rewriter.rewrite("U2 D1 U2 D3 (4f)", 'U', 'F') == "(0f)"
+
+
+def test_opposite_moves_reordered():
+    # The grippers hold U and F so doing U before D saves a cube rotation
+    assert rewriter.rewrite("D1 U1 (2f)", 'U', 'F') == "U1 D1 (2f)"
+
+
+def test_errors_unchanged():
+    assert rewriter.rewrite("Error: 8", 'U', 'F') == "Error: 8"
+    assert rewriter.rewrite("(0f)", 'U', 'F') == "(0f)"
@@ -0,0 +1,85 @@
+#
+# Tests of the motion blur measure used to check scan pictures.
+#
+
+import random
+
+import numpy
+from PIL import Image, ImageDraw, ImageFilter
+
+from rubik_sample import RubikSample
+from rubik_scan import BLUR_MAX_WIDTH
+from rubik_sim import SIM_COLORS
+
+
+# Distance between square centers in the test pictures (pixels)
+SPACING = 200
+
+sampler = RubikSample()
+
+
+# Draw a face with random square colors
+#
+# The picture is darker on the left and has some noise so the squares
+# aren't perfectly flat.
+#
+# Return:
+#   A tuple with the array of pixels and the 9 square centers
+#
+def face_picture(seed):
+    random.seed(seed)
+    width = SPACING * 3 + 100
+    im = Image.new('RGB', (width, width), (40, 40, 40))
+    draw = ImageDraw.Draw(im)
+    locs = []
+    half = SPACING * 0.4
+    for index in range(0, 9):
+        x = 50 + SPACING * (index % 3) + SPACING / 2
+        y = 50 + SPACING * (index // 3) + SPACING / 2
+        locs.append((x, y))
+        draw.rectangle([x - half, y - half, x + half, y + half], \
+                       fill=random.choice(list(SIM_COLORS.values())))
+    pixels = numpy.asarray(im).astype(float)
+    pixels *= numpy.linspace(0.7, 1.0, width)[None, :, None]
+    pixels += numpy.random.RandomState(seed).normal(0.0, 8.0, pixels.shape)
+    return numpy.clip(pixels, 0, 255).astype(numpy.uint8), locs
+
+
+# Blur a picture along its rows like a sideways movement
+#
+def move_blur(pixels, length):
+    kernel = numpy.ones(length) / length
+    blurred = numpy.apply_along_axis( \
+        lambda row: numpy.convolve(row, kernel, 'same'), 1, \
+        pixels.astype(float))
+    return blurred.astype(numpy.uint8)
+
+
+def test_sharp_pictures():
+    for seed in range(0, 3):
+        pixels, locs = face_picture(seed)
+        assert sampler.edge_width(pixels, locs) < BLUR_MAX_WIDTH / 4
+        # A little out of focus is still sharp enough
+        focus = numpy.asarray(Image.fromarray(pixels).filter( \
+            ImageFilter.GaussianBlur(2)))
+        assert sampler.edge_width(focus, locs) < BLUR_MAX_WIDTH
+
+
+def test_blurred_pictures():
+    for seed in range(0, 3):
+        pixels, locs = face_picture(seed)
+        # Moving a tenth of the square spacing in every direction
+        blurred = numpy.asarray(Image.fromarray(pixels).filter( \
+            ImageFilter.BoxBlur(SPACING // 10)))
+        assert sampler.edge_width(blurred, locs) > BLUR_MAX_WIDTH
+        # Moving a fifth of the square spacing sideways only blurs the
+        # edges between the columns
+        assert sampler.edge_width(move_blur(pixels, SPACING // 5), locs) > \
+               BLUR_MAX_WIDTH
+
+
+def test_more_blur_is_wider():
+    pixels, locs = face_picture(4)
+    widths = [sampler.edge_width(move_blur(pixels, length), locs) \
+              for length in [2, 10, 20, 40]]
+    assert widths == sorted(widths)
@@ -0,0 +1,97 @@
+#
+# Tests of the scan planner.
+#
+# The planned steps are run on the simulated robot. At every picture the
+# side in front of the simulated camera must be the one the plan names.
+#
+
+import rubik_sim
+from rubik_servos import G_POS_CLOSED
+from rubik_sim import SimCube, CAMERA_AXIS, CAMERA_UP
+from rubik_scan_plan import RubikScanPlan, FACE_ORDER
+from rubik_solve import RubikSolve
+
+
+# Display that shows nothing
+#
+class NoDisplay(object):
+    def write_header(self, text):
+        pass
+
+    def write_body(self, text):
+        pass
+
+
+# Get a scan planner that uses the solver's face lists
+#
+def scan_planner(servos):
+    solver = RubikSolve(servos, NoDisplay())
+    return RubikScanPlan(servos, solver.planner)
+
+
+# Run a scan plan on the simulated robot
+#
+# Return:
+#   The list of sides in the pictures and the planned end faces
+#
+def run_scan(servos, planner, face_l, face_r, faces=FACE_ORDER):
+    servo_pos = (servos.rt_pos, servos.rg_pos, servos.lt_pos, servos.lg_pos)
+    plan, plan_time, end_l, end_r = \
+        planner.plan(servo_pos, face_l, face_r, faces)
+    pictures = []
+    for servo, pos in plan:
+        if (servo != 'camera'):
+            servos.set_servo(servo, pos)
+            continue
+        servos.wait_idle()
+        face, up = pos
+        view, moving = rubik_sim.robot.camera_view()
+        assert not moving
+        # The cube is solved so the center square names the side
+        assert view[4] == face
+        assert rubik_sim.robot.cube.view(CAMERA_UP, CAMERA_AXIS)[4] == up
+        pictures.append(face)
+    servos.wait_idle()
+    return pictures, end_l, end_r
+
+
+# Get the faces held by the left and right simulated grippers
+#
+def held_faces():
+    cube = rubik_sim.robot.cube
+    return (cube.view(rubik_sim.LEFT_AXIS, (0, 1, 0))[4], \
+            cube.view(rubik_sim.RIGHT_AXIS, (0, 0, 1))[4])
+
+
+def test_scan_all_faces(servos, load_cube):
+    planner = scan_planner(servos)
+    face_l, face_r = load_cube(SimCube().facelets())
+    pictures, end_l, end_r = run_scan(servos, planner, face_l, face_r)
+    assert sorted(pictures) == sorted(FACE_ORDER)
+    assert rubik_sim.robot.faults == []
+    # The grippers are left closed on the faces the plan reports
+    assert servos.rg_pos == G_POS_CLOSED
+    assert servos.lg_pos == G_POS_CLOSED
+    assert held_faces() == (end_l, end_r)
+
+
+def test_rescan_some_faces(servos, load_cube):
+    # New pictures start from where the first scan left the cube
+    planner = scan_planner(servos)
+    face_l, face_r = load_cube(SimCube().facelets())
+    pictures, face_l, face_r = run_scan(servos, planner, face_l, face_r)
+    for faces in ["U", "LB", "DRF"]:
+        pictures, face_l, face_r = run_scan(servos, planner, face_l, \
+                                            face_r, faces)
+        assert sorted(pictures) == sorted(faces)
+        assert held_faces() == (face_l, face_r)
+    assert rubik_sim.robot.faults == []
+
+
+def test_plan_saved(servos, load_cube):
+    planner = scan_planner(servos)
+    face_l, face_r = load_cube(SimCube().facelets())
+    servo_pos = (servos.rt_pos, servos.rg_pos, servos.lt_pos, servos.lg_pos)
+    first = planner.plan(servo_pos, face_l, face_r)
+    assert planner.plan(servo_pos, face_l, face_r) is first
+    assert planner.plan(servo_pos, face_l, face_r, "U") is not first
@@ -0,0 +1,97 @@
+#
+# Tests of the solution search stop rule.
+#
+# A fake solver library returns solutions on a set schedule, so the tests
+# don't need the RubikTwoPhase library.
+#
+
+import time
+
+import rubik_search
+from rubik_cancel import RubikCancel
+from rubik_search import RubikSearch
+from rubik_sim import SimCube
+
+
+# Solver library that finds solutions on a schedule
+#
+# Input:
+#   schedule    List of (delay, length) tuples. Each solution is found
+#               delay seconds after the one before it.
+#
+class FakeSolver(object):
+    def __init__(self, schedule):
+        self.schedule = schedule
+
+    def solve(self, cube_string, max_length, timeout):
+        end_time = time.monotonic() + timeout
+        while (len(self.schedule) > 0):
+            delay, length = self.schedule.pop(0)
+            if (time.monotonic() + delay > end_time):
+                break
+            time.sleep(delay)
+            if (length <= max_length):
+                return solution(length)
+        time.sleep(max(0.0, end_time - time.monotonic()))
+        return solution(max_length + 1)
+
+
+# Get a solution string with a number of moves
+#
+def solution(length):
+    return " ".join(["R1"] * length) + " (" + str(length) + "f)"
+
+
+# Robot time used by the estimate function for each solution length
+ROBOT_TIMES = {20: 50.0, 19: 45.0, 18: 40.0, 17: 39.9}
+
+
+# Get a search class that uses the fake solver library
+#
+def fake_search(monkeypatch, schedule):
+    monkeypatch.setattr(rubik_search, "USE_ORIENTATIONS", 0)
+    monkeypatch.setattr(rubik_search, "ANYTIME_MIN_TIME", 0.2)
+    monkeypatch.setattr(rubik_search, "ANYTIME_MIN_RATE", 10.0)
+    search = RubikSearch(RubikCancel(), service=0, cache=0)
+    search.solver = FakeSolver(schedule)
+    search.load_start = time.monotonic()
+    search.ready.set()
+    return search
+
+
+def estimate(solve_string):
+    return ROBOT_TIMES[rubik_search.solution_length(solve_string)]
+
+
+def test_stop_when_search_doesnt_pay(monkeypatch):
+    # The first solutions each save 5 s of robot time every 0.2 s, more
+    # than the 10 s per second needed to keep searching. The search stops
+    # a second after the first solution once nothing more is found, before
+    # the last solution that saves only 0.1 s.
+    search = fake_search(monkeypatch, \
+        [(0.05, 20), (0.2, 19), (0.2, 18), (2.0, 17)])
+    start = time.monotonic()
+    candidates = search.solve_candidates(SimCube().facelets(), 10.0, estimate)
+    searched = time.monotonic() - start
+    assert candidates == [solution(20), solution(19), solution(18)]
+    assert 0.9 < searched < 2.0
+
+
+def test_stop_after_min_time(monkeypatch):
+    # Nothing better than the first solution is found, so the search stops
+    # after the shortest search time
+    search = fake_search(monkeypatch, [(0.05, 20), (2.0, 19)])
+    start = time.monotonic()
+    candidates = search.solve_candidates(SimCube().facelets(), 10.0, estimate)
+    searched = time.monotonic() - start
+    assert candidates == [solution(20)]
+    assert searched < 1.0
+
+
+def test_full_search_without_estimate(monkeypatch):
+    # Without the estimate the search runs until the solver is done
+    search = fake_search(monkeypatch, \
+        [(0.05, 20), (0.2, 19), (0.2, 18), (0.5, 17)])
+    candidates = search.solve_candidates(SimCube().facelets(), 2.0)
+    assert candidates == [solution(20), solution(19), solution(18), \
+                          solution(17)]
@@ -0,0 +1,110 @@
+#
+# Tests of the servo controller move times.
+#
+
+import rubik_servos
+from rubik_cancel import RubikCancel
+from rubik_servos import RubikServo, SERVO_MOVE_DELAY, T_POS_0, T_POS_P90, \
+                         G_POS_OPEN, G_POS_CLOSED, G_POS_LOAD
+
+
+# Make a servo controller that reads a servo timing file
+#
+def with_timing(servos, lines):
+    with open("servo_timing.txt", 'w') as f:
+        for line in lines:
+            f.write(line + "\n")
+    return RubikServo(servos.btn_q, RubikCancel(), servos.cal_file)
+
+
+def test_unmeasured_moves_wait_longest(servos):
+    assert servos.move_time('rt', T_POS_0, T_POS_P90, False) == \
+           SERVO_MOVE_DELAY
+    assert servos.move_time('rg', G_POS_OPEN, G_POS_CLOSED) == \
+           SERVO_MOVE_DELAY
+    assert servos.move_time('rt', T_POS_0, T_POS_0) == 0.0
+
+
+def test_estimate(servos, monkeypatch):
+    monkeypatch.setattr(rubik_servos, "USE_MOVE_ESTIMATE", 1)
+    unloaded = servos.move_time('rt', T_POS_0, T_POS_P90, False)
+    loaded = servos.move_time('rt', T_POS_0, T_POS_P90, True)
+    assert 0.0 < unloaded < loaded <= SERVO_MOVE_DELAY
+
+
+def test_timing_file(servos):
+    servos = with_timing(servos, ["rt 0 90 1 0.45 Right turn holding the cube",
+                                  "",
+                                  "rg open close 1 0.3"])
+    assert servos.move_time('rt', T_POS_0, T_POS_P90, True) == 0.45
+    assert servos.move_time('rt', T_POS_0, T_POS_P90, False) == \
+           SERVO_MOVE_DELAY
+    assert servos.move_time('rg', G_POS_OPEN, G_POS_CLOSED) == 0.3
+
+
+def test_timing_file_errors(servos, capsys):
+    servos = with_timing(servos, ["rt 0 45 1 0.45",
+                                  "xt 0 90 1 0.45",
+                                  "rg open clse 0 0.3",
+                                  "rg open load 2 0.3",
+                                  "lt 0 90 0 fast",
+                                  "lt 0 90 0 -1",
+                                  "lt 0 90",
+                                  "lg open load 0 0.2"])
+    assert servos.timing == {('lg', G_POS_OPEN, G_POS_LOAD, 0): 0.2}
+    assert capsys.readouterr().out.count("Servo timing file error") == 7
+
+
+# Servo overlaps allowed by the gripper mechanics
+#
+# Each case is the right and left grip positions, the servo moved and its
+# new position, the servos it must wait for because moving at the same
+# time could drop, jam or twist the cube, and the servos it may move at
+# the same time as.
+#
+OVERLAPS = [
+    # Both grips open, the cube is resting in the grippers
+    (G_POS_OPEN, G_POS_OPEN, 'rt', T_POS_P90, ['rg'], ['lt', 'lg']),
+    (G_POS_OPEN, G_POS_OPEN, 'rg', G_POS_LOAD, ['rt'], ['lt', 'lg']),
+    # Closing on the cube while the other gripper turns would twist it
+    (G_POS_OPEN, G_POS_OPEN, 'rg', G_POS_CLOSED, ['rt', 'lt'], ['lg']),
+
+    # Right grip holds the cube, left grip open
+    # Turning the cube needs every other servo stopped
+    (G_POS_CLOSED, G_POS_OPEN, 'rt', T_POS_P90, ['rg', 'lt', 'lg'], []),
+    # The open left gripper is clear of the cube but must not swing
+    # through it while it turns. It can re-home while the right grip is
+    # still closing.
+    (G_POS_CLOSED, G_POS_OPEN, 'lt', T_POS_P90, ['lg', 'rt'], ['rg']),
+    # The left grip closes on a cube that isn't turning
+    (G_POS_CLOSED, G_POS_OPEN, 'lg', G_POS_CLOSED, ['lt', 'rt'], ['rg']),
+    # Releasing the only grip leaves the cube in the open grippers
+    (G_POS_CLOSED, G_POS_OPEN, 'rg', G_POS_LOAD, ['rt', 'lt'], ['lg']),
+
+    # Left grip holds the cube, right grip open
+    (G_POS_OPEN, G_POS_CLOSED, 'lt', T_POS_P90, ['lg', 'rt', 'rg'], []),
+    (G_POS_OPEN, G_POS_CLOSED, 'rt', T_POS_P90, ['rg', 'lt'], ['lg']),
+    (G_POS_OPEN, G_POS_CLOSED, 'rg', G_POS_CLOSED, ['rt', 'lt'], ['lg']),
+
+    # Both grips hold the cube
+    # Turning a face needs every other servo stopped
+    (G_POS_CLOSED, G_POS_CLOSED, 'rt', T_POS_P90, ['rg', 'lt', 'lg'], []),
+    (G_POS_CLOSED, G_POS_CLOSED, 'lt', T_POS_P90, ['lg', 'rt', 'rg'], []),
+    # Releasing one grip waits for the other to finish closing so the cube
+    # is always held
+    (G_POS_CLOSED, G_POS_CLOSED, 'rg', G_POS_OPEN, ['rt', 'lt', 'lg'], []),
+    (G_POS_CLOSED, G_POS_CLOSED, 'lg', G_POS_OPEN, ['lt', 'rt', 'rg'], []),
+]
+
+
+def test_depends(servos):
+    for rg, lg, servo, pos, wait, overlap in OVERLAPS:
+        servos.rg_pos = rg
+        servos.lg_pos = lg
+        depends = set(servos.depends(servo, pos))
+        case = (rg, lg, servo, pos)
+        for other in wait:
+            assert other in depends, case
+        for other in overlap:
+            assert other not in depends, case
+        assert set(wait + overlap + [servo]) == set(['rt', 'rg', 'lt', 'lg'])
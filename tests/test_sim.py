@@ -0,0 +1,106 @@
+#
+# Tests of the simulated cube and a complete simulated solve cycle.
+#
+
+import sys
+import random
+
+import rubik_search
+import rubik_sim
+from rubik_sim import SimCube, random_scramble
+
+
+SOLVED = "UUUUUUUUURRRRRRRRRFFFFFFFFFDDDDDDDDDLLLLLLLLLBBBBBBBBB"
+
+SCRAMBLE = "R3 U2 D2 B2 R1 D1 L1 B2 F3 R3 U2 B3 U2 B1 D3 U3 R2 D3 R2 B1"
+
+
+# Do a list of moves like "R1" on a cube
+#
+def do_moves(cube, moves):
+    for move in moves:
+        cube.move(move[0], int(move[1]))
+
+
+# Get the moves that undo a list of moves
+#
+def undo_moves(moves):
+    return [move[0] + str(4 - int(move[1])) for move in reversed(moves)]
+
+
+# Make a new simulated robot with the buttons of the old one
+#
+def new_robot():
+    robot = rubik_sim.SimRobot()
+    robot.gpio = rubik_sim.GPIO
+    return robot
+
+
+def test_new_cube_is_solved():
+    cube = SimCube()
+    assert cube.facelets() == SOLVED
+    assert cube.solved()
+
+
+def test_facelets_round_trip():
+    cube = SimCube()
+    do_moves(cube, SCRAMBLE.split(" "))
+    assert SimCube(cube.facelets()).facelets() == cube.facelets()
+
+
+def test_four_turns_do_nothing():
+    for face in "URFDLB":
+        cube = SimCube()
+        do_moves(cube, [face + "1"] * 4)
+        assert cube.facelets() == SOLVED
+        do_moves(cube, [face + "2"])
+        assert not cube.solved()
+        do_moves(cube, [face + "2"])
+        assert cube.facelets() == SOLVED
+
+
+def test_clockwise_turn():
+    # Turning U clockwise moves the front row of U onto the right side
+    cube = SimCube()
+    do_moves(cube, ["U1"])
+    assert cube.facelets()[9:12] == "BBB"
+    assert cube.facelets()[18:21] == "RRR"
+
+
+def test_scramble_undo():
+    random.seed(1)
+    for trial in range(0, 20):
+        moves = random_scramble(20)
+        cube = SimCube()
+        do_moves(cube, moves)
+        assert not cube.solved()
+        do_moves(cube, undo_moves(moves))
+        assert cube.facelets() == SOLVED
+
+
+def test_solve_cycle(monkeypatch):
+    # Undo the scramble instead of searching so the run is quick and the
+    # same every time
+    monkeypatch.setattr(sys, "argv", ["rubik_sim.py", "--no-solver"] + \
+                        SCRAMBLE.split(" "))
+    # main() changes to the directory of the robot code
+    monkeypatch.chdir(".")
+    monkeypatch.setattr(rubik_sim, "robot", new_robot())
+
+    assert rubik_sim.main()
+    assert rubik_sim.robot.faults == []
+    assert rubik_sim.robot.moving_pictures == 0
+
+
+def test_solver_missing(monkeypatch, capsys):
+    # Without the solver library the run fails instead of quietly undoing
+    # the scramble
+    monkeypatch.setitem(sys.modules, "twophase", None)
+    monkeypatch.setitem(sys.modules, "twophase.solver", None)
+    monkeypatch.setattr(rubik_search, "SERVICE_START_TIME", 0.0)
+    monkeypatch.setattr(sys, "argv", ["rubik_sim.py", "R1", "U2"])
+    monkeypatch.chdir(".")
+    monkeypatch.setattr(rubik_sim, "robot", new_robot())
+
+    assert not rubik_sim.main()
+    assert "--no-solver" in capsys.readouterr().out
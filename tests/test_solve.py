@@ -0,0 +1,127 @@
+#
+# Tests of choosing the solution the robot carries out.
+#
+
+import pytest
+
+import my_exceptions
+import rubik_sim
+from rubik_sim import SimCube
+from rubik_solve import RubikSolve
+
+
+# Display that shows nothing
+#
+class NoDisplay(object):
+    def write_header(self, text):
+        pass
+
+    def write_body(self, text):
+        pass
+
+
+# Make a solver class using the simulated servos, starting from the faces
+# the grippers hold when the cube is loaded
+#
+@pytest.fixture
+def solver(servos):
+    solver = RubikSolve(servos, NoDisplay())
+    solver.set_start_faces('B', 'D')
+    return solver
+
+
+# Get the cube a solution solves
+#
+def unsolve(solve_string):
+    cube = SimCube()
+    for move in reversed(solve_string.split(" ")[:-1]):
+        cube.move(move[0], 4 - int(move[1]))
+    return cube.facelets()
+
+
+# Choose a solution for a cube loaded in the simulated grippers
+#
+# The servo plan starts from the servo positions when it is made, so the
+# cube is loaded first as it is after scanning.
+#
+def choose_loaded(solver, load_cube, cube_string, candidates):
+    solver.set_start_faces(*load_cube(cube_string))
+    return solver.choose_solution(candidates)
+
+
+# Run a chosen solution and its plan on the simulated robot
+#
+# Return:
+#   True if the cube is solved
+#
+def run_solution(solver, servos, solve_string, plan):
+    solver.solve(NoDisplay(), servos, solve_string, plan)
+    servos.wait_idle()
+    assert rubik_sim.robot.faults == []
+    return rubik_sim.robot.cube.solved()
+
+
+def test_fastest_solution_chosen(solver, servos, load_cube):
+    # The grippers hold B and D. U and R need cube rotations first so the
+    # one move solutions are slower than two moves of the held faces.
+    candidates = ["R1 (1f)", "Error: 8", "D1 B1 D1 (3f)", "D1 B1 (2f)", \
+                  "U1 (1f)"]
+    solve_string, plan = choose_loaded(solver, load_cube, \
+                                       unsolve("D1 B1 (2f)"), candidates)
+    assert solve_string == "D1 B1 (2f)"
+    assert plan[1] < solver.predict("U1 (1f)")[1]
+    assert plan[1] < solver.predict("R1 (1f)")[1]
+    # The plan is the one for the chosen solution
+    assert plan == solver.predict(solve_string)
+    assert run_solution(solver, servos, solve_string, plan)
+
+
+def test_rewrite_kept_when_faster(solver, servos, load_cube):
+    original = "D3 D2 U1 D2 (4f)"
+    solve_string, plan = choose_loaded(solver, load_cube, \
+                                       unsolve(original), [original])
+    assert solve_string == "D3 U1 (2f)"
+    assert plan[1] < solver.predict(original)[1]
+    assert run_solution(solver, servos, solve_string, plan)
+
+
+def test_rewrite_dropped_when_slower(solver, servos, load_cube):
+    # The rewrite needs fewer cube rotations but more servo time
+    original = "U3 F2 B3 L1 (4f)"
+    solve_string, plan = choose_loaded(solver, load_cube, \
+                                       unsolve(original), [original])
+    rewritten = solver.rewrite(original)
+    assert rewritten != original
+    assert solver.predict(rewritten)[1] > solver.predict(original)[1]
+    assert solve_string == original
+    assert plan == solver.predict(original)
+    assert run_solution(solver, servos, solve_string, plan)
+
+
+def test_long_solutions_not_planned(solver):
+    assert solver.estimate("R1 (1f)") is not None
+    assert solver.estimate("R1 U1 F1 L1 (4f)") is None
+    solve_string, plan = solver.choose_solution( \
+        ["R1 U1 F1 L1 (4f)", "R1 (1f)", "R1 U1 F1 L1 D1 B1 (6f)"])
+    assert solve_string == "R1 (1f)"
+    # Planning starts again from new start faces
+    solver.set_start_faces('B', 'D')
+    assert solver.estimate("R1 U1 F1 L1 (4f)") is not None
+
+
+def test_moves_cancel_out(solver):
+    solve_string, plan = solver.choose_solution(["R1 R3 (2f)"])
+    assert solve_string == "(0f)"
+    assert plan[0] == []
+
+
+def test_already_solved(solver):
+    solve_string, plan = solver.choose_solution(["(0f)"])
+    assert solve_string == "(0f)"
+
+
+def test_no_solution(solver):
+    with pytest.raises(my_exceptions.SolveException):
+        solver.choose_solution([])
+    with pytest.raises(my_exceptions.SolveException, match="Error: 8"):
+        solver.choose_solution(["Error: 8"])
@@ -0,0 +1,134 @@
+#
+# Tests of the cube validator tables, checks, completion and repair.
+#
+
+import random
+
+from rubik_orient import facelet_location
+from rubik_sim import SimCube, random_scramble
+from rubik_validate import RubikValidate, CORNER_SQUARES, EDGE_SQUARES, \
+                           CORNER_FACES, EDGE_FACES, FACE_ORDER, parity
+
+
+SOLVED = "UUUUUUUUURRRRRRRRRFFFFFFFFFDDDDDDDDDLLLLLLLLLBBBBBBBBB"
+
+validate = RubikValidate()
+
+
+# Make a scrambled cube definition string
+#
+def scrambled(seed):
+    random.seed(seed)
+    cube = SimCube()
+    for move in random_scramble(20):
+        cube.move(move[0], int(move[1]))
+    return cube.facelets()
+
+
+# Swap two squares of a cube definition string
+#
+def swap(cube_string, i, j):
+    squares = list(cube_string)
+    squares[i], squares[j] = squares[j], squares[i]
+    return "".join(squares)
+
+
+def test_tables_cover_every_square_once():
+    squares = [square for piece in CORNER_SQUARES + EDGE_SQUARES \
+               for square in piece]
+    squares += [face * 9 + 4 for face in range(0, 6)]
+    assert sorted(squares) == list(range(0, 54))
+
+
+def test_tables_match_solved_cube():
+    for squares, faces in zip(CORNER_SQUARES, CORNER_FACES):
+        assert "".join([SOLVED[square] for square in squares]) == faces
+    for squares, faces in zip(EDGE_SQUARES, EDGE_FACES):
+        assert "".join([SOLVED[square] for square in squares]) == faces
+
+
+def test_piece_squares_are_together():
+    for piece in CORNER_SQUARES + EDGE_SQUARES:
+        positions = set([facelet_location(square)[0] for square in piece])
+        assert len(positions) == 1
+
+
+def test_corner_squares_clockwise():
+    for piece in CORNER_SQUARES:
+        a, b, c = [facelet_location(square)[1] for square in piece]
+        # Triple product of the square directions
+        det = a[0] * (b[1] * c[2] - b[2] * c[1]) - \
+              a[1] * (b[0] * c[2] - b[2] * c[0]) + \
+              a[2] * (b[0] * c[1] - b[1] * c[0])
+        assert det == -1
+
+
+def test_parity():
+    assert parity([0, 1, 2, 3]) == 0
+    assert parity([1, 0, 2, 3]) == 1
+    assert parity([1, 2, 0, 3]) == 0
+
+
+def test_valid_cubes():
+    assert validate.check(SOLVED) is None
+    for seed in range(0, 20):
+        assert validate.check(scrambled(seed)) is None
+
+
+def test_invalid_cubes():
+    cube_string = scrambled(1)
+    # Twist one corner
+    a, b, c = CORNER_SQUARES[0]
+    twisted = list(cube_string)
+    twisted[a], twisted[b], twisted[c] = \
+        cube_string[b], cube_string[c], cube_string[a]
+    assert validate.check("".join(twisted)) == "corner twist"
+    # Flip one edge
+    a, b = EDGE_SQUARES[0]
+    assert validate.check(swap(cube_string, a, b)) == "edge flip"
+    # Swap two edges
+    flipped = swap(cube_string, EDGE_SQUARES[0][0], EDGE_SQUARES[1][0])
+    flipped = swap(flipped, EDGE_SQUARES[0][1], EDGE_SQUARES[1][1])
+    assert validate.check(flipped) == "permutation parity"
+    # One square the wrong color
+    assert validate.check("F" + cube_string[1:]) is not None
+
+
+def test_complete_missing_face():
+    for seed in range(0, 10):
+        cube_string = scrambled(seed)
+        for face in range(0, 6):
+            unknown = list(cube_string)
+            for square in range(face * 9, face * 9 + 9):
+                if (square % 9 != 4):
+                    unknown[square] = '?'
+            results = validate.complete("".join(unknown), max_count=10)
+            assert cube_string in results
+            for result in results:
+                assert validate.check(result) is None
+
+
+def test_complete_needs_one_unknown_per_piece():
+    # Two squares of the URF corner
+    unknown = SOLVED[:8] + "??" + SOLVED[10:]
+    assert validate.complete(unknown) == []
+
+
+def test_repair():
+    cube_string = scrambled(3)
+    # Two squares read as each other's color, which are only a little
+    # closer to the wrong color than the right one
+    i, j = [(i, j) for i in range(0, 54) for j in range(i + 1, 54) \
+            if ((i % 9 != 4) and (j % 9 != 4) and \
+                (cube_string[i] != cube_string[j]))][0]
+    dist = []
+    for square in range(0, 54):
+        dist.append([0.0 if (face == cube_string[square]) else 10.0 \
+                     for face in FACE_ORDER])
+    for square, read in [(i, cube_string[j]), (j, cube_string[i])]:
+        dist[square][FACE_ORDER.index(cube_string[square])] = 3.0
+        dist[square][FACE_ORDER.index(read)] = 2.0
+
+    bad = swap(cube_string, i, j)
+    assert validate.check(bad) is not None
+    assert validate.repair(bad, dist) == (cube_string, [i, j])